@@ -0,0 +1,60 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+"""Benchmark the directory listings and walks on a high-latency file system,
+simulated by an in-memory one. Run with `python -m benchmarks.backend`."""
+
+import time
+from pathlib import Path
+
+from f2.fs import breadth_first_tree, breadth_first_walk, list_dir
+from f2.fs.backend import MemoryFileSystem, mount, unmount
+
+ROOT = Path("/benchmark")
+LATENCIES = [0.0, 0.005, 0.02, 0.05]  # per request, in sec.
+DIRS = 20
+SUBDIRS = 5
+FILES = 50
+
+
+def make_fs(latency: float) -> MemoryFileSystem:
+    fs = MemoryFileSystem(ROOT, latency)
+    for d in range(DIRS):
+        for s in range(SUBDIRS):
+            for f in range(FILES):
+                fs.add_file(ROOT / f"dir{d}" / f"sub{s}" / f"file{f}.txt", b"x" * f)
+    return fs
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    dir_count = 1 + DIRS + DIRS * SUBDIRS
+    print(f"{dir_count} directories, {dir_count * FILES} files")
+    for latency in LATENCIES:
+        fs = make_fs(latency)
+        mount(ROOT, fs)
+        try:
+            ls_time = timed(lambda: list_dir(ROOT / "dir0" / "sub0"))
+            walk_time = timed(lambda: list(breadth_first_walk(ROOT)))
+            tree_time = timed(lambda: breadth_first_tree(ROOT, 200, timeout=None))
+        finally:
+            unmount(ROOT)
+        print(
+            f"latency {latency * 1000:5.1f} ms"
+            f" | list dir {ls_time * 1000:8.2f} ms"
+            f" | walk {walk_time * 1000:8.2f} ms"
+            f" (sequential >= {dir_count * latency * 1000:8.2f} ms)"
+            f" | preview tree {tree_time * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+"""Benchmark the interactive latency: replay the sequences of key presses in a
+headless app showing a large directory, and measure the time every key press
+takes, from the key press until the app is idle again (the key handled and the
+screen updated). Run with `python -m benchmarks.latency`, see `--help` for the
+options.
+
+The latencies are written to a JSON file, and can be compared with a previous run
+(`--baseline`) to flag the regressions."""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from textual import events
+from textual.pilot import Pilot
+
+from .suite import THRESHOLD, flat_tree, isolate_config
+
+ENTRIES = 100_000
+ROUNDS = 1  # every sequence is replayed this many times
+SIZE = (200, 60)
+NO_OP_KEY = "f12"  # not bound: the latency of the harness itself
+KEY_CHARS = {"plus": "+", "minus": "-", "asterisk": "*", "space": " ", "tab": "\t"}
+
+SCENARIOS = {
+    "navigate": ["j"] * 50
+    + ["k"] * 20
+    + ["ctrl+f"] * 10
+    + ["ctrl+b"] * 10
+    + ["G", "g"] * 3,
+    "sort": ["s", "S", "t", "T", "N", "n"],
+    "select": ["plus", "minus", "asterisk", "minus"] + ["space"] * 5 + ["minus"],
+    "switch_panels": ["tab"] * 20,
+}
+
+
+def summarize(latencies: list[float]) -> dict[str, float]:
+    """Distribution of the latencies, in ms"""
+    ordered = sorted(latencies)
+
+    def percentile(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.mean(ordered) * 1000,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": ordered[-1] * 1000,
+    }
+
+
+async def press(pilot: Pilot, key: str) -> float:
+    """Press a key, and wait until it is handled and the screen is updated.
+    `Pilot.press` also waits for the process to be idle, which takes 20 ms at
+    least (and longer while the background workers are busy), so the key event
+    is sent as it does, but only the pending messages are waited for."""
+    app = pilot.app
+    char = key if len(key) == 1 else KEY_CHARS.get(key)
+    start = time.perf_counter()
+    app._driver.send_message(events.Key(key, char))  # type: ignore
+    for _ in range(3):  # the key, the messages it posts, and their messages
+        await pilot._wait_for_screen()
+    app.screen._on_timer_update()  # repaint now
+    await pilot._wait_for_screen()
+    return time.perf_counter() - start
+
+
+async def replay(
+    path: Path, scenarios: dict[str, list[str]], rounds: int
+) -> dict[str, dict[str, list[float]]]:
+    """Latencies of every key, by scenario. The app is started once, with both
+    panels in the `path` directory."""
+    from f2.app import F2Commander  # imported once the configuration is isolated
+    from f2.widgets.filelist import SortOptions
+
+    latencies: dict[str, dict[str, list[float]]] = {}
+    app = F2Commander()
+    async with app.run_test(size=SIZE) as pilot:
+        while len(app.screen_stack) > 1:  # e.g., the license on the first run
+            app.pop_screen()
+        app.left.path = path
+        app.right.path = path.parent
+        app.left.table.focus()
+        await pilot.pause()
+
+        for name, keys in {"harness": [NO_OP_KEY] * 20, **scenarios}.items():
+            by_key = latencies.setdefault(name, {})
+            for _ in range(rounds):
+                for key in keys:
+                    by_key.setdefault(key, []).append(await press(pilot, key))
+            # start every scenario from the same state:
+            app.left.reset_selection()
+            app.left.sort_options = SortOptions("name")
+            app.left.table.focus()
+            await pilot.pause()
+        app.exit()
+    return latencies
+
+
+def report(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict | None,
+    threshold: float,
+) -> list[str]:
+    """Print the latencies, compared with the baseline if any (by the median).
+    Returns the keys that regressed, as "scenario:key"."""
+    regressions = []
+    for scenario, by_key in results.items():
+        print(scenario)
+        for key, s in by_key.items():
+            line = (
+                f"{key:>14} | n {s['count']:4}"
+                f" | p50 {s['p50']:8.2f} ms | p90 {s['p90']:8.2f} ms"
+                f" | p99 {s['p99']:8.2f} ms | max {s['max']:8.2f} ms"
+            )
+            base = (baseline or {}).get(scenario, {}).get(key)
+            if base is not None and base["p50"] > 0:
+                ratio = s["p50"] / base["p50"]
+                line += f" | {ratio:5.2f}x baseline"
+                if ratio > 1 + threshold and scenario != "harness":
+                    line += " REGRESSION"
+                    regressions.append(f"{scenario}:{key}")
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.latency", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--trees", type=Path, help="keep the generated trees there")
+    parser.add_argument("--entries", type=int, default=ENTRIES)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument(
+        "--scenario",
+        choices=list(SCENARIOS),
+        action="append",
+        help="replay some of the scenarios only (can be repeated)",
+    )
+    parser.add_argument(
+        "--keys", help="replay these comma-separated keys instead of the scenarios"
+    )
+    parser.add_argument("--output", type=Path, help="write the results to a JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare with a previous run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="relative slowdown that is a regression (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    if args.keys:
+        scenarios = {"custom": args.keys.split(",")}
+    else:
+        scenarios = {n: SCENARIOS[n] for n in args.scenario or SCENARIOS}
+    baseline = (
+        json.loads(args.baseline.read_text())["results"] if args.baseline else None
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        isolate_config(Path(tmp) / "config")
+        trees_root = args.trees or Path(tmp)
+        trees_root.mkdir(parents=True, exist_ok=True)
+        path = flat_tree(trees_root, args.entries)
+        latencies = asyncio.run(replay(path, scenarios, args.rounds))
+
+    results = {
+        scenario: {key: summarize(values) for key, values in by_key.items()}
+        for scenario, by_key in latencies.items()
+    }
+    regressions = report(results, baseline, args.threshold)
+    if args.output:
+        run = {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "entries": args.entries,
+            "results": results,
+        }
+        args.output.write_text(json.dumps(run, indent=2))
+    if regressions:
+        print(f"{len(regressions)} regressions", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
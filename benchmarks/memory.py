@@ -0,0 +1,75 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+"""Benchmark the memory taken by the directory listings, and by the name cells of
+the file list rows that hold the entries, in bytes per entry. Run with
+`python -m benchmarks.memory`, see `--help` for the options."""
+
+import argparse
+import gc
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from rich.text import Text
+
+from f2.fs import list_dir
+from f2.widgets.filelist import TextAndValue
+
+from .suite import flat_tree
+
+ENTRIES = 100_000
+
+
+def allocated(make: Callable[[], object]) -> tuple[object, int]:
+    """The object made, and the memory allocated to make it (and still in use)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        obj = make()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return obj, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.memory", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--trees", type=Path, help="keep the generated trees there")
+    parser.add_argument("--entries", type=int, default=ENTRIES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trees_root = args.trees or Path(tmp)
+        trees_root.mkdir(parents=True, exist_ok=True)
+        path = flat_tree(trees_root, args.entries)
+
+        listing, listing_size = allocated(lambda: list_dir(path))
+        entries = listing.entries  # type: ignore
+        count = len(entries)
+        names_size = sum(sys.getsizeof(e.name) for e in entries)
+        _, cells_size = allocated(
+            lambda: [TextAndValue(e, Text(e.name)) for e in entries]
+        )
+
+    entry = entries[0]
+    print(f"{count} entries")
+    print(f"{'DirEntry instance':>22} | {sys.getsizeof(entry):6} bytes (shallow)")
+    print(
+        f"{'listing':>22} | {listing_size / count:6.0f} bytes per entry"
+        f" (of which {names_size / count:.0f} in the names)"
+    )
+    print(f"{'name cells':>22} | {cells_size / count:6.0f} bytes per entry")
+    print(f"{'total':>22} | {(listing_size + cells_size) / count:6.0f} bytes per entry")
+
+
+if __name__ == "__main__":
+    main()
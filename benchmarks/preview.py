@@ -0,0 +1,90 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+"""Benchmark the text file previews, in particular of the files with very long
+lines (minified JSON and JS). Run with `python -m benchmarks.preview`."""
+
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.syntax import Syntax
+
+from f2.widgets.preview import guess_lexer, read_head
+
+WIDTH = 200
+HEIGHT = 60
+ROUNDS = 20
+
+
+def make_files(root: Path) -> list[Path]:
+    minified_json = root / "minified.json"
+    data = [{"id": i, "name": f"item-{i}", "tags": ["a", "b", "c"]} for i in range(10)]
+    with minified_json.open("w") as f:
+        f.write(json.dumps(data * 100_000, separators=(",", ":")))  # ~50 MB, 1 line
+
+    minified_js = root / "minified.js"
+    with minified_js.open("w") as f:
+        for _ in range(5):
+            f.write("var a=function(b){return b+1};" * 300_000 + "\n")
+
+    long_lines = root / "long_lines.csv"
+    with long_lines.open("w") as f:
+        for i in range(10_000):
+            f.write(",".join(str(i * j) for j in range(1000)) + "\n")
+
+    regular = root / "regular.py"
+    with regular.open("w") as f:
+        for i in range(100_000):
+            f.write(f"def function_{i}(x):\n    return x * {i}\n\n")
+
+    return [minified_json, minified_js, long_lines, regular]
+
+
+def bench(path: Path) -> tuple[float, float, float]:
+    """Measure the time to prepare the first preview of a file (when the lexer is
+    not yet resolved), and the average time to prepare and to render a preview
+    after that, in sec."""
+
+    def prepare():
+        head = read_head(path, HEIGHT, WIDTH * 4)
+        return Syntax(code=head, lexer=guess_lexer(path, head))
+
+    start = time.perf_counter()
+    prepare()
+    first_time = time.perf_counter() - start
+
+    console = Console(file=io.StringIO(), width=WIDTH, height=HEIGHT)
+    prepare_time = render_time = 0.0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        syntax = prepare()
+        prepared = time.perf_counter()
+        console.print(syntax)
+        rendered = time.perf_counter()
+        prepare_time += prepared - start
+        render_time += rendered - prepared
+    return first_time, prepare_time / ROUNDS, render_time / ROUNDS
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in make_files(Path(tmp)):
+            size_mb = path.stat().st_size / 1024 / 1024
+            first_time, prepare_time, render_time = bench(path)
+            print(
+                f"{path.name:>16} {size_mb:8.1f} MB"
+                f" | first {first_time * 1000:8.2f} ms"
+                f" | prepare {prepare_time * 1000:8.2f} ms"
+                f" | render {render_time * 1000:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+"""Benchmark the directory listings, walks, file list updates, previews, directory
+sizes and copies over synthetic directory trees. Run with
+`python -m benchmarks.suite`, see `--help` for the options.
+
+The results are written to a JSON file, and can be compared with the results of
+a previous run (`--baseline`) to flag the regressions. The trees are generated in
+a temporary directory, or in a given one (`--trees`) where they are kept and
+reused by the next runs (generating a million files takes a while)."""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from f2.fs import breadth_first_walk, dir_size, list_dir
+from f2.fs.backend import backend_for
+from f2.fs.du import SizeTree
+
+FLAT_SIZES = [10_000, 100_000]
+LARGE_FLAT_SIZES = [1_000_000]  # with --large
+DEEP_LEVELS = 100
+DEEP_FILES = 20  # per level
+SMALL_DIRS = 100
+SMALL_FILES = 200  # per directory
+SMALL_FILE_SIZE = 4096
+SPARSE_FILES = 3
+SPARSE_SIZE = 1024**3
+ROUNDS = 5
+THRESHOLD = 0.2  # slower than the baseline by this much is a regression
+
+
+#
+# TREES:
+#
+
+
+def _make_flat(root: Path, count: int):
+    root.mkdir()
+    for i in range(count):
+        if i % 10 == 0:
+            (root / f"dir{i:07}").mkdir()
+        else:
+            (root / f"file{i:07}.txt").write_bytes(b"x" * (i % 1000))
+
+
+def _make_deep(root: Path):
+    level = root
+    for depth in range(DEEP_LEVELS):
+        level.mkdir()
+        for i in range(DEEP_FILES):
+            (level / f"file{i}.txt").write_text(f"{depth} {i}\n")
+        level = level / f"level{depth}"
+
+
+def _make_small_files(root: Path):
+    data = os.urandom(SMALL_FILE_SIZE)
+    for d in range(SMALL_DIRS):
+        dir_path = root / f"dir{d:03}"
+        dir_path.mkdir(parents=True)
+        for f in range(SMALL_FILES):
+            (dir_path / f"file{f:03}.bin").write_bytes(data)
+
+
+def _make_sparse(root: Path):
+    root.mkdir()
+    for i in range(SPARSE_FILES):
+        with (root / f"sparse{i}.img").open("wb") as f:
+            f.write(b"header")
+            f.truncate(SPARSE_SIZE)
+    (root / "text.py").write_text(
+        "".join(f"def function_{i}(x):\n    return x * {i}\n\n" for i in range(10_000))
+    )
+
+
+def _ensure_tree(root: Path, name: str, make: Callable[[Path], None]) -> Path:
+    """Generate a tree in the `root` directory, unless a previous run did"""
+    path = root / name
+    complete_marker = root / f".{name}.complete"
+    if not complete_marker.exists():
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"generating {name}...", file=sys.stderr)
+        make(path)
+        complete_marker.touch()
+    return path
+
+
+def flat_tree(root: Path, count: int) -> Path:
+    """A directory with `count` entries (a tenth of them directories)"""
+    name = f"flat_{_fmt_count(count)}"
+    return _ensure_tree(root, name, partial(_make_flat, count=count))
+
+
+def make_trees(root: Path, flat_sizes: list[int]) -> dict[str, Path]:
+    """Generate the trees that are missing in the `root` directory"""
+    trees = {}
+    for count in flat_sizes:
+        path = flat_tree(root, count)
+        trees[path.name] = path
+    trees["deep"] = _ensure_tree(root, "deep", _make_deep)
+    trees["small_files"] = _ensure_tree(root, "small_files", _make_small_files)
+    trees["sparse"] = _ensure_tree(root, "sparse", _make_sparse)
+    return trees
+
+
+def _fmt_count(n: int) -> str:
+    return f"{n // 1_000_000}m" if n >= 1_000_000 else f"{n // 1000}k"
+
+
+def isolate_config(root: Path):
+    """Keep the configuration of the app (e.g., the visited directories) in the
+    `root` directory, with the path index and the prefetching off, so that the
+    benchmarks neither change the user's configuration nor crawl their home
+    directory. Must be called before the app modules are imported."""
+    assert "f2.config" not in sys.modules, "the configuration is already loaded"
+    os.environ["F2_CONFIG_DIR"] = str(root)  # see f2.config.CONFIG_DIR_ENV
+    from f2.config import config, set_user_has_accepted_license
+
+    config.path_index_roots = []
+    config.prefetch_dirs = False
+    set_user_has_accepted_license()
+
+
+#
+# MEASUREMENTS:
+#
+
+
+@dataclass
+class Result:
+    median: float  # sec.
+    min: float  # sec.
+    rounds: int
+    items: int | None = None  # entries or bytes processed per round
+    unit: str | None = None
+
+    @property
+    def throughput(self) -> float | None:
+        return self.items / self.median if self.items and self.median else None
+
+
+def measure(
+    fn: Callable,
+    rounds: int,
+    items: int | None = None,
+    unit: str | None = None,
+    setup: Callable | None = None,
+) -> Result:
+    times = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return Result(statistics.median(times), min(times), rounds, items, unit)
+
+
+def bench_fs(trees: dict[str, Path], rounds: int) -> dict[str, Result]:
+    results = {}
+    for name, path in trees.items():
+        if name.startswith("flat_"):
+            count = len(list_dir(path).entries)
+            results[f"list_dir[{name}]"] = measure(
+                lambda: list_dir(path), rounds, count, "entries"
+            )
+    for name in ("deep", "small_files") + tuple(
+        n for n in trees if n.startswith("flat_")
+    ):
+        path = trees[name]
+        count = sum(1 for _ in breadth_first_walk(path))
+        results[f"breadth_first_walk[{name}]"] = measure(
+            lambda: sum(1 for _ in breadth_first_walk(path)), rounds, count, "entries"
+        )
+    for name in ("deep", "small_files", "sparse"):
+        path = trees[name]
+
+        def du_scan():
+            for _ in SizeTree(path).scan():
+                pass
+
+        results[f"dir_size[{name}]"] = measure(lambda: dir_size(path), rounds)
+        results[f"du_scan[{name}]"] = measure(du_scan, rounds)
+    return results
+
+
+def bench_preview(trees: dict[str, Path], rounds: int) -> dict[str, Result]:
+    from f2.widgets.preview import Preview  # only imported if measured
+
+    preview = Preview()  # not mounted: formats for the size of the terminal
+    targets = {
+        "dir_flat": min(
+            (p for n, p in trees.items() if n.startswith("flat_")), key=str
+        ),
+        "dir_deep": trees["deep"],
+        "text": trees["sparse"] / "text.py",
+        "binary": trees["sparse"] / "sparse0.img",
+    }
+    return {
+        f"preview_format[{name}]": measure(lambda: preview._format(path), rounds)
+        for name, path in targets.items()
+    }
+
+
+def bench_copy(trees: dict[str, Path], rounds: int, tmp: Path) -> dict[str, Result]:
+    results = {}
+    dst_dir = tmp / "copies"
+    sources = {
+        "small_files": (
+            trees["small_files"],
+            SMALL_DIRS * SMALL_FILES * SMALL_FILE_SIZE,
+        ),
+        "sparse_file": (trees["sparse"] / "sparse0.img", SPARSE_SIZE),
+    }
+    for name, (src, size) in sources.items():
+
+        def reset():
+            shutil.rmtree(dst_dir, ignore_errors=True)
+            dst_dir.mkdir()
+
+        results[f"copy[{name}]"] = measure(
+            lambda: backend_for(src).copy(src, dst_dir), rounds, size, "bytes", reset
+        )
+    shutil.rmtree(dst_dir, ignore_errors=True)
+    return results
+
+
+def bench_file_list(trees: dict[str, Path], rounds: int) -> dict[str, Result]:
+    """Measure the updates of the file list in a headless app: the table filled
+    with a listing, and the table sorted by every key"""
+    from f2.app import F2Commander  # only imported if measured
+
+    results = {}
+
+    async def run():
+        app = F2Commander()
+        async with app.run_test(size=(200, 60)) as pilot:
+            file_list = app.left
+            for name, path in trees.items():
+                if not name.startswith("flat_"):
+                    continue
+                file_list.path = path
+                await pilot.pause()
+                ls = list_dir(path)
+                count = len(ls.entries)
+                results[f"filelist_update_table[{name}]"] = measure(
+                    lambda: file_list._update_table(ls), rounds, count, "entries"
+                )
+                for key in ("name", "size", "mtime"):
+                    file_list.sort_options.key = key
+                    results[f"filelist_sort_{key}[{name}]"] = measure(
+                        lambda: file_list.table.sort(
+                            "name", key=file_list.sort_key, reverse=False
+                        ),
+                        rounds,
+                        count,
+                        "entries",
+                    )
+                file_list.sort_options.key = "name"
+            app.exit()
+
+    asyncio.run(run())
+    return results
+
+
+#
+# REPORTS:
+#
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def report(results: dict[str, Result], baseline: dict | None, threshold: float):
+    """Print the results, compared with the baseline if any. Returns the names of
+    the measurements that regressed."""
+    regressions = []
+    for name, result in results.items():
+        line = f"{name:>42} | median {result.median * 1000:10.2f} ms"
+        if result.throughput is not None and result.unit == "bytes":
+            line += f" | {result.throughput / 1024 / 1024:10.1f} MB/s"
+        elif result.throughput is not None:
+            line += f" | {result.throughput:10.0f} {result.unit}/s"
+        base = (baseline or {}).get(name)
+        if base is not None and base["median"] > 0:
+            ratio = result.median / base["median"]
+            line += f" | {ratio:5.2f}x baseline"
+            if ratio > 1 + threshold:
+                line += " REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--trees", type=Path, help="keep the generated trees there")
+    parser.add_argument("--large", action="store_true", help="add 1M entries dir")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument(
+        "--only",
+        choices=["fs", "preview", "copy", "filelist"],
+        action="append",
+        help="run some of the benchmarks only (can be repeated)",
+    )
+    parser.add_argument("--output", type=Path, help="write the results to a JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare with a previous run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="relative slowdown that is a regression (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    flat_sizes = FLAT_SIZES + (LARGE_FLAT_SIZES if args.large else [])
+    only = set(args.only or ["fs", "preview", "copy", "filelist"])
+    baseline = (
+        json.loads(args.baseline.read_text())["results"] if args.baseline else None
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        isolate_config(Path(tmp) / "config")
+        trees_root = args.trees or Path(tmp) / "trees"
+        trees_root.mkdir(parents=True, exist_ok=True)
+        trees = make_trees(trees_root, flat_sizes)
+
+        results: dict[str, Result] = {}
+        if "fs" in only:
+            results.update(bench_fs(trees, args.rounds))
+        if "preview" in only:
+            results.update(bench_preview(trees, args.rounds))
+        if "copy" in only:
+            results.update(bench_copy(trees, args.rounds, Path(tmp)))
+        if "filelist" in only:
+            results.update(bench_file_list(trees, args.rounds))
+
+    regressions = report(results, baseline, args.threshold)
+    if args.output:
+        run = {
+            "time": time.time(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "results": {name: asdict(r) for name, r in results.items()},
+        }
+        args.output.write_text(json.dumps(run, indent=2))
+    if regressions:
+        print(f"{len(regressions)} regressions", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
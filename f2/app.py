@@ -4,32 +4,58 @@
 #
 # Copyright (c) 2024 Timur Rubeko
 
-import os
-import shutil
 import subprocess
+import time
 from functools import partial
 from importlib.metadata import version
 from pathlib import Path
 
-from send2trash import send2trash
+from humanize import naturalsize
+from rich.markup import escape
 from textual import on, work
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.command import DiscoveryHit, Hit, Provider
 from textual.containers import Horizontal
 from textual.reactive import reactive
-from textual.widgets import Footer
+from textual.widgets import Footer, Select
+from textual.worker import get_current_worker
 
 from .commands import Command
 from .config import config, set_user_has_accepted_license, user_has_accepted_license
+from .frecency import frecency
+from .fs import in_archive, is_binary_file, is_browsable, nearest_dir
+from .fs.archive import (
+    ARCHIVE_ERRORS,
+    extract,
+    extract_to_temp,
+    split_archive_path,
+    unindexed_archive,
+)
+from .fs.backend import backend_for, is_available
+from .fs.compare import SyncDirection, TreeComparison, compare_trees, sync, sync_plan
+from .fs.compress import compress
+from .fs.diff import first_difference
+from .fs.grep import compile_pattern
+from .fs.pathindex import path_index
+from .profiling import profiler
 from .shell import editor, shell, viewer
 from .widgets.bookmarks import GoToBookmarkDialog
-from .widgets.dialogs import InputDialog, StaticDialog, Style
+from .widgets.dialogs import InputDialog, SelectDialog, StaticDialog, Style
+from .widgets.diffviewer import DiffViewer
+from .widgets.diskusage import DiskUsage
+from .widgets.duplicates import Duplicates
 from .widgets.filelist import FileList
+from .widgets.jump import JumpDialog, jump_candidates
 from .widgets.panel import Panel
+from .widgets.preview import Preview
+from .widgets.search import SearchResults
+from .widgets.viewer import Viewer
 
 
 class F2AppCommands(Provider):
+    MAX_PATH_HITS = 10
+
     @property
     def all_commands(self):
         app_commands = [(self.app, cmd) for cmd in self.app.BINDINGS_AND_COMMANDS]
@@ -39,7 +65,7 @@ class F2AppCommands(Provider):
 
     def _fmt_help(self, cmd):
         if cmd.binding_key is not None:
-            return f"[{cmd.binding_key}]\n{cmd.description}\n"
+            return f"{escape(f'[{cmd.binding_key}]')}\n{cmd.description}\n"
         else:
             return f"{cmd.description}\n"
 
@@ -54,6 +80,16 @@ class F2AppCommands(Provider):
                     partial(node.run_action, cmd.action),
                     help=self._fmt_help(cmd),
                 )
+        # directories to jump to, ranked below the commands:
+        app: F2Commander = self.app  # type: ignore
+        paths = jump_candidates(query, limit=self.MAX_PATH_HITS)
+        for rank, path in enumerate(paths):
+            yield Hit(
+                0.1 * (1 - rank / len(paths)),
+                matcher.highlight(escape(path)),
+                partial(app.go_to_dir, Path(path)),
+                help="Go to this directory",
+            )
 
     async def discover(self):
         for node, cmd in self.all_commands:
@@ -103,6 +139,66 @@ class F2Commander(App):
             "Enter a path to jump to it",
             "ctrl+g",
         ),
+        Command(
+            "view_external",
+            "View with external viewer",
+            "View the file under cursor with an external viewer program",
+            "V",
+        ),
+        Command(
+            "toggle_follow",
+            "Toggle follow mode",
+            "Follow the end of the file in the Preview panel as the file grows",
+            "F",
+        ),
+        Command(
+            "search_contents",
+            "Search in files",
+            "Search the contents of the files in the directory tree (regex)",
+            "i",
+        ),
+        Command(
+            "disk_usage",
+            "Disk usage",
+            "Analyze the disk usage of the directory tree",
+            "u",
+        ),
+        Command(
+            "find_duplicates",
+            "Find duplicates",
+            "Find files with the same contents under the locations of both panels",
+            None,
+        ),
+        Command(
+            "compare_dirs",
+            "Compare directories",
+            "Compare the directory trees of both panels by size and time (or stop)",
+            None,
+        ),
+        Command(
+            "compare_dirs_by_content",
+            "Compare directories by content",
+            "Compare the directory trees of both panels by file contents (or stop)",
+            None,
+        ),
+        Command(
+            "sync_dirs",
+            "Synchronize directories",
+            "Copy what differs between the compared directories, one or both ways",
+            None,
+        ),
+        Command(
+            "compare_files",
+            "Compare files",
+            "Compare the files under the cursors of both panels",
+            None,
+        ),
+        Command(
+            "compress",
+            "Compress",
+            "Compress the selected entries into a .tar.gz or .zip archive",
+            "z",
+        ),
         Command(
             "toggle_hidden",
             "Togghle hidden",
@@ -115,6 +211,12 @@ class F2Commander(App):
             "Show directories first or ordered among files",
             None,
         ),
+        Command(
+            "toggle_prefetch_dirs",
+            "Toggle prefetching",
+            "List the directory under cursor in background, to enter it faster",
+            None,
+        ),
         Command(
             "toggle_order_case_sensitive",
             "Toggle case sensitive name order",
@@ -152,10 +254,15 @@ class F2Commander(App):
         if cmd.binding_key is not None
     ]  # type: ignore
     COMMANDS = {F2AppCommands}
+    COMPRESS_PROGRESS_INTERVAL = 5  # seconds
+    SYNC_PROGRESS_INTERVAL = 5  # seconds
+    PATH_INDEX_INTERVAL = 15 * 60  # update the path index this often, in seconds
+    FRECENCY_SAVE_INTERVAL = 60  # save the visited directories this often, in seconds
 
     show_hidden = reactive(config.show_hidden)
     dirs_first = reactive(config.dirs_first)
     order_case_sensitive = reactive(config.order_case_sensitive)
+    prefetch_dirs = reactive(config.prefetch_dirs)
     swapped = reactive(False)
 
     def compose(self) -> ComposeResult:
@@ -179,6 +286,10 @@ class F2Commander(App):
         self.right.show_hidden = new
         config.show_hidden = new
 
+    def action_toggle_follow(self):
+        for preview in self.query(Preview):
+            preview.follow = not preview.follow
+
     def action_toggle_dirs_first(self):
         self.dirs_first = not self.dirs_first
 
@@ -197,6 +308,14 @@ class F2Commander(App):
         self.right.order_case_sensitive = new
         config.order_case_sensitive = new
 
+    def action_toggle_prefetch_dirs(self):
+        self.prefetch_dirs = not self.prefetch_dirs
+
+    def watch_prefetch_dirs(self, old: bool, new: bool):
+        self.left.prefetch_dirs = new
+        self.right.prefetch_dirs = new
+        config.prefetch_dirs = new
+
     def action_swap_panels(self):
         self.swapped = not self.swapped
 
@@ -228,6 +347,10 @@ class F2Commander(App):
     # FIXME: left/right are not necessarily FileList; make Optional and handle None
     @property
     def active_filelist(self) -> FileList:
+        if not isinstance(self.right, FileList):
+            return self.left
+        if not isinstance(self.left, FileList):
+            return self.right
         return self.left if self.left.active else self.right
 
     @property
@@ -238,6 +361,30 @@ class F2Commander(App):
     async def on_mount(self, event):
         if not user_has_accepted_license():
             self.action_about()
+        self._update_path_index()
+        self.set_interval(self.PATH_INDEX_INTERVAL, self._update_path_index)
+        self.set_interval(self.FRECENCY_SAVE_INTERVAL, frecency.save)
+
+    def on_unmount(self):
+        frecency.save()
+        profiler.save_trace()
+
+    @work(thread=True, exclusive=True, group="path_index")
+    def _update_path_index(self):
+        worker = get_current_worker()
+        roots = [Path(root).expanduser() for root in config.path_index_roots]
+        path_index.update(roots, lambda: worker.is_cancelled)
+
+    def go_to_dir(self, path: Path):
+        if unindexed_archive(path) is not None:
+            self.active_filelist.open_archive(path)
+        elif is_browsable(path):
+            self.active_filelist.path = path
+        elif not is_available(path):
+            msg = f"{path} is unavailable (not responding)"
+            self.push_screen(StaticDialog.error("Error", msg))
+        else:
+            self.push_screen(StaticDialog.info("Nope...", f"{path} is not a directory"))
 
     @on(FileList.Selected)
     def on_file_selected(self, event: FileList.Selected):
@@ -247,7 +394,34 @@ class F2Commander(App):
 
     def action_view(self):
         src = self.active_filelist.cursor_path
-        if src.is_file():
+        archive_and_name = in_archive(src)
+        if archive_and_name is not None and not is_browsable(src):
+            self.active_filelist.loading = True
+            self._view_archive_member(self.active_filelist, *archive_and_name)
+        else:
+            self._view(src)
+
+    def _view(self, src: Path):
+        if backend_for(src).is_file(src):
+            self.push_screen(Viewer(src, hex=is_binary_file(src)))
+
+    @work(thread=True, exclusive=True, group="view")
+    def _view_archive_member(self, file_list: FileList, archive: Path, name: str):
+        """Extract a member of an archive in background (the archive may have to be
+        read up to the member), then view it"""
+        try:
+            src = extract_to_temp(archive, name)
+        except ARCHIVE_ERRORS as err:
+            msg = f"Cannot extract {name}: {err}"
+            self.call_from_thread(self.push_screen, StaticDialog.error("Error", msg))
+            return
+        finally:
+            self.call_from_thread(setattr, file_list, "loading", False)
+        self.call_from_thread(self._view, src)
+
+    def action_view_external(self):
+        src = self.active_filelist.cursor_path
+        if backend_for(src).is_file(src):
             viewer_cmd = viewer(or_editor=True)
             if viewer_cmd is not None:
                 with self.app.suspend():
@@ -261,7 +435,7 @@ class F2Commander(App):
 
     def action_edit(self):
         src = self.active_filelist.cursor_path
-        if src.is_file():
+        if backend_for(src).is_file(src):
             editor_cmd = editor()
             if editor_cmd is not None:
                 with self.app.suspend():
@@ -278,12 +452,14 @@ class F2Commander(App):
         dst = self.inactive_filelist.path
 
         def on_copy(result: str | None):
-            if result is not None:
+            if result is not None and not self._is_read_only([], Path(result)):
                 for src in sources:
-                    if src.is_dir():
-                        shutil.copytree(src, os.path.join(result, src.name))
-                    else:
-                        shutil.copy2(src, result)
+                    archive_and_name = in_archive(src)
+                    with profiler.span("copy"):
+                        if archive_and_name is not None:
+                            extract(*archive_and_name, Path(result))
+                        else:
+                            backend_for(src).copy(src, Path(result))
                 # FIXME: broken abstraction, at least have a function to reset it?
                 self.active_filelist.selection = set()
                 self.active_filelist.update_listing()
@@ -304,9 +480,10 @@ class F2Commander(App):
         dst = self.inactive_filelist.path
 
         def on_move(result: str | None):
-            if result is not None:
+            if result is not None and not self._is_read_only(sources, Path(result)):
                 for src in sources:
-                    shutil.move(src, result)
+                    with profiler.span("move"):
+                        backend_for(src).move(src, Path(result))
                 self.active_filelist.selection = set()
                 self.active_filelist.update_listing()
                 self.inactive_filelist.update_listing()
@@ -325,9 +502,10 @@ class F2Commander(App):
         paths = self.active_filelist.selected_paths()
 
         def on_delete(result: bool):
-            if result:
+            if result and not self._is_read_only(paths):
                 for path in paths:
-                    send2trash(path)
+                    with profiler.span("trash"):
+                        backend_for(path).trash(path)
                 self.active_filelist.selection = set()
                 self.active_filelist.update_listing()
 
@@ -346,11 +524,315 @@ class F2Commander(App):
             on_delete,
         )
 
+    def action_compress(self):
+        sources = self.active_filelist.selected_paths()
+        if not sources or self._is_read_only(sources):
+            return
+        name = sources[0].name if len(sources) == 1 else self.active_filelist.path.name
+        dst = self.inactive_filelist.path / f"{name}.tar.gz"
+
+        def on_compress(result: str | None):
+            if result is not None and not self._is_read_only([], Path(result).parent):
+                path = Path(result)
+                if path.is_dir():
+                    path = path / f"{name}.tar.gz"
+                self.notify(f"Compressing into {path.name} in the background")
+                self._compress(sources, path)
+
+        msg = (
+            f"Compress {sources[0].name} into"
+            if len(sources) == 1
+            else f"Compress {len(sources)} selected entries into"
+        )
+        self.push_screen(
+            InputDialog(title=msg, value=str(dst), btn_ok="Compress"),
+            on_compress,
+        )
+
+    @work(thread=True, group="compress")
+    def _compress(self, sources: list[Path], dst: Path):
+        """Compress in the background, reporting the progress every few seconds"""
+        started = last_reported = time.monotonic()
+
+        def on_progress(bytes_read: int):
+            nonlocal last_reported
+            now = time.monotonic()
+            if now - last_reported >= self.COMPRESS_PROGRESS_INTERVAL:
+                last_reported = now
+                speed = naturalsize(bytes_read / (now - started))
+                msg = f"{naturalsize(bytes_read)} read, {speed}/s"
+                self.call_from_thread(self.notify, msg, title=f"Compressing {dst.name}")
+
+        try:
+            stats = compress(sources, dst, progress=on_progress)
+        except ValueError as err:  # an unsupported archive type, nothing written
+            dialog = StaticDialog.error("Error", str(err))
+            self.call_from_thread(self.push_screen, dialog)
+            return
+        except OSError as err:
+            dst.unlink(missing_ok=True)
+            msg = f"Cannot compress into {dst}: {err}"
+            self.call_from_thread(self.push_screen, StaticDialog.error("Error", msg))
+            return
+
+        msg = (
+            f"{stats.file_count} files, {naturalsize(stats.bytes_in)} compressed "
+            f"into {naturalsize(stats.bytes_out)} in {stats.seconds:.1f}s "
+            f"({naturalsize(stats.throughput)}/s)"
+        )
+        if stats.skipped:
+            msg += f", {len(stats.skipped)} special files skipped"
+        self.call_from_thread(self.notify, msg, title=f"Compressed {dst.name}")
+        self.call_from_thread(self.active_filelist.update_listing)
+        self.call_from_thread(self.inactive_filelist.update_listing)
+
+    def _is_read_only(self, sources: list[Path], dst: Path | None = None) -> bool:
+        """Archives are read-only: show an error if any of the sources is a member
+        of an archive, or if the destination directory is within an archive"""
+        read_only = any(in_archive(src) is not None for src in sources) or (
+            dst is not None
+            and not backend_for(dst).is_dir(dst)
+            and split_archive_path(dst) is not None
+        )
+        if read_only:
+            self.push_screen(StaticDialog.error("Error", "Archives are read-only"))
+        return read_only
+
+    def action_search_contents(self):
+        root = self.active_filelist.path
+        panel = (
+            self.panel_right if self.active_filelist is self.left else self.panel_left
+        )
+
+        def start_search(pattern: str):
+            panel.query_one(SearchResults).search(root, pattern, self.show_hidden)
+
+        def on_input(pattern: str):
+            if not pattern:
+                return
+            try:
+                compile_pattern(pattern)
+            except ValueError as err:
+                self.push_screen(StaticDialog.error("Invalid pattern", str(err)))
+                return
+            panel.panel_type = "search_results"
+            # the panel is recomposed on refresh, if it had another type:
+            self.call_after_refresh(start_search, pattern)
+
+        self.push_screen(
+            InputDialog(
+                title=f"Search in files in {root} (regular expression)",
+                value="",
+                btn_ok="Search",
+            ),
+            on_input,
+        )
+
+    def action_disk_usage(self):
+        root = self.active_filelist.path
+        if in_archive(root) is not None:
+            msg = "Cannot analyze the disk usage inside an archive"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+        panel = (
+            self.panel_right if self.active_filelist is self.left else self.panel_left
+        )
+        if panel.panel_type == "disk_usage":
+            panel.query_one(DiskUsage).scan(root, self.show_hidden)
+        else:
+            panel.panel_type = "disk_usage"  # scans the other panel when mounted
+
+    async def action_find_duplicates(self):
+        roots = [self.active_filelist.path]
+        if isinstance(self.inactive_filelist, FileList):
+            roots.append(self.inactive_filelist.path)
+        if any(in_archive(root) is not None for root in roots):
+            msg = "Cannot look for duplicates inside an archive"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+        panel = (
+            self.panel_right if self.active_filelist is self.left else self.panel_left
+        )
+        if panel.panel_type != "duplicates":
+            panel.set_reactive(Panel.panel_type, "duplicates")
+            await panel.recompose()
+        panel.query_one(Duplicates).search(roots, self.show_hidden)
+
+    def action_compare_dirs(self):
+        self._start_comparison(by_content=False)
+
+    def action_compare_dirs_by_content(self):
+        self._start_comparison(by_content=True)
+
+    def _start_comparison(self, by_content: bool):
+        left, right = self.left, self.right
+        if not isinstance(left, FileList) or not isinstance(right, FileList):
+            msg = "Both panels must show files to compare them"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+        if left.comparison is not None or right.comparison is not None:
+            left.show_comparison(None, None)
+            right.show_comparison(None, None)
+            return
+        if in_archive(left.path) is not None or in_archive(right.path) is not None:
+            msg = "Cannot compare directories inside an archive"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+        self.notify(f"{left.path} and {right.path}", title="Comparing...")
+        self._compare(left.path, right.path, by_content)
+
+    @work(thread=True, exclusive=True, group="compare")
+    def _compare(self, left_root: Path, right_root: Path, by_content: bool):
+        worker = get_current_worker()
+        started = time.monotonic()
+        try:
+            comparison = compare_trees(
+                left_root,
+                right_root,
+                by_content=by_content,
+                include_hidden=self.show_hidden,
+                is_cancelled=lambda: worker.is_cancelled,
+            )
+        except ValueError as err:
+            self.call_from_thread(
+                self.push_screen, StaticDialog.error("Error", str(err))
+            )
+            return
+        if comparison is not None:
+            elapsed = time.monotonic() - started
+            self.call_from_thread(self._show_comparison, comparison, elapsed)
+
+    def _show_comparison(self, comparison: TreeComparison, elapsed: float):
+        left, right = self.left, self.right
+        if not isinstance(left, FileList) or not isinstance(right, FileList):
+            return  # a panel was changed meanwhile
+        left.show_comparison(comparison, comparison.left)
+        right.show_comparison(comparison, comparison.right)
+        title = f"Compared in {elapsed:.1f}s"
+        self.notify(comparison.summary(), title=title)
+
+    def action_sync_dirs(self):
+        left = self.left
+        comparison = left.comparison if isinstance(left, FileList) else None
+        if comparison is None:
+            msg = "Compare the directories first"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+
+        def on_confirm(direction: SyncDirection, result: bool):
+            if result:
+                self._sync(comparison, direction)
+
+        def on_select(value):
+            if not isinstance(value, str):
+                return
+            direction = SyncDirection(value)
+            copies, conflicts = sync_plan(comparison, direction)
+            msg = f"This will copy {len(copies)} entries"
+            if conflicts:
+                msg += f", and skip {len(conflicts)} conflicts"
+            self.push_screen(
+                StaticDialog(
+                    title="Synchronize?",
+                    message=msg,
+                    btn_ok="Synchronize",
+                    style=Style.WARNING,
+                ),
+                partial(on_confirm, direction),
+            )
+
+        options = [
+            (f"{comparison.left} → {comparison.right}", "left_to_right"),
+            (f"{comparison.left} ← {comparison.right}", "right_to_left"),
+            ("Both ways (newer files win)", "both"),
+        ]
+        self.push_screen(
+            SelectDialog(
+                title="Synchronize the compared directories",
+                options=options,
+                value=Select.BLANK,
+                prompt="Copy the differences",
+            ),
+            on_select,
+        )
+
+    @work(thread=True, exclusive=True, group="sync")
+    def _sync(self, comparison: TreeComparison, direction: SyncDirection):
+        """Synchronize in the background, reporting the progress every few seconds,
+        then compare again"""
+        worker = get_current_worker()
+        last_reported = time.monotonic()
+
+        def on_progress(done: int, total: int):
+            nonlocal last_reported
+            now = time.monotonic()
+            if now - last_reported >= self.SYNC_PROGRESS_INTERVAL:
+                last_reported = now
+                msg = f"{done} of {total} entries copied"
+                self.call_from_thread(self.notify, msg, title="Synchronizing")
+
+        stats = sync(comparison, direction, on_progress, lambda: worker.is_cancelled)
+        msg = f"{stats.copied} entries copied"
+        if stats.skipped:
+            msg += f", {len(stats.skipped)} conflicts skipped"
+        self.call_from_thread(self.notify, msg, title="Synchronized")
+        if stats.errors:
+            msg = "\n".join(stats.errors[:10])
+            error = StaticDialog.error(f"{len(stats.errors)} entries not copied", msg)
+            self.call_from_thread(self.push_screen, error)
+        self.call_from_thread(
+            self._compare, comparison.left, comparison.right, comparison.by_content
+        )
+
+    def action_compare_files(self):
+        left, right = self.left, self.right
+        if not isinstance(left, FileList) or not isinstance(right, FileList):
+            msg = "Both panels must show files to compare them"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+        a, b = left.cursor_path, right.cursor_path
+        if any(in_archive(p) is not None or not p.is_file() for p in (a, b)):
+            msg = "Place the cursors of both panels on the files to compare"
+            self.push_screen(StaticDialog.info("Nope...", msg))
+            return
+        self._compare_files(a, b)
+
+    @work(thread=True, exclusive=True, group="compare_files")
+    def _compare_files(self, a: Path, b: Path):
+        try:
+            stat_a, stat_b = a.stat(), b.stat()
+            is_same_file = (stat_a.st_dev, stat_a.st_ino) == (
+                stat_b.st_dev,
+                stat_b.st_ino,
+            )
+            offset = None if is_same_file else first_difference(a, b)
+        except OSError as err:
+            self.call_from_thread(
+                self.push_screen, StaticDialog.error("Error", str(err))
+            )
+            return
+        if offset is None:
+            msg = f"{a.name} and {b.name} have the same contents"
+            self.call_from_thread(self.push_screen, StaticDialog.info("Same", msg))
+        elif is_binary_file(a) or is_binary_file(b):
+            msg = f"The files differ at byte {offset} (0x{offset:x})"
+            if stat_a.st_size != stat_b.st_size:
+                msg += (
+                    f", and have different sizes ({stat_a.st_size} and "
+                    f"{stat_b.st_size} bytes)"
+                )
+            self.call_from_thread(self.push_screen, StaticDialog.info("Different", msg))
+        else:
+            self.call_from_thread(self.push_screen, DiffViewer(a, b, offset))
+
     def action_mkdir(self):
         def on_mkdir(result: str | None):
-            if result is not None:
+            if result is not None and not self._is_read_only(
+                [], self.active_filelist.path
+            ):
                 new_dir_path = self.active_filelist.path / result
-                new_dir_path.mkdir(parents=True, exist_ok=True)
+                with profiler.span("mkdir"):
+                    backend_for(new_dir_path).mkdir(new_dir_path)
                 self.active_filelist.update_listing()
 
         self.push_screen(
@@ -364,7 +846,7 @@ class F2Commander(App):
             with self.app.suspend():
                 completed_process = subprocess.run(
                     shell_cmd,
-                    cwd=self.active_filelist.path,
+                    cwd=nearest_dir(self.active_filelist.path),
                 )
             self.active_filelist.update_listing()
             self.inactive_filelist.update_listing()
@@ -385,20 +867,9 @@ class F2Commander(App):
     def action_go_to_path(self):
         def on_enter(result: str | None):
             if result is not None:
-                path = Path(result)
-                if path.is_dir():
-                    self.active_filelist.path = path
-                else:
-                    self.push_screen(
-                        StaticDialog.info("Nope...", f"{result} is not a directory")
-                    )
+                self.go_to_dir(Path(result))
 
-        self.push_screen(
-            InputDialog(
-                "Jump to...", value=str(self.active_filelist.path), btn_ok="Go"
-            ),
-            on_enter,
-        )
+        self.push_screen(JumpDialog(value=str(self.active_filelist.path)), on_enter)
 
     def action_quit_confirm(self):
         def on_confirm(result: bool):
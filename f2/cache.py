@@ -0,0 +1,119 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_size: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """A least-recently-used cache, bounded by the total (estimated) size of the
+    cached values and, optionally, by the number of entries. Values are weighed
+    with `weigh` when they are added; `sys.getsizeof` is used by default, which
+    is a shallow estimate, so pass a better function for nested values."""
+
+    def __init__(
+        self,
+        max_size: int,
+        max_entries: int | None = None,
+        weigh: Callable[[Any], int] = sys.getsizeof,
+    ):
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self._weigh = weigh
+        self._data: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V):
+        weight = self._weigh(value)
+        with self._lock:
+            if key in self._data:
+                self._size -= self._data.pop(key)[1]
+            if weight > self.max_size:
+                return  # would evict everything else and still not fit
+            self._data[key] = (value, weight)
+            self._size += weight
+            self._evict()
+
+    def get_or_put(self, key: K, compute: Callable[[], V]) -> V:
+        """Get a value from the cache, or compute, cache and return it"""
+        sentinel = object()
+        value = self.get(key, sentinel)  # type: ignore
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)  # type: ignore
+        return value  # type: ignore
+
+    def pop(self, key: K):
+        with self._lock:
+            if key in self._data:
+                self._size -= self._data.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _evict(self):
+        while self._data and (
+            self._size > self.max_size
+            or (self.max_entries is not None and len(self._data) > self.max_entries)
+        ):
+            _, (_, weight) = self._data.popitem(last=False)
+            self._size -= weight
+            self._evictions += 1
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            entries=len(self._data),
+            size=self._size,
+            max_size=self.max_size,
+        )
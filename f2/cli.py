@@ -0,0 +1,193 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+"""Non-interactive commands (`f2 ls`, `f2 du`, `f2 find`, `f2 cp`), for the scripts
+and for measuring the engines of the app alone. The results are printed as JSON
+lines as soon as they are known. Textual is not imported."""
+
+import argparse
+import json
+import os
+import sys
+import time
+from operator import attrgetter
+from pathlib import Path
+
+from .fs import DirEntry, in_archive, list_dir
+from .fs.archive import extract
+from .fs.backend import backend_for
+from .fs.du import SizeTree
+from .fs.find import QUERY_SYNTAX, FindQuery, find
+
+
+def _emit(record: dict):
+    sys.stdout.write(json.dumps(record) + "\n")
+
+
+def _entry_type(e: DirEntry) -> str:
+    if e.is_link:
+        return "link"
+    elif e.is_dir:
+        return "dir"
+    elif e.is_file:
+        return "file"
+    return "other"
+
+
+def _entry_record(path: Path, e: DirEntry) -> dict:
+    return {
+        "path": str(path),
+        "type": _entry_type(e),
+        "size": e.size,
+        "mtime": e.mtime,
+        "hidden": e.is_hidden,
+        "executable": e.is_executable,
+    }
+
+
+SORT_KEYS = ["name", "size", "mtime"]  # attributes of the entries
+
+
+def _ls(args) -> tuple[int, int]:
+    listing = list_dir(
+        args.path,
+        include_up_dir=False,
+        include_hidden=args.all,
+        glob_expression=args.glob,
+    )
+    entries = listing.entries
+    if args.sort is not None:
+        entries = sorted(entries, key=attrgetter(args.sort), reverse=args.reverse)
+    for e in entries:
+        _emit(_entry_record(args.path / e.name, e))
+    return len(entries), 0
+
+
+def _du(args) -> tuple[int, int]:
+    tree = SizeTree(args.path)
+    for _ in tree.scan(include_hidden=not args.no_hidden):
+        pass
+
+    count = 0
+    to_show = [(0, 0)]  # node and depth, the largest first in every directory
+    while to_show:
+        idx, depth = to_show.pop()
+        _emit(
+            {
+                "path": str(tree.path_of(idx)),
+                "type": "dir" if tree.is_dir(idx) else "file",
+                "size": tree.size(idx),
+                "entries": tree.count(idx),
+            }
+        )
+        count += 1
+        if depth < args.depth:
+            children = tree.largest_children(idx, args.top or len(tree.children(idx)))
+            to_show.extend((child, depth + 1) for child in reversed(children))
+    return count, 0
+
+
+def _find(args) -> tuple[int, int]:
+    query = FindQuery.parse(" ".join(args.query))
+    count = 0
+    for e in find(args.root, query, include_hidden=not args.no_hidden):
+        _emit(_entry_record(args.root / e.name, e))
+        count += 1
+    return count, 0
+
+
+def _cp(args) -> tuple[int, int]:
+    errors = 0
+    for src in args.sources:
+        start = time.perf_counter()
+        record: dict = {"src": str(src), "dst": str(args.destination / src.name)}
+        try:
+            archive_and_name = in_archive(src)
+            if archive_and_name is not None:
+                extract(*archive_and_name, args.destination)
+            else:
+                backend_for(src).copy(src, args.destination)
+            record["status"] = "ok"
+        except OSError as err:
+            record["status"] = "error"
+            record["error"] = str(err)
+            errors += 1
+        record["elapsed"] = time.perf_counter() - start
+        _emit(record)
+    return len(args.sources) - errors, errors
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="f2",
+        description="F2 Commander: run without arguments to start the file manager, "
+        "or run one of the commands to print its results as JSON lines.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the number of results and the elapsed time to stderr",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("ls", help="list a directory (or an archive)")
+    cmd.add_argument("path", type=Path, nargs="?", default=Path("."))
+    cmd.add_argument("-a", "--all", action="store_true", help="include hidden files")
+    cmd.add_argument("-g", "--glob", help="only the entries matching the glob")
+    cmd.add_argument("-s", "--sort", choices=SORT_KEYS)
+    cmd.add_argument("-r", "--reverse", action="store_true")
+    cmd.set_defaults(handler=_ls)
+
+    cmd = commands.add_parser("du", help="disk usage of a directory tree")
+    cmd.add_argument("path", type=Path, nargs="?", default=Path("."))
+    cmd.add_argument(
+        "-d", "--depth", type=int, default=1, help="levels to show (default: 1)"
+    )
+    cmd.add_argument("-n", "--top", type=int, help="largest entries to show per dir")
+    cmd.add_argument("-H", "--no-hidden", action="store_true", help="skip hidden")
+    cmd.set_defaults(handler=_du)
+
+    cmd = commands.add_parser(
+        "find", help="find files by name, size, mtime and type", epilog=QUERY_SYNTAX
+    )
+    cmd.add_argument("root", type=Path)
+    cmd.add_argument("query", nargs="+")
+    cmd.add_argument("-H", "--no-hidden", action="store_true", help="skip hidden")
+    cmd.set_defaults(handler=_find)
+
+    cmd = commands.add_parser("cp", help="copy files and directories into a dir")
+    cmd.add_argument("sources", type=Path, nargs="+")
+    cmd.add_argument("destination", type=Path)
+    cmd.set_defaults(handler=_cp)
+
+    return parser
+
+
+def run(argv: list[str]) -> int:
+    """Run a command, returns the exit status"""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        count, errors = args.handler(args)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # the reader has gone (e.g., `| head`), ignore the rest of the output:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as err:
+        print(f"f2 {args.command}: {err}", file=sys.stderr)
+        return 1
+    if args.stats:
+        elapsed = time.perf_counter() - start
+        stats = {
+            "command": args.command,
+            "results": count,
+            "errors": errors,
+            "elapsed": elapsed,
+        }
+        print(json.dumps(stats), file=sys.stderr)
+    return 1 if errors else 0
@@ -5,18 +5,25 @@
 # Copyright (c) 2024 Timur Rubeko
 
 import ast
+import os
 from pathlib import Path
 
 import dotenv
 import platformdirs
 
+from .profiling import profiler
+
+CONFIG_DIR_ENV = "F2_CONFIG_DIR"  # set to use another configuration directory
+
 
 def config_root() -> Path:
     """Path to the directory that hosts all configuration files"""
 
-    root_dir = platformdirs.user_config_path("f2commander")
+    root_dir = Path(
+        os.environ.get(CONFIG_DIR_ENV) or platformdirs.user_config_path("f2commander")
+    )
     if not root_dir.exists():
-        root_dir.mkdir()
+        root_dir.mkdir(parents=True)
     return root_dir
 
 
@@ -44,17 +51,23 @@ class InstantConfigAttr:
         self._name = name
 
     def __get__(self, obj, type):
-        value = dotenv.get_key(self._conf_path, self._name)
+        with profiler.span("config_get"):
+            value = dotenv.get_key(self._conf_path, self._name)
         return ast.literal_eval(value) if value is not None else self._default
 
     def __set__(self, obj, value):
-        dotenv.set_key(user_config_path(), self._name, repr(value), quote_mode="auto")
+        with profiler.span("config_set"):
+            dotenv.set_key(
+                user_config_path(), self._name, repr(value), quote_mode="auto"
+            )
 
 
 class Config:
     dirs_first = InstantConfigAttr(True)
     order_case_sensitive = InstantConfigAttr(True)
     show_hidden = InstantConfigAttr(False)
+    prefetch_dirs = InstantConfigAttr(False)  # opt-in, lists dirs not entered
+    path_index_roots = InstantConfigAttr([])  # opt-in, crawling takes a while
     bookmarks = InstantConfigAttr(
         [
             str(Path.home()),
@@ -0,0 +1,123 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import heapq
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import config_root
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+
+@dataclass
+class _Visits:
+    count: float
+    last_visit: float
+    lower_path: str  # for the lookups
+    lower_name: str
+
+
+class Frecency:
+    """The directories that the user visits, ranked by how often and how recently
+    they were visited (like in z, autojump, zoxide, etc.), saved in a file.
+
+    The visit counts are decayed once their total is over `max_total`, so that the
+    directories that are not visited anymore are eventually forgotten, and the
+    database stays small enough to be searched in well under a millisecond."""
+
+    def __init__(self, file: Path, max_total: int = 5000):
+        self.file = file
+        self.max_total = max_total
+        self._visits: dict[str, _Visits] | None = None  # loaded on first use
+        self._total = 0.0  # of the visit counts
+        self._dirty = False
+
+    @property
+    def visits(self) -> dict[str, _Visits]:
+        if self._visits is None:
+            self._visits = {}
+            try:
+                with open(self.file, encoding="utf-8", errors="surrogateescape") as f:
+                    for line in f:
+                        count, last_visit, path = line.rstrip("\n").split("\t", 2)
+                        self._add(path, float(count), float(last_visit))
+            except (OSError, ValueError):
+                pass  # start over
+        return self._visits
+
+    def _add(self, path: str, count: float, last_visit: float):
+        lower_path = path.lower()
+        lower_name = os.path.basename(lower_path) or lower_path
+        self.visits[path] = _Visits(count, last_visit, lower_path, lower_name)
+        self._total += count
+
+    def visit(self, path: Path):
+        key = str(path)
+        if "\t" in key or "\n" in key:
+            return  # cannot be saved, and is hardly ever needed
+        visits = self.visits.get(key)
+        if visits is None:
+            self._add(key, 1, time.time())
+        else:
+            visits.count += 1
+            visits.last_visit = time.time()
+            self._total += 1
+        self._dirty = True
+
+        if self._total > self.max_total:
+            factor = 0.9 * self.max_total / self._total
+            for p, v in list(self.visits.items()):
+                v.count *= factor
+                if v.count < 1:
+                    del self.visits[p]
+            self._total = sum(v.count for v in self.visits.values())
+
+    def score(self, path: str, now: float | None = None) -> float:
+        visits = self.visits.get(path)
+        if visits is None:
+            return 0.0
+        age = (now or time.time()) - visits.last_visit
+        if age < HOUR:
+            return visits.count * 4
+        elif age < DAY:
+            return visits.count * 2
+        elif age < WEEK:
+            return visits.count / 2
+        else:
+            return visits.count / 4
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        """Visited directories that match a query (like in `PathIndex.search`),
+        the highest ranked first"""
+        words = query.lower().split()
+        if not words:
+            return []
+        now = time.time()
+        matches = (
+            path
+            for path, v in self.visits.items()
+            if words[-1] in v.lower_name
+            and all(word in v.lower_path for word in words[:-1])
+        )
+        return heapq.nlargest(limit, matches, key=lambda p: self.score(p, now))
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_file = self.file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8", errors="surrogateescape") as f:
+            for path, v in self.visits.items():
+                f.write(f"{v.count}\t{v.last_visit}\t{path}\n")
+        os.replace(tmp_file, self.file)
+        self._dirty = False
+
+
+frecency = Frecency(config_root() / "frecency")
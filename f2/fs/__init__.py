@@ -0,0 +1,384 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import fnmatch
+import os
+import stat
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+from ..profiling import profiler
+from .archive import ARCHIVE_ERRORS, ArchiveMember, open_index, split_archive_path
+from .backend import Entry, backend_for, is_available
+
+
+@dataclass
+class DirList:
+    file_count: int
+    dir_count: int
+    total_size: int
+    entries: list["DirEntry"]
+
+
+@dataclass(slots=True)  # a listing can hold millions of entries
+class DirEntry:
+    name: str
+    size: int
+    mtime: float
+    is_file: bool
+    is_dir: bool
+    is_link: bool
+    is_hidden: bool
+    is_executable: bool
+
+    @classmethod
+    def from_path(cls, p: Path) -> "DirEntry":
+        return cls.from_stat(p.name, p.lstat())
+
+    @classmethod
+    def from_stat(cls, name: str, statinfo: os.stat_result) -> "DirEntry":
+        return DirEntry(
+            name=name,
+            size=statinfo.st_size,
+            mtime=statinfo.st_mtime,
+            is_file=stat.S_ISREG(statinfo.st_mode),
+            is_dir=stat.S_ISDIR(statinfo.st_mode),
+            is_link=stat.S_ISLNK(statinfo.st_mode),
+            is_hidden=is_hidden(Path(name), statinfo),
+            is_executable=is_executable(statinfo),
+        )
+
+    @classmethod
+    def from_archive_member(cls, name: str, member: ArchiveMember) -> "DirEntry":
+        return DirEntry(
+            name=name,
+            size=member.size,
+            mtime=member.mtime,
+            is_file=not member.is_dir,
+            is_dir=member.is_dir,
+            is_link=False,
+            is_hidden=name.startswith("."),
+            is_executable=False,
+        )
+
+
+def has_hidden_attribute(statinfo: os.stat_result) -> bool:
+    if not hasattr(statinfo, "st_file_attributes"):
+        return False
+    if not hasattr(stat, "FILE_ATTRIBUTE_HIDDEN"):
+        return False
+    return bool(
+        statinfo.st_file_attributes & stat.FILE_ATTRIBUTE_HIDDEN  # type: ignore
+    )
+
+
+def has_hidden_flag(statinfo: os.stat_result) -> bool:
+    if not hasattr(stat, "UF_HIDDEN") or not hasattr(statinfo, "st_flags"):
+        return False
+    return bool(statinfo.st_flags & stat.UF_HIDDEN)  # type: ignore
+
+
+def is_hidden(path: Path, statinfo: os.stat_result) -> bool:
+    return (
+        path.name.startswith(".")
+        or has_hidden_attribute(statinfo)
+        or has_hidden_flag(statinfo)
+    )
+
+
+# hidden flags and attributes are only known from a stat call, and only on some OS
+_STAT_HAS_HIDDEN_FLAGS = hasattr(os.stat_result, "st_flags") or hasattr(
+    os.stat_result, "st_file_attributes"
+)
+
+
+def is_hidden_entry(entry: Entry) -> bool:
+    """Same as `is_hidden`, but avoids a stat call where the OS allows it"""
+    if entry.name.startswith("."):
+        return True
+    if not _STAT_HAS_HIDDEN_FLAGS:
+        return False
+    try:
+        statinfo = entry.stat(follow_symlinks=False)
+    except OSError:
+        return False
+    return has_hidden_attribute(statinfo) or has_hidden_flag(statinfo)
+
+
+def is_executable(statinfo: os.stat_result) -> bool:
+    mode = statinfo.st_mode
+    return stat.S_ISREG(mode) and bool(mode & stat.S_IXUSR)
+
+
+def is_binary_file(path: Path, sniff_size: int = 8192) -> bool:
+    """Cheap guess whether a file is binary: whether its first bytes contain a NUL
+    byte, like Git and grep do. Text in UTF-16 or UTF-32 is seen as binary too."""
+    with open(path, "rb") as f:
+        return b"\0" in f.read(sniff_size)
+
+
+@profiler.timed("list_dir")
+def list_dir(
+    path: Path,
+    include_up_dir: bool = True,
+    include_hidden: bool = True,
+    glob_expression: str | None = None,
+) -> DirList:
+    """List a directory, an archive, or a directory within an archive"""
+
+    total_size = 0
+    file_count = 0
+    dir_count = 0
+    entries = []
+
+    fs = backend_for(path)
+    try:
+        dir_entries = fs.scandir(path)
+    except (NotADirectoryError, FileNotFoundError):
+        dir_entries = None
+
+    children: Iterator[DirEntry]
+    if dir_entries is not None:
+        if include_up_dir and path.parent != path:
+            up = DirEntry.from_stat("..", fs.stat(path, follow_symlinks=False))
+            entries.append(up)
+        children = (
+            DirEntry.from_stat(e.name, e.stat(follow_symlinks=False))
+            for e in dir_entries
+        )
+    else:
+        archive_and_name = split_archive_path(path)
+        members = (
+            open_index(archive_and_name[0]).list(archive_and_name[1])
+            if archive_and_name is not None
+            else None
+        )
+        if members is None:
+            raise ValueError(f"{path} is not a directory")
+        if include_up_dir:
+            mtime = archive_and_name[0].stat().st_mtime  # type: ignore
+            up = DirEntry("..", 0, mtime, False, True, False, False, False)
+            entries.append(up)
+        children = (
+            DirEntry.from_archive_member(name, member)
+            for name, member in members.items()
+        )
+
+    for entry in children:
+        if glob_expression and not fnmatch.fnmatch(entry.name, glob_expression):
+            continue
+        if entry.is_hidden and not include_hidden:
+            continue
+        entries.append(entry)
+        total_size += entry.size
+        if entry.is_file:
+            file_count += 1
+        elif entry.is_dir:
+            dir_count += 1
+
+    return DirList(
+        file_count=file_count,
+        dir_count=dir_count,
+        total_size=total_size,
+        entries=entries,
+    )
+
+
+def dir_size(path: Path) -> int:
+    """Total size of the files in a directory tree"""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def in_archive(path: Path) -> tuple[Path, str] | None:
+    """If a path points to a member of an archive, return the path of the archive
+    and the name of the member within the archive"""
+    if backend_for(path).exists(path):
+        return None
+    archive_and_name = split_archive_path(path)
+    if archive_and_name is None or archive_and_name[1] == "":
+        return None
+    return archive_and_name
+
+
+def is_browsable(path: Path) -> bool:
+    """Whether a path can be listed with `list_dir`: a directory, an archive, or a
+    directory within an archive"""
+    if backend_for(path).is_dir(path):
+        return True
+    if not is_available(path):
+        return False
+    archive_and_name = split_archive_path(path)
+    if archive_and_name is None:
+        return False
+    archive, name = archive_and_name
+    try:
+        member = open_index(archive).member(name)
+    except ARCHIVE_ERRORS:
+        return False
+    return member is not None and member.is_dir
+
+
+def nearest_dir(path: Path) -> Path:
+    """The path itself if it is a directory, or its nearest parent directory
+    (e.g., for the paths within archives)"""
+    for p in (path, *path.parents):
+        if backend_for(p).is_dir(p):
+            return p
+    return path
+
+
+def breadth_first_walk(path: Path, include_hidden: bool = True) -> Iterator[Path]:
+    """Walk the directory tree level by level. The directories of the same level
+    are listed concurrently if the file system supports it"""
+    dirs_to_walk = [path]
+    fs = backend_for(path)
+    while dirs_to_walk:
+        next_dirs_to_walk = []
+        for d, listing in fs.scandir_many(dirs_to_walk):
+            if isinstance(listing, OSError):
+                raise listing
+            entries = [e for e in listing if include_hidden or not is_hidden_entry(e)]
+            for e in sorted(entries, key=lambda e: e.name):
+                p = d / e.name
+                if _is_dir_entry(e):
+                    next_dirs_to_walk.append(p)
+                yield p
+        dirs_to_walk = next_dirs_to_walk
+
+
+def parallel_walk(
+    path: Path,
+    include_hidden: bool = True,
+    with_stat: bool = False,
+    workers: int = 8,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Iterator[tuple[Path, list[Entry]]]:
+    """Walk the directory tree, listing the directories in parallel threads. Yields
+    every directory with its entries as soon as it is listed, in no particular
+    order. With `with_stat`, the metadata of the entries is read in the threads
+    too. Symlinks to directories are not followed, and the directories that cannot
+    be read are skipped. The walk stops as soon as `is_cancelled` returns True."""
+
+    fs = backend_for(path)
+
+    def scan(dir_path: Path) -> list[Entry]:
+        try:
+            entries = fs.scandir(dir_path)
+        except OSError:
+            return []
+        if not include_hidden:
+            entries = [e for e in entries if not is_hidden_entry(e)]
+        if with_stat:
+            for e in entries:
+                try:
+                    e.stat(follow_symlinks=False)  # cached by the entry
+                except OSError:
+                    pass
+        return entries
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {executor.submit(scan, path): path}
+        while pending and not is_cancelled():
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_path = pending.pop(future)
+                entries = future.result()
+                for e in entries:
+                    if _is_dir_entry(e) and not e.is_symlink():
+                        sub_path = dir_path / e.name
+                        pending[executor.submit(scan, sub_path)] = sub_path
+                yield dir_path, entries
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _is_dir_entry(entry: Entry) -> bool:
+    try:
+        return entry.is_dir()  # only costs a syscall for symlinks
+    except OSError:
+        return False
+
+
+@dataclass
+class DirTree:
+    """A (partially) walked directory tree. `truncated` is True if some
+    directory entries were not collected into the `children`"""
+
+    name: str
+    is_dir: bool
+    children: list["DirTree"] = field(default_factory=list)
+    truncated: bool = False
+
+    def walk(self, depth: int = 0) -> Iterator[tuple[int, "DirTree"]]:
+        """Pre-order walk over the descendants of this node, with their depth"""
+        for child in self.children:
+            yield depth, child
+            yield from child.walk(depth + 1)
+
+
+def breadth_first_tree(
+    path: Path,
+    max_nodes: int,
+    include_hidden: bool = True,
+    max_dir_entries: int = 4096,
+    timeout: float | None = 0.5,
+) -> DirTree:
+    """Walk the directory tree breadth-first and collect at most `max_nodes`
+    entries into a tree. No directory is scanned once the budget is exhausted.
+
+    At most `max_dir_entries` are read from any single directory (they are then
+    sorted by name), and the walk is abandoned after `timeout` seconds, so that
+    directories with a huge number of entries don't stall the caller. Directories
+    that were not read completely are marked as `truncated`. The directories of the
+    same level are listed concurrently if the file system supports it."""
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    root = DirTree(path.name, is_dir=True)
+    fs = backend_for(path)
+    level = [(root, path)]
+    budget = max_nodes
+
+    def out_of_time():
+        return deadline is not None and time.monotonic() > deadline
+
+    while level and budget > 0 and not out_of_time():
+        next_level = []
+        listings = fs.scandir_many(
+            (p for _, p in level), limit=max_dir_entries + 1, deadline=deadline
+        )
+        for (node, dir_path), (_, listing) in zip(level, listings):
+            if budget <= 0 or out_of_time():
+                break  # a listing cut by the deadline is not shown either
+            if isinstance(listing, OSError):
+                continue
+
+            if len(listing) > max_dir_entries:
+                node.truncated = True
+                del listing[max_dir_entries:]
+            entries = []
+            for i, e in enumerate(listing):
+                if include_hidden or not is_hidden_entry(e):
+                    entries.append(e)
+                # check the time every now and then only, hidden entries included:
+                if i % 256 == 255 and out_of_time():
+                    node.truncated = True
+                    break
+            entries.sort(key=lambda e: e.name)
+            entries = entries[:budget]
+
+            for e in entries:
+                child = DirTree(e.name, is_dir=_is_dir_entry(e))
+                node.children.append(child)
+                if child.is_dir:
+                    next_level.append((child, dir_path / e.name))
+            budget -= len(entries)
+        level = next_level
+
+    return root
@@ -0,0 +1,290 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import atexit
+import shutil
+import stat
+import tarfile
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from ..cache import LRUCache
+from .backend import backend_for
+
+ZIP_SUFFIXES = (".zip", ".whl", ".jar", ".war", ".ear", ".apk", ".egg")
+TAR_SUFFIXES = (
+    ".tar",
+    ".tar.gz",
+    ".tgz",
+    ".tar.bz2",
+    ".tbz",
+    ".tbz2",
+    ".tar.xz",
+    ".txz",
+)
+
+# errors that can be raised when reading a corrupted or an unsupported archive:
+ARCHIVE_ERRORS = (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError)
+
+
+@dataclass
+class ArchiveMember:
+    name: str  # path of the member within the archive, with "/" separators
+    size: int  # uncompressed size
+    mtime: float
+    is_dir: bool
+
+
+@dataclass
+class ArchiveListing:
+    members: list[ArchiveMember]
+    complete: bool  # False if only the first members were listed
+    member_count: int | None  # if known even when not complete
+    total_size: int | None  # same
+
+
+def archive_type(path: Path) -> str | None:
+    """Type of the archive ("zip" or "tar") by the file name, or None"""
+    name = path.name.lower()
+    if name.endswith(ZIP_SUFFIXES):
+        return "zip"
+    elif name.endswith(TAR_SUFFIXES):
+        return "tar"
+    else:
+        return None
+
+
+def _zip_member(info: zipfile.ZipInfo) -> ArchiveMember:
+    return ArchiveMember(
+        name=info.filename.rstrip("/"),
+        size=info.file_size,
+        mtime=time.mktime(info.date_time + (0, 0, -1)),
+        is_dir=info.is_dir(),
+    )
+
+
+def _tar_member(info: tarfile.TarInfo) -> ArchiveMember:
+    return ArchiveMember(
+        name=info.name.rstrip("/"),
+        size=info.size,
+        mtime=info.mtime,
+        is_dir=info.isdir(),
+    )
+
+
+def list_archive(path: Path, limit: int | None = None) -> ArchiveListing:
+    """List the members of an archive, reading as little of it as possible.
+
+    For zip archives only the central directory (at the end of the file) is read.
+    Tar archives have no such index, so the member headers are read one by one,
+    stopping as soon as `limit` members are listed (compressed tar archives still
+    have to be decompressed up to there)."""
+
+    kind = archive_type(path)
+    if kind == "zip":
+        with zipfile.ZipFile(path) as zf:
+            infos = zf.infolist()
+        shown = infos if limit is None else infos[:limit]
+        return ArchiveListing(
+            members=[_zip_member(info) for info in shown],
+            complete=len(shown) == len(infos),
+            member_count=len(infos),
+            total_size=sum(info.file_size for info in infos),
+        )
+    elif kind == "tar":
+        members: list[ArchiveMember] = []
+        complete = True
+        with tarfile.open(path, "r:*") as tf:
+            for info in tf:
+                if limit is not None and len(members) >= limit:
+                    complete = False
+                    break
+                members.append(_tar_member(info))
+        return ArchiveListing(
+            members=members,
+            complete=complete,
+            member_count=len(members) if complete else None,
+            total_size=sum(m.size for m in members) if complete else None,
+        )
+    else:
+        raise ValueError(f"{path} is not a supported archive")
+
+
+def _normalize_name(name: str) -> str | None:
+    """Normalize a member name to a relative "/"-separated path, or return None if
+    the name points outside of the archive (e.g., contains "..")"""
+    parts = [p for p in name.split("/") if p not in ("", ".")]
+    if ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+class ArchiveIndex:
+    """All members of an archive, organized by directories, so that the archive can
+    be browsed like a directory tree. Directories that are not stored in the archive
+    explicitly, but are implied by the member paths, are added as well."""
+
+    def __init__(self, path: Path, members: list[ArchiveMember]):
+        self.path = path
+        mtime = path.stat().st_mtime
+        # directory path ("" for the archive root) -> entry name -> member:
+        self.dirs: dict[str, dict[str, ArchiveMember]] = {"": {}}
+        for member in members:
+            name = _normalize_name(member.name)
+            if not name:
+                continue
+            parent, _, _ = name.rpartition("/")
+            self._add_dirs(parent, mtime)
+            member.name = name
+            if member.is_dir:
+                self._add_dirs(name, member.mtime)
+            self.dirs[parent][name.rpartition("/")[2]] = member
+        self.member_count = len(members)
+
+    def _add_dirs(self, dir_path: str, mtime: float):
+        """Make sure that the directory and all its parents are in the index"""
+        missing = []
+        while dir_path not in self.dirs:
+            self.dirs[dir_path] = {}
+            missing.append(dir_path)
+            dir_path = dir_path.rpartition("/")[0]
+        for dir_path in missing:
+            parent, _, name = dir_path.rpartition("/")
+            self.dirs[parent].setdefault(
+                name, ArchiveMember(dir_path, size=0, mtime=mtime, is_dir=True)
+            )
+
+    def list(self, dir_path: str) -> dict[str, ArchiveMember] | None:
+        """Entries of a directory within the archive, by name, or None if there is
+        no such directory"""
+        return self.dirs.get(dir_path)
+
+    def member(self, name: str) -> ArchiveMember | None:
+        if name == "":
+            return ArchiveMember("", size=0, mtime=0, is_dir=True)
+        parent, _, base_name = name.rpartition("/")
+        return self.dirs.get(parent, {}).get(base_name)
+
+    def walk(self, dir_path: str) -> Iterator[ArchiveMember]:
+        """All members under a directory within the archive, recursively"""
+        for member in self.dirs.get(dir_path, {}).values():
+            yield member
+            if member.is_dir:
+                yield from self.walk(member.name)
+
+
+# Indexes of the recently browsed archives; reading the index of a large tar
+# archive requires to read the entire archive, so it is only done once.
+_indexes: LRUCache[tuple, ArchiveIndex] = LRUCache(
+    64 * 1024 * 1024, weigh=lambda index: 256 * index.member_count
+)
+
+
+def _index_key(path: Path) -> tuple:
+    statinfo = backend_for(path).stat(path)
+    return (path, statinfo.st_size, statinfo.st_mtime_ns)
+
+
+def open_index(path: Path) -> ArchiveIndex:
+    """Get the (cached) index of an archive"""
+    return _indexes.get_or_put(
+        _index_key(path), lambda: ArchiveIndex(path, list_archive(path).members)
+    )
+
+
+def unindexed_archive(path: Path) -> Path | None:
+    """The archive that a path points to (or inside of), if the index of the archive
+    is not built yet: browsing the path builds it, which takes a while for a large
+    tar archive"""
+    archive_and_name = split_archive_path(path)
+    if archive_and_name is None:
+        return None
+    try:
+        key = _index_key(archive_and_name[0])
+    except OSError:
+        return None
+    return archive_and_name[0] if _indexes.get(key) is None else None
+
+
+def split_archive_path(path: Path) -> tuple[Path, str] | None:
+    """Split a path that points inside of an archive into the path of the archive
+    and the (normalized) path of a member within the archive. Returns None if the
+    path is not in an archive (or points outside of it with ".."). For example:
+    /a/b.zip/c/d -> (/a/b.zip, "c/d")."""
+    for candidate in (path, *path.parents):
+        try:
+            statinfo = backend_for(candidate).stat(candidate)
+        except OSError:
+            continue  # does not exist (or is unavailable)
+        if stat.S_ISREG(statinfo.st_mode) and archive_type(candidate) is not None:
+            name = _normalize_name(path.relative_to(candidate).as_posix())
+            return (candidate, name) if name is not None else None  # not if ".."
+        return None
+    return None
+
+
+def extract(archive: Path, name: str, dst_dir: Path) -> Path:
+    """Extract a single member of an archive (a file, or a directory with all its
+    content) into a given directory. Only that member is decompressed (though, in
+    a compressed tar archive, everything that precedes it still has to be read).
+    Returns the path of the extracted file or directory."""
+
+    index = open_index(archive)
+    root = index.member(name)
+    if root is None:
+        raise FileNotFoundError(f"{name} not found in {archive}")
+    base_name = name.rpartition("/")[2] or archive.name
+    dst = dst_dir / base_name
+
+    wanted: dict[str, Path] = {}  # member name -> where to extract it
+    if not root.is_dir:
+        wanted[name] = dst
+    else:
+        dst.mkdir(exist_ok=True)
+        for member in index.walk(name):
+            sub_dst = dst / member.name.removeprefix(name + "/")
+            if member.is_dir:
+                sub_dst.mkdir(parents=True, exist_ok=True)
+            else:
+                wanted[member.name] = sub_dst
+
+    if archive_type(archive) == "zip":
+        with zipfile.ZipFile(archive) as zf:
+            for zinfo in zf.infolist():
+                member_dst = wanted.pop(_normalize_name(zinfo.filename) or "", None)
+                if member_dst is not None and not zinfo.is_dir():
+                    with zf.open(zinfo) as src, open(member_dst, "wb") as dst_file:
+                        shutil.copyfileobj(src, dst_file)
+    else:
+        with tarfile.open(archive, "r:*") as tf:
+            for tinfo in tf:
+                if not wanted:
+                    break  # stop reading the archive as soon as possible
+                member_dst = wanted.pop(_normalize_name(tinfo.name) or "", None)
+                tar_src = tf.extractfile(tinfo) if tinfo.isfile() else None
+                if member_dst is not None and tar_src is not None:
+                    with tar_src, open(member_dst, "wb") as dst_file:
+                        shutil.copyfileobj(tar_src, dst_file)
+
+    return dst
+
+
+_temp_dir: Path | None = None
+
+
+def extract_to_temp(archive: Path, name: str) -> Path:
+    """Extract a single member into a temporary directory (e.g., to view it). The
+    directory is removed when the application exits."""
+    global _temp_dir
+    if _temp_dir is None:
+        _temp_dir = Path(tempfile.mkdtemp(prefix="f2-"))
+        atexit.register(shutil.rmtree, _temp_dir, ignore_errors=True)
+    dst_dir = Path(tempfile.mkdtemp(dir=_temp_dir))
+    return extract(archive, name, dst_dir)
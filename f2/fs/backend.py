@@ -0,0 +1,541 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import errno
+import itertools
+import os
+import queue
+import shutil
+import stat
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Protocol, Sequence, TypeVar
+
+from send2trash import send2trash
+
+T = TypeVar("T")
+
+
+class Entry(Protocol):
+    """A directory entry, as returned by `FileSystem.scandir`. `os.DirEntry`
+    implements it, and so can the entries of other file systems."""
+
+    @property
+    def name(self) -> str: ...
+
+    def is_dir(self) -> bool: ...
+
+    def is_symlink(self) -> bool: ...
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result: ...
+
+
+class FileSystem(ABC):
+    """A file system backend.
+
+    The interface is designed for the backends where every request is a round trip
+    with a high latency (network mounts, remote storages, etc.): a directory is
+    listed with the metadata of all its entries at once, the metadata of many paths
+    is requested in a single batch, and when several directories are to be listed
+    (e.g., when walking a tree), the requests are pipelined, so that the total time
+    is not a sum of all the latencies."""
+
+    PIPELINE_DEPTH = 8  # at most this many requests are in flight at a time
+
+    @abstractmethod
+    def scandir(
+        self, path: Path, limit: int | None = None, deadline: float | None = None
+    ) -> list[Entry]:
+        """List a directory with the metadata of its entries. At most `limit`
+        entries are returned, if given, and the listing may stop early (with the
+        entries listed so far) once the `deadline` (in `time.monotonic()` time)
+        has passed. Raises `NotADirectoryError` if the path is not a directory, and
+        `FileNotFoundError` if it does not exist."""
+
+    @abstractmethod
+    def stat_many(
+        self, paths: Sequence[Path], follow_symlinks: bool = True
+    ) -> list[os.stat_result | OSError]:
+        """Metadata of many paths, requested at once, in the same order"""
+
+    def stat(self, path: Path, follow_symlinks: bool = True) -> os.stat_result:
+        result = self.stat_many([path], follow_symlinks)[0]
+        if isinstance(result, OSError):
+            raise result
+        return result
+
+    def exists(self, path: Path) -> bool:
+        try:
+            self.stat(path)
+            return True
+        except OSError:
+            return False
+
+    def is_dir(self, path: Path) -> bool:
+        try:
+            return stat.S_ISDIR(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def is_file(self, path: Path) -> bool:
+        try:
+            return stat.S_ISREG(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def resolve(self, path: Path) -> Path:
+        """Absolute path, without the ".." components (and the symlinks, if the file
+        system has them)"""
+        return Path(os.path.normpath(path.absolute()))
+
+    def scandir_many(
+        self,
+        paths: Iterable[Path],
+        limit: int | None = None,
+        deadline: float | None = None,
+    ) -> Iterator[tuple[Path, list[Entry] | OSError]]:
+        """List many directories, yielding the listings in order as they arrive.
+        Up to `PIPELINE_DEPTH` directories are listed concurrently. Stopping the
+        iteration early abandons the outstanding requests."""
+        executor = ThreadPoolExecutor(max_workers=self.PIPELINE_DEPTH)
+        pending: deque[tuple[Path, Future[list[Entry]]]] = deque()
+        try:
+            paths_iter = iter(paths)
+            for path in paths_iter:
+                pending.append(
+                    (path, executor.submit(self.scandir, path, limit, deadline))
+                )
+                if len(pending) >= self.PIPELINE_DEPTH:
+                    break
+            while pending:
+                path, future = pending.popleft()
+                try:
+                    yield path, future.result()
+                except OSError as err:
+                    yield path, err
+                for path in paths_iter:  # keep the pipeline full
+                    pending.append(
+                        (path, executor.submit(self.scandir, path, limit, deadline))
+                    )
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @abstractmethod
+    def copy(self, src: Path, dst_dir: Path):
+        """Copy a file or a directory (recursively) into a given directory"""
+
+    @abstractmethod
+    def move(self, src: Path, dst: Path):
+        """Move a file or a directory into a given directory, or rename it"""
+
+    @abstractmethod
+    def trash(self, path: Path):
+        """Move a file or a directory to trash, or delete it if not supported"""
+
+    @abstractmethod
+    def mkdir(self, path: Path):
+        """Create a directory and its missing parents"""
+
+
+#
+# UNRESPONSIVE MOUNTS:
+#
+# A system call on a mount that stopped responding (e.g., a dead NFS server) may
+# block forever. Metadata probes on the local file system are made in a few
+# (daemon) threads per mount, and are abandoned after a timeout. The mount is then
+# considered unavailable for a while, and the probes of its paths fail at once.
+
+PROBE_TIMEOUT = 2.0  # sec.
+PROBE_WORKERS = 4  # threads per mount, that is as many hung probes at most
+UNAVAILABLE_FOR = 30.0  # sec., before a mount that timed out is probed again
+SCANDIR_BATCH = 1024  # entries listed per probe
+_MOUNTS_TTL = 10.0  # sec., before the list of mount points is read again
+
+
+class UnavailableError(TimeoutError):
+    """The file system did not respond in time"""
+
+
+class _Prober:
+    """Runs the probes of a mount in at most `PROBE_WORKERS` threads. The threads
+    are daemon threads (unlike the ones of a `ThreadPoolExecutor`), so that a hung
+    probe does not prevent the app from exiting."""
+
+    def __init__(self, mount: Path):
+        self._mount = mount
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._idle = 0
+        self._queued = 0
+
+    def submit(self, probe: Callable[[], T]) -> Future[T]:
+        future: Future[T] = Future()
+        with self._lock:
+            self._queue.put((future, probe))
+            self._queued += 1
+            if self._queued > self._idle and self._workers < PROBE_WORKERS:
+                self._workers += 1
+                name = f"f2-probe {self._mount}"
+                threading.Thread(target=self._work, name=name, daemon=True).start()
+        return future
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            future, probe = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+                self._queued -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(probe())
+            except BaseException as err:
+                future.set_exception(err)
+
+
+_mount_points: tuple[float, set[Path]] | None = None  # (read at, mount points)
+_unavailable: dict[Path, float] = {}  # mount point -> until when it is unavailable
+_probers: dict[Path, _Prober] = {}
+_probers_lock = threading.Lock()
+
+
+def _read_mount_points() -> set[Path]:
+    """Mount points listed in /proc (Linux), or an empty set if not known"""
+    try:
+        with open("/proc/self/mounts", "rb") as f:
+            lines = f.read().decode(errors="replace").splitlines()
+    except OSError:
+        return set()
+    mount_points = set()
+    for line in lines:
+        fields = line.split()
+        if len(fields) > 1:
+            # spaces, tabs, etc. are escaped as octal codes:
+            name = fields[1].encode("latin-1", "replace").decode("unicode_escape")
+            mount_points.add(Path(name))
+    return mount_points
+
+
+def mount_point(path: Path) -> Path:
+    """Mount point of a path, found without any system calls on the path itself.
+    Where mount points are not known, the volumes on macOS (/Volumes/*), and the
+    path anchor otherwise (e.g., the drive on Windows) are used instead."""
+    global _mount_points
+    if _mount_points is None or time.monotonic() - _mount_points[0] > _MOUNTS_TTL:
+        _mount_points = (time.monotonic(), _read_mount_points())
+    mount_points = _mount_points[1]
+    path = path.absolute()
+    if mount_points:
+        for p in (path, *path.parents):
+            if p in mount_points:
+                return p
+    if len(path.parts) > 2 and path.parts[1] == "Volumes":
+        return Path(*path.parts[:3])
+    return Path(path.anchor)
+
+
+def is_available(path: Path) -> bool:
+    """False if the file system of a path did not respond to a recent probe"""
+    until = _unavailable.get(mount_point(path))
+    return until is None or until < time.monotonic()
+
+
+def guarded(path: Path, probe: Callable[[], T], timeout: float = PROBE_TIMEOUT) -> T:
+    """Run a probe of a path (e.g., a stat call) with a timeout. Raises
+    `UnavailableError` if the mount of the path does not respond in time, or did
+    not respond recently."""
+
+    mount = mount_point(path)
+    until = _unavailable.get(mount)
+    if until is not None and until >= time.monotonic():
+        raise UnavailableError(errno.ETIMEDOUT, f"{mount} is unavailable", str(path))
+
+    with _probers_lock:
+        if mount not in _probers:
+            _probers[mount] = _Prober(mount)
+        prober = _probers[mount]
+    future = prober.submit(probe)
+    if not wait([future], timeout).done:
+        future.cancel()  # if still queued behind the hung probes
+        _unavailable[mount] = time.monotonic() + UNAVAILABLE_FOR
+        raise UnavailableError(errno.ETIMEDOUT, f"{mount} is unavailable", str(path))
+
+    _unavailable.pop(mount, None)
+    return future.result()
+
+
+def _next_entries(path: Path, it, count: int) -> tuple:
+    """Next entries of a listing (opened first if `it` is None), with their metadata
+    read (and cached by them). The listing is closed once it is read completely."""
+    if it is None:
+        it = os.scandir(path)
+    try:
+        entries = list(itertools.islice(it, count))
+        for e in entries:
+            try:
+                e.stat(follow_symlinks=False)
+            except OSError:
+                pass
+    except BaseException:
+        it.close()
+        raise
+    if len(entries) < count:
+        it.close()
+    return it, entries
+
+
+class LocalFileSystem(FileSystem):
+    """OS file system. Local system calls are cheap, and are not pipelined, but the
+    metadata probes are guarded against the unresponsive mounts"""
+
+    def scandir(
+        self, path: Path, limit: int | None = None, deadline: float | None = None
+    ) -> list[Entry]:
+        # listed in batches, so that a large directory does not time out (if a
+        # batch does, the listing is left to the hung probe that is reading it):
+        it = None
+        entries: list[Entry] = []
+        while limit is None or len(entries) < limit:
+            if it is not None and deadline is not None and time.monotonic() > deadline:
+                break
+            count = SCANDIR_BATCH
+            if limit is not None:
+                count = min(count, limit - len(entries))
+            it, batch = guarded(path, partial(_next_entries, path, it, count))
+            entries.extend(batch)
+            if len(batch) < count:
+                return entries  # closed once read
+        if it is not None:
+            it.close()
+        return entries
+
+    def stat_many(
+        self, paths: Sequence[Path], follow_symlinks: bool = True
+    ) -> list[os.stat_result | OSError]:
+        results: list[os.stat_result | OSError] = []
+        for path in paths:
+            try:
+                probe = partial(os.stat, path, follow_symlinks=follow_symlinks)
+                results.append(guarded(path, probe))
+            except OSError as err:
+                results.append(err)
+        return results
+
+    def is_dir(self, path: Path) -> bool:
+        try:
+            return guarded(path, path.is_dir)
+        except UnavailableError:
+            return False
+
+    def resolve(self, path: Path) -> Path:
+        return guarded(path, path.resolve)
+
+    def scandir_many(
+        self,
+        paths: Iterable[Path],
+        limit: int | None = None,
+        deadline: float | None = None,
+    ) -> Iterator[tuple[Path, list[Entry] | OSError]]:
+        for path in paths:
+            try:
+                yield path, self.scandir(path, limit, deadline)
+            except OSError as err:
+                yield path, err
+
+    def copy(self, src: Path, dst_dir: Path):
+        if src.is_dir():
+            shutil.copytree(src, dst_dir / src.name)
+        else:
+            shutil.copy2(src, dst_dir)
+
+    def move(self, src: Path, dst: Path):
+        shutil.move(src, dst)
+
+    def trash(self, path: Path):
+        send2trash(path)
+
+    def mkdir(self, path: Path):
+        path.mkdir(parents=True, exist_ok=True)
+
+
+@dataclass
+class _MemoryNode:
+    mode: int
+    mtime: float
+    data: bytes = b""
+    children: dict[str, "_MemoryNode"] = field(default_factory=dict)
+
+    def stat(self) -> os.stat_result:
+        size = len(self.data)
+        return os.stat_result((self.mode, 0, 0, 1, 0, 0, size, 0, self.mtime, 0))
+
+
+@dataclass
+class _MemoryEntry:
+    name: str
+    _stat: os.stat_result
+
+    def is_dir(self) -> bool:
+        return stat.S_ISDIR(self._stat.st_mode)
+
+    def is_symlink(self) -> bool:
+        return False
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        return self._stat
+
+
+class MemoryFileSystem(FileSystem):
+    """A file system held in memory, rooted at a given path. Every request waits
+    for `latency` seconds first, to simulate a remote file system (e.g., to test
+    and to measure how the application copes with it)."""
+
+    def __init__(self, root: Path, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        self._root = _MemoryNode(stat.S_IFDIR | 0o755, time.time())
+        self._lock = threading.Lock()
+
+    def _request(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _node(self, path: Path) -> _MemoryNode:
+        try:
+            parts = path.relative_to(self.root).parts
+        except ValueError:
+            raise FileNotFoundError(errno.ENOENT, "Not in this file system", str(path))
+        node = self._root
+        for part in parts:
+            if part not in node.children:
+                raise FileNotFoundError(
+                    errno.ENOENT, os.strerror(errno.ENOENT), str(path)
+                )
+            node = node.children[part]
+        return node
+
+    def _parent_dir(self, path: Path) -> _MemoryNode:
+        parent = self._node(path.parent)
+        if not stat.S_ISDIR(parent.mode):
+            raise NotADirectoryError(
+                errno.ENOTDIR, os.strerror(errno.ENOTDIR), str(path)
+            )
+        return parent
+
+    def add_file(self, path: Path, data: bytes = b"", mtime: float | None = None):
+        """Create a file, and its parent directories if needed (without latency)"""
+        with self._lock:
+            self._mkdir(path.parent)
+            node = _MemoryNode(stat.S_IFREG | 0o644, mtime or time.time(), data)
+            self._parent_dir(path).children[path.name] = node
+
+    def _mkdir(self, path: Path):
+        node = self._root
+        for part in path.relative_to(self.root).parts:
+            node = node.children.setdefault(
+                part, _MemoryNode(stat.S_IFDIR | 0o755, time.time())
+            )
+            if not stat.S_ISDIR(node.mode):
+                raise FileExistsError(
+                    errno.EEXIST, os.strerror(errno.EEXIST), str(path)
+                )
+
+    def scandir(
+        self, path: Path, limit: int | None = None, deadline: float | None = None
+    ) -> list[Entry]:
+        self._request()
+        with self._lock:
+            node = self._node(path)
+            if not stat.S_ISDIR(node.mode):
+                msg = os.strerror(errno.ENOTDIR)
+                raise NotADirectoryError(errno.ENOTDIR, msg, str(path))
+            children = list(node.children.items())[:limit]
+            return [_MemoryEntry(name, child.stat()) for name, child in children]
+
+    def stat_many(
+        self, paths: Sequence[Path], follow_symlinks: bool = True
+    ) -> list[os.stat_result | OSError]:
+        self._request()
+        results: list[os.stat_result | OSError] = []
+        with self._lock:
+            for path in paths:
+                try:
+                    results.append(self._node(path).stat())
+                except OSError as err:
+                    results.append(err)
+        return results
+
+    def copy(self, src: Path, dst_dir: Path):
+        self._request()
+        with self._lock:
+            node = self._node(src)
+            target = self._node(dst_dir)
+            if not stat.S_ISDIR(target.mode):
+                msg = os.strerror(errno.ENOTDIR)
+                raise NotADirectoryError(errno.ENOTDIR, msg, str(dst_dir))
+            target.children[src.name] = _copy_node(node)
+
+    def move(self, src: Path, dst: Path):
+        self._request()
+        with self._lock:
+            node = self._node(src)
+            try:
+                target = self._node(dst)
+            except FileNotFoundError:
+                target = None
+            if target is not None and stat.S_ISDIR(target.mode):
+                target.children[src.name] = node
+            else:
+                self._parent_dir(dst).children[dst.name] = node
+            del self._parent_dir(src).children[src.name]
+
+    def trash(self, path: Path):
+        self._request()
+        with self._lock:
+            self._node(path)
+            del self._parent_dir(path).children[path.name]
+
+    def mkdir(self, path: Path):
+        self._request()
+        with self._lock:
+            self._mkdir(path)
+
+
+def _copy_node(node: _MemoryNode) -> _MemoryNode:
+    children = {name: _copy_node(child) for name, child in node.children.items()}
+    return _MemoryNode(node.mode, node.mtime, node.data, children)
+
+
+# File systems other than the local one are mounted at some path:
+local = LocalFileSystem()
+_mounts: dict[Path, FileSystem] = {}
+
+
+def mount(path: Path, fs: FileSystem):
+    _mounts[path] = fs
+
+
+def unmount(path: Path):
+    _mounts.pop(path, None)
+
+
+def backend_for(path: Path) -> FileSystem:
+    """The file system a given path belongs to"""
+    if _mounts:
+        for p in (path, *path.parents):
+            if p in _mounts:
+                return _mounts[p]
+    return local
@@ -0,0 +1,291 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import filecmp
+import os
+import posixpath
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Callable
+
+from . import parallel_walk
+from .backend import LocalFileSystem, backend_for
+
+# modification times closer than that are the same (FAT stores them in 2 seconds):
+MTIME_TOLERANCE = 2.0
+
+
+class Diff(Enum):
+    """How an entry differs between the left and the right trees"""
+
+    LEFT_ONLY = "left only"
+    RIGHT_ONLY = "right only"
+    LEFT_NEWER = "newer on the left"
+    RIGHT_NEWER = "newer on the right"
+    DIFFERENT = "different"  # but modified at the same time
+    KIND = "a file on one side, a directory on the other"
+    CONTAINS = "contains differences"  # a directory
+
+    @property
+    def mirrored(self) -> "Diff":
+        """Same difference, seen from the right tree"""
+        return _MIRRORED.get(self, self)
+
+
+_MIRRORED = {
+    Diff.LEFT_ONLY: Diff.RIGHT_ONLY,
+    Diff.RIGHT_ONLY: Diff.LEFT_ONLY,
+    Diff.LEFT_NEWER: Diff.RIGHT_NEWER,
+    Diff.RIGHT_NEWER: Diff.LEFT_NEWER,
+}
+
+
+class SyncDirection(Enum):
+    LEFT_TO_RIGHT = "left_to_right"
+    RIGHT_TO_LEFT = "right_to_left"
+    BOTH = "both"
+
+
+@dataclass
+class TreeComparison:
+    left: Path
+    right: Path
+    diffs: dict[str, Diff]  # by relative path (with "/"), the differences only
+    by_content: bool = False
+
+    def diff_of(self, root: Path, path: Path) -> Diff | None:
+        """How a path in one of the trees differs from the other tree, as seen from
+        the tree of the `root` (that is, "left" is the tree of the `root`)"""
+        try:
+            rel = path.relative_to(root).as_posix()
+        except ValueError:
+            return None
+        diff = self.diffs.get(rel)
+        return diff.mirrored if diff is not None and root == self.right else diff
+
+    def summary(self) -> str:
+        counts: dict[Diff, int] = {}
+        for diff in self.diffs.values():
+            if diff != Diff.CONTAINS:
+                counts[diff] = counts.get(diff, 0) + 1
+        if not counts:
+            return "no differences"
+        return ", ".join(f"{count} {diff.value}" for diff, count in counts.items())
+
+
+# is_dir, size, mtime of every entry of a tree, by relative path:
+_Snapshot = dict[str, tuple[bool, int, float]]
+
+
+def _snapshot(
+    root: Path, include_hidden: bool, is_cancelled: Callable[[], bool]
+) -> _Snapshot:
+    snapshot: _Snapshot = {}
+    for dir_path, entries in parallel_walk(
+        root, include_hidden=include_hidden, with_stat=True, is_cancelled=is_cancelled
+    ):
+        prefix = dir_path.relative_to(root).as_posix()
+        for e in entries:
+            try:
+                statinfo = e.stat(follow_symlinks=False)  # cached by the walk
+            except OSError:
+                continue
+            rel = e.name if prefix == "." else f"{prefix}/{e.name}"
+            is_dir = stat.S_ISDIR(statinfo.st_mode)
+            snapshot[rel] = (is_dir, statinfo.st_size, statinfo.st_mtime)
+    return snapshot
+
+
+def _by_mtime(left_mtime: float, right_mtime: float) -> Diff:
+    if left_mtime - right_mtime > MTIME_TOLERANCE:
+        return Diff.LEFT_NEWER
+    elif right_mtime - left_mtime > MTIME_TOLERANCE:
+        return Diff.RIGHT_NEWER
+    return Diff.DIFFERENT
+
+
+def compare_trees(
+    left: Path,
+    right: Path,
+    by_content: bool = False,
+    include_hidden: bool = True,
+    workers: int = 8,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> TreeComparison | None:
+    """Compare two directory trees. Both trees are scanned concurrently, then
+    compared in a single pass over their sorted paths. The files are the same if
+    they have the same size and modification time or, with `by_content`, if they
+    have the same size and contents (compared in parallel). Returns None if
+    cancelled."""
+
+    for root in (left, right):
+        if not isinstance(backend_for(root), LocalFileSystem):
+            raise ValueError(f"Cannot compare {root}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scans = [
+            executor.submit(_snapshot, root, include_hidden, is_cancelled)
+            for root in (left, right)
+        ]
+        left_tree, right_tree = (scan.result() for scan in scans)
+        if is_cancelled():
+            return None
+
+        diffs: dict[str, Diff] = {}
+        to_read: list[str] = []  # same size, contents to compare
+        left_paths, right_paths = sorted(left_tree), sorted(right_tree)
+        i = j = 0
+        while i < len(left_paths) or j < len(right_paths):
+            if j == len(right_paths) or (
+                i < len(left_paths) and left_paths[i] < right_paths[j]
+            ):
+                diffs[left_paths[i]] = Diff.LEFT_ONLY
+                i += 1
+                continue
+            if i == len(left_paths) or right_paths[j] < left_paths[i]:
+                diffs[right_paths[j]] = Diff.RIGHT_ONLY
+                j += 1
+                continue
+            rel = left_paths[i]
+            i += 1
+            j += 1
+            l_dir, l_size, l_mtime = left_tree[rel]
+            r_dir, r_size, r_mtime = right_tree[rel]
+            if l_dir != r_dir:
+                diffs[rel] = Diff.KIND
+            elif l_dir:
+                continue  # the same, unless their entries differ
+            elif l_size != r_size:
+                diffs[rel] = _by_mtime(l_mtime, r_mtime)
+            elif by_content:
+                to_read.append(rel)
+            elif abs(l_mtime - r_mtime) > MTIME_TOLERANCE:
+                diffs[rel] = _by_mtime(l_mtime, r_mtime)
+
+        if to_read:
+            same = executor.map(
+                lambda rel: _same_contents(left / rel, right / rel), to_read
+            )
+            for rel, is_same in zip(to_read, same):
+                if not is_same:
+                    diffs[rel] = _by_mtime(left_tree[rel][2], right_tree[rel][2])
+        if is_cancelled():
+            return None
+
+    # mark the directories with differences inside:
+    for rel in list(diffs):
+        parent = posixpath.dirname(rel)
+        while parent and parent not in diffs:
+            diffs[parent] = Diff.CONTAINS
+            parent = posixpath.dirname(parent)
+    if diffs:
+        diffs["."] = Diff.CONTAINS
+    return TreeComparison(left, right, diffs, by_content)
+
+
+def _same_contents(a: Path, b: Path) -> bool:
+    try:
+        return filecmp.cmp(a, b, shallow=False)
+    except OSError:
+        return False
+
+
+@dataclass
+class SyncStats:
+    copied: int = 0
+    skipped: list[str] = field(default_factory=list)  # conflicts
+    errors: list[str] = field(default_factory=list)
+
+
+def sync_plan(
+    comparison: TreeComparison, direction: SyncDirection
+) -> tuple[list[tuple[Path, Path]], list[str]]:
+    """What to copy to synchronize the trees (source and destination paths), and
+    the conflicts that are left as is.
+
+    One-way synchronization copies all entries that are missing or different in
+    the destination; two-way synchronization copies the entries missing on either
+    side, and the newer files over the older ones. Nothing is ever deleted, and
+    the files that differ while modified at the same time are conflicts in a
+    two-way synchronization (as are files that are directories on the other side,
+    in all cases)."""
+
+    copies: list[tuple[Path, Path]] = []
+    conflicts: list[str] = []
+    done: set[str] = set()  # entries copied (or skipped) with their contents
+    for rel in sorted(comparison.diffs):
+        if _has_ancestor_in(rel, done):
+            continue
+        diff = comparison.diffs[rel]
+        if diff == Diff.CONTAINS:
+            continue
+        if diff == Diff.KIND or (
+            diff == Diff.DIFFERENT and direction == SyncDirection.BOTH
+        ):
+            conflicts.append(rel)
+            done.add(rel)
+            continue
+        if direction == SyncDirection.BOTH:
+            to_right = diff in (Diff.LEFT_ONLY, Diff.LEFT_NEWER)
+        else:
+            to_right = direction == SyncDirection.LEFT_TO_RIGHT
+            if diff == (Diff.RIGHT_ONLY if to_right else Diff.LEFT_ONLY):
+                continue  # only in the destination, kept as is
+        left, right = comparison.left / rel, comparison.right / rel
+        copies.append((left, right) if to_right else (right, left))
+        done.add(rel)
+    return copies, conflicts
+
+
+def _has_ancestor_in(rel: str, paths: set[str]) -> bool:
+    parent = posixpath.dirname(rel)
+    while parent:
+        if parent in paths:
+            return True
+        parent = posixpath.dirname(parent)
+    return False
+
+
+def sync(
+    comparison: TreeComparison,
+    direction: SyncDirection,
+    on_progress: Callable[[int, int], None] = lambda done, total: None,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> SyncStats:
+    """Synchronize the compared trees, copying only what differs (see
+    `sync_plan`). The files are copied with their modification times, so that
+    they are the same in the next comparison, and replace the older files only
+    once copied entirely."""
+    copies, conflicts = sync_plan(comparison, direction)
+    stats = SyncStats(skipped=conflicts)
+    for src, dst in copies:
+        if is_cancelled():
+            break
+        try:
+            _copy(src, dst)
+            stats.copied += 1
+        except OSError as err:
+            stats.errors.append(f"{src}: {err}")
+        on_progress(stats.copied, len(copies))
+    return stats
+
+
+def _copy(src: Path, dst: Path):
+    if src.is_dir() and not src.is_symlink():
+        shutil.copytree(src, dst, symlinks=True)
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dst = dst.with_name(f".{dst.name}.f2sync")
+    try:
+        shutil.copy2(src, tmp_dst, follow_symlinks=False)
+        os.replace(tmp_dst, dst)
+    finally:
+        if os.path.lexists(tmp_dst):
+            tmp_dst.unlink()
@@ -0,0 +1,373 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import os
+import stat
+import struct
+import tarfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+CHUNK_SIZE = 1024 * 1024  # compressed independently from each other
+DICT_SIZE = 32 * 1024  # size of the deflate window
+ZIP64_LIMIT = (1 << 31) - 1  # same as in zipfile
+ZIP_SUFFIXES = (".zip",)
+TAR_GZ_SUFFIXES = (".tar.gz", ".tgz")
+
+Progress = Callable[[int], None]  # called with a number of bytes read
+
+
+@dataclass
+class CompressStats:
+    file_count: int
+    bytes_in: int
+    bytes_out: int
+    seconds: float
+    skipped: list[str] = field(default_factory=list)  # special files, not stored
+
+    @property
+    def throughput(self) -> float:
+        """Bytes compressed per second"""
+        return self.bytes_in / self.seconds if self.seconds > 0 else 0.0
+
+
+def _deflate(data: bytes, zdict: bytes | None, level: int, last: bool) -> bytes:
+    if zdict:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelDeflater:
+    """Compresses a stream of data into a single raw deflate stream, like pigz does.
+
+    The data is split into chunks, and the chunks are compressed in parallel in a
+    thread pool (zlib releases the GIL). Every chunk is compressed with the end of
+    the previous chunk as a dictionary, and is terminated with a sync flush, so that
+    concatenated compressed chunks form a valid deflate stream, almost as small as
+    if it was compressed at once. The compressed chunks are written out in order,
+    keeping only a few chunks in memory at a time."""
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        write: Callable[[bytes], object],
+        level: int = 6,
+        max_pending: int = 16,
+    ):
+        self._executor = executor
+        self._write = write
+        self._level = level
+        self._max_pending = max_pending
+        self._buf = bytearray()
+        self._zdict: bytes | None = None
+        self._pending: deque[Future[bytes]] = deque()
+        self.crc = 0
+        self.size = 0
+        self.compressed_size = 0
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        while len(self._buf) >= CHUNK_SIZE:
+            chunk = bytes(self._buf[:CHUNK_SIZE])
+            del self._buf[:CHUNK_SIZE]
+            self._submit(chunk, last=False)
+        return len(data)
+
+    def _submit(self, chunk: bytes, last: bool):
+        future = self._executor.submit(_deflate, chunk, self._zdict, self._level, last)
+        self._pending.append(future)
+        self._zdict = chunk[-DICT_SIZE:]
+        while len(self._pending) > self._max_pending:
+            self._write_next()
+
+    def _write_next(self):
+        data = self._pending.popleft().result()
+        self.compressed_size += len(data)
+        self._write(data)
+
+    def finish(self):
+        """Compress the remaining data and terminate the stream"""
+        self._submit(bytes(self._buf), last=True)
+        self._buf.clear()
+        while self._pending:
+            self._write_next()
+
+
+class GzipWriter:
+    """A write-only file object that compresses to gzip in parallel"""
+
+    def __init__(self, fileobj: BinaryIO, executor: ThreadPoolExecutor, level: int = 6):
+        self._fileobj = fileobj
+        self._deflater = ParallelDeflater(executor, fileobj.write, level)
+        header = struct.pack("<4BLBB", 0x1F, 0x8B, 8, 0, int(time.time()), 0, 255)
+        fileobj.write(header)
+
+    def write(self, data: bytes) -> int:
+        return self._deflater.write(data)
+
+    def close(self):
+        self._deflater.finish()
+        trailer = struct.pack(
+            "<LL", self._deflater.crc, self._deflater.size & 0xFFFFFFFF
+        )
+        self._fileobj.write(trailer)
+
+
+def _dos_date_time(mtime: float) -> tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return (0 << 9) | (1 << 5) | 1, 0
+    date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return date, dos_time
+
+
+@dataclass
+class _ZipEntry:
+    name: bytes
+    offset: int
+    flags: int
+    method: int
+    date: int
+    time: int
+    crc: int
+    compressed_size: int
+    size: int
+    external_attr: int
+
+
+class ZipWriter:
+    """Writes a zip archive sequentially, without seeking back (the sizes and the
+    checksums of the members follow their data), compressing every member with a
+    `ParallelDeflater`. Zip64 extensions are used for the large archives."""
+
+    def __init__(self, fileobj: BinaryIO, executor: ThreadPoolExecutor, level: int = 6):
+        self._fileobj = fileobj
+        self._executor = executor
+        self._level = level
+        self._offset = 0
+        self._entries: list[_ZipEntry] = []
+
+    def _write(self, data: bytes):
+        self._fileobj.write(data)
+        self._offset += len(data)
+
+    def add_dir(self, arcname: str, statinfo: os.stat_result):
+        name = (arcname.rstrip("/") + "/").encode()
+        date, dos_time = _dos_date_time(statinfo.st_mtime)
+        entry = _ZipEntry(
+            name, self._offset, 0x800, 0, date, dos_time, 0, 0, 0, 0o40775 << 16 | 0x10
+        )
+        header = struct.pack(
+            "<4s2B4HL2L2H", b"PK\003\004", 20, 0, 0x800, 0, dos_time, date, 0, 0, 0,
+            len(name), 0,
+        )  # fmt: skip
+        self._write(header + name)
+        self._entries.append(entry)
+
+    def add_link(self, arcname: str, statinfo: os.stat_result, target: str):
+        """Store a symlink as Info-ZIP does: the target is the (stored) data of a
+        member with the symlink mode"""
+        name, data = arcname.encode(), os.fsencode(target)
+        date, dos_time = _dos_date_time(statinfo.st_mtime)
+        crc = zlib.crc32(data)
+        entry = _ZipEntry(
+            name, self._offset, 0x800, 0, date, dos_time, crc, len(data), len(data),
+            (statinfo.st_mode & 0xFFFF) << 16,
+        )  # fmt: skip
+        header = struct.pack(
+            "<4s2B4HL2L2H", b"PK\003\004", 20, 0, 0x800, 0, dos_time, date, crc,
+            len(data), len(data), len(name), 0,
+        )  # fmt: skip
+        self._write(header + name + data)
+        self._entries.append(entry)
+
+    def add_file(
+        self, path: Path, arcname: str, statinfo: os.stat_result, progress: Progress
+    ):
+        name = arcname.encode()
+        date, dos_time = _dos_date_time(statinfo.st_mtime)
+        zip64 = statinfo.st_size * 1.05 > ZIP64_LIMIT
+        flags = 0x08 | 0x800  # sizes follow the data, names are in UTF-8
+        entry = _ZipEntry(
+            name, self._offset, flags, 8, date, dos_time, 0, 0, 0,
+            (statinfo.st_mode & 0xFFFF) << 16,
+        )  # fmt: skip
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0) if zip64 else b""
+        sizes = 0xFFFFFFFF if zip64 else 0
+        header = struct.pack(
+            "<4s2B4HL2L2H", b"PK\003\004", 45 if zip64 else 20, 0, flags, 8,
+            dos_time, date, 0, sizes, sizes, len(name), len(extra),
+        )  # fmt: skip
+        self._write(header + name + extra)
+
+        deflater = ParallelDeflater(self._executor, self._write, self._level)
+        with open(path, "rb") as f:
+            while data := f.read(CHUNK_SIZE):
+                deflater.write(data)
+                progress(len(data))
+        deflater.finish()
+
+        entry.crc = deflater.crc
+        entry.compressed_size = deflater.compressed_size
+        entry.size = deflater.size
+        if zip64:
+            descriptor = struct.pack(
+                "<4sLQQ", b"PK\007\010", entry.crc, entry.compressed_size, entry.size
+            )
+        else:
+            descriptor = struct.pack(
+                "<4sLLL", b"PK\007\010", entry.crc, entry.compressed_size, entry.size
+            )
+        self._write(descriptor)
+        self._entries.append(entry)
+
+    def close(self):
+        """Write the central directory"""
+        cd_offset = self._offset
+        for e in self._entries:
+            zip64_fields = []
+            size, compressed_size, offset = e.size, e.compressed_size, e.offset
+            if size > ZIP64_LIMIT:
+                zip64_fields.append(size)
+                size = 0xFFFFFFFF
+            if compressed_size > ZIP64_LIMIT:
+                zip64_fields.append(compressed_size)
+                compressed_size = 0xFFFFFFFF
+            if offset > ZIP64_LIMIT:
+                zip64_fields.append(offset)
+                offset = 0xFFFFFFFF
+            extra = b""
+            if zip64_fields:
+                fmt = "<HH" + "Q" * len(zip64_fields)
+                extra = struct.pack(fmt, 1, 8 * len(zip64_fields), *zip64_fields)
+            version = 45 if zip64_fields or e.flags & 0x08 else 20
+            record = struct.pack(
+                "<4s4B4HL2L5H2L", b"PK\001\002", version, 3, version, 0, e.flags,
+                e.method, e.time, e.date, e.crc, compressed_size, size, len(e.name),
+                len(extra), 0, 0, 0, e.external_attr, offset,
+            )  # fmt: skip
+            self._write(record + e.name + extra)
+
+        cd_size = self._offset - cd_offset
+        count = len(self._entries)
+        if count > 0xFFFF or cd_size > ZIP64_LIMIT or cd_offset > ZIP64_LIMIT:
+            zip64_end_offset = self._offset
+            self._write(
+                struct.pack(
+                    "<4sQ2H2L4Q", b"PK\006\006", 44, 45, 45, 0, 0, count, count,
+                    cd_size, cd_offset,
+                )  # fmt: skip
+            )
+            self._write(struct.pack("<4sLQL", b"PK\006\007", 0, zip64_end_offset, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, 0xFFFFFFFF)
+            cd_offset = min(cd_offset, 0xFFFFFFFF)
+        self._write(
+            struct.pack(
+                "<4s4H2LH", b"PK\005\006", 0, 0, count, count, cd_size, cd_offset, 0
+            )
+        )
+
+
+def _walk(path: Path, arcname: str, exclude: os.stat_result):
+    """Yield (path, archive name, stat) for the path and, recursively, its content,
+    not following the symlinks (which are yielded as links). The `exclude` file
+    (the archive being written) is left out."""
+    statinfo = path.lstat()
+    if (statinfo.st_dev, statinfo.st_ino) == (exclude.st_dev, exclude.st_ino):
+        return
+    yield path, arcname, statinfo
+    if stat.S_ISDIR(statinfo.st_mode):
+        for child in sorted(path.iterdir()):
+            yield from _walk(child, f"{arcname}/{child.name}", exclude)
+
+
+def compress(
+    sources: list[Path],
+    dst: Path,
+    level: int = 6,
+    workers: int | None = None,
+    progress: Progress | None = None,
+) -> CompressStats:
+    """Compress files and directories into a zip archive, or a gzip-compressed tar
+    archive, depending on the `dst` file name (raises ValueError if it is neither
+    .zip, nor .tar.gz or .tgz). The output is compressed in parallel
+    by `workers` threads, and is written out as it is compressed, without staging
+    any temporary copies. `progress` is called with the number of bytes read.
+    The symlinks are stored as links, the special files (e.g., sockets, pipes and
+    devices) are skipped."""
+
+    name = dst.name.lower()
+    if not name.endswith(ZIP_SUFFIXES + TAR_GZ_SUFFIXES):
+        raise ValueError(
+            f"Cannot compress into {dst.name}: only .zip, .tar.gz and .tgz archives"
+            " can be created"
+        )
+
+    started = time.monotonic()
+    file_count = 0
+    bytes_in = 0
+    skipped: list[str] = []
+
+    def on_progress(nbytes: int):
+        nonlocal bytes_in
+        bytes_in += nbytes
+        if progress is not None:
+            progress(bytes_in)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(dst, "wb") as f:
+        dst_stat = os.fstat(f.fileno())
+        if name.endswith(ZIP_SUFFIXES):
+            zip_writer = ZipWriter(f, executor, level)
+            for source in sources:
+                for path, arcname, statinfo in _walk(source, source.name, dst_stat):
+                    if stat.S_ISDIR(statinfo.st_mode):
+                        zip_writer.add_dir(arcname, statinfo)
+                    elif stat.S_ISLNK(statinfo.st_mode):
+                        zip_writer.add_link(arcname, statinfo, os.readlink(path))
+                    elif stat.S_ISREG(statinfo.st_mode):
+                        zip_writer.add_file(path, arcname, statinfo, on_progress)
+                        file_count += 1
+                    else:
+                        skipped.append(arcname)
+            zip_writer.close()
+        else:
+            gzip_writer = GzipWriter(f, executor, level)
+            with tarfile.open(fileobj=gzip_writer, mode="w|") as tf:  # type: ignore
+                for source in sources:
+                    for path, arcname, statinfo in _walk(source, source.name, dst_stat):
+                        mode = statinfo.st_mode
+                        if not (
+                            stat.S_ISDIR(mode)
+                            or stat.S_ISLNK(mode)
+                            or stat.S_ISREG(mode)
+                        ):
+                            skipped.append(arcname)
+                            continue
+                        tf.add(path, arcname=arcname, recursive=False)  # links as is
+                        if stat.S_ISREG(mode):
+                            on_progress(statinfo.st_size)
+                            file_count += 1
+            gzip_writer.close()
+
+        bytes_out = f.tell()
+
+    elapsed = time.monotonic() - started
+    return CompressStats(file_count, bytes_in, bytes_out, elapsed, skipped)
@@ -0,0 +1,148 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import mmap
+from collections import deque
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from itertools import zip_longest
+from pathlib import Path
+from typing import Iterator
+
+CHUNK_SIZE = 4 * 1024 * 1024  # compared at once
+BLOCK_SIZE = 4096  # to locate the difference in a chunk
+WINDOW = 500  # lines to look ahead for the next matching lines
+MAX_LINE_LENGTH = 4096  # the rest of the line is not compared nor shown
+
+
+def first_difference(a: Path, b: Path) -> int | None:
+    """Offset of the first byte that differs in the files (or the size of the
+    smaller file, if it is the beginning of the other one), or None if the files
+    are the same. The files are mapped into memory and compared in large chunks,
+    and are only read up to the first difference."""
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        size_a, size_b = _size(fa), _size(fb)
+        size = min(size_a, size_b)
+        if size > 0:
+            with (
+                mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma,
+                mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mb,
+            ):
+                for start in range(0, size, CHUNK_SIZE):
+                    end = min(start + CHUNK_SIZE, size)
+                    if ma[start:end] != mb[start:end]:
+                        return _locate(ma, mb, start, end)
+    return None if size_a == size_b else size
+
+
+def _size(f) -> int:
+    f.seek(0, 2)
+    return f.tell()
+
+
+def _locate(ma: mmap.mmap, mb: mmap.mmap, start: int, end: int) -> int:
+    """Offset of the first difference in a chunk that is known to differ"""
+    for block in range(start, end, BLOCK_SIZE):
+        block_end = min(block + BLOCK_SIZE, end)
+        data_a, data_b = ma[block:block_end], mb[block:block_end]
+        if data_a != data_b:
+            for i, (x, y) in enumerate(zip(data_a, data_b)):
+                if x != y:
+                    return block + i
+    return end  # not expected
+
+
+@dataclass
+class DiffRow:
+    """A row of a side by side comparison: a pair of lines (either can be missing),
+    or the number of the same lines that are skipped (in `skipped`)"""
+
+    left_no: int | None = None  # line numbers start at 1
+    left: str | None = None
+    right_no: int | None = None
+    right: str | None = None
+    skipped: int = 0
+
+    @property
+    def is_change(self) -> bool:
+        return self.skipped == 0 and self.left != self.right
+
+
+def _read_lines(path: Path) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        for line in f:
+            yield line.rstrip("\r\n")[:MAX_LINE_LENGTH]
+
+
+def side_by_side(a: Path, b: Path, context: int = 3) -> Iterator[DiffRow]:
+    """Compare text files line by line, as side by side rows. The rows are computed
+    as they are consumed, and the files are read as far as needed only, so that
+    large files can be shown at once. The same lines are skipped, except for
+    `context` lines around the changes. After a change, the next matching lines are
+    only looked up in the next `WINDOW` lines of both files."""
+
+    lines_a, lines_b = _read_lines(a), _read_lines(b)
+    ahead_a: deque[str] = deque()
+    ahead_b: deque[str] = deque()
+    no_a = no_b = 0  # numbers of the last lines consumed
+    before: deque[DiffRow] = deque(maxlen=context)  # the same lines, not shown yet
+    skipped = 0  # the same lines, not shown
+    after = 0  # the same lines to show after a change
+
+    def fill(ahead: deque[str], lines: Iterator[str], count: int):
+        while len(ahead) < count:
+            line = next(lines, None)
+            if line is None:
+                break
+            ahead.append(line)
+
+    while True:
+        fill(ahead_a, lines_a, 1)
+        fill(ahead_b, lines_b, 1)
+        if not ahead_a and not ahead_b:
+            break
+
+        if ahead_a and ahead_b and ahead_a[0] == ahead_b[0]:
+            no_a += 1
+            no_b += 1
+            row = DiffRow(no_a, ahead_a.popleft(), no_b, ahead_b.popleft())
+            if after > 0:
+                after -= 1
+                yield row
+            else:
+                if len(before) == before.maxlen:
+                    skipped += 1  # the oldest line of the context is dropped
+                before.append(row)
+            continue
+
+        # a change: show the lines before it, then find where the files match again
+        if skipped > 0:
+            yield DiffRow(skipped=skipped)
+            skipped = 0
+        yield from before
+        before.clear()
+
+        fill(ahead_a, lines_a, WINDOW)
+        fill(ahead_b, lines_b, WINDOW)
+        matcher = SequenceMatcher(None, list(ahead_a), list(ahead_b), autojunk=False)
+        blocks = [m for m in matcher.get_matching_blocks() if m.size > 0]
+        i, j = (blocks[0].a, blocks[0].b) if blocks else (len(ahead_a), len(ahead_b))
+        changed_a = [ahead_a.popleft() for _ in range(i)]
+        changed_b = [ahead_b.popleft() for _ in range(j)]
+        for line_a, line_b in zip_longest(changed_a, changed_b):
+            row = DiffRow()
+            if line_a is not None:
+                no_a += 1
+                row.left_no, row.left = no_a, line_a
+            if line_b is not None:
+                no_b += 1
+                row.right_no, row.right = no_b, line_b
+            yield row
+        after = context
+
+    skipped += len(before)  # the same lines at the end
+    if skipped > 0:
+        yield DiffRow(skipped=skipped)
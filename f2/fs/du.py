@@ -0,0 +1,141 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import heapq
+import os
+import stat
+from array import array
+from pathlib import Path
+from typing import Callable, Iterator
+
+from . import parallel_walk
+from .backend import Entry
+
+NO_PARENT = -1
+
+
+def disk_usage(statinfo: os.stat_result) -> int:
+    """Space used on disk (less than the size for sparse files), if known"""
+    blocks = getattr(statinfo, "st_blocks", None)
+    return blocks * 512 if blocks is not None else statinfo.st_size
+
+
+class SizeTree:
+    """Disk usage of every file and directory in a directory tree, as a compact
+    tree that can hold millions of nodes.
+
+    The nodes are stored in arrays, by their ids (the positions in the arrays). The
+    entries of a directory are listed at once, so the children of a directory are
+    always stored next to each other, and are found by the id of the first child
+    and their number. The sizes of the directories include their descendants, and
+    grow as the tree is scanned. The files with several hard links are counted
+    once."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._names: list[str] = [str(root)]
+        self._parents = array("i", [NO_PARENT])
+        self._sizes = array("q", [0])
+        self._counts = array("q", [0])  # of the descendants
+        self._first_child = array("i", [0])
+        self._child_count = array("i", [0])
+        self._is_dir = bytearray(b"\x01")
+        self.scanned = False
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def name(self, idx: int) -> str:
+        return self._names[idx]
+
+    def parent(self, idx: int) -> int:
+        return self._parents[idx]
+
+    def size(self, idx: int) -> int:
+        return self._sizes[idx]
+
+    def count(self, idx: int) -> int:
+        return self._counts[idx]
+
+    def is_dir(self, idx: int) -> bool:
+        return self._is_dir[idx] == 1
+
+    def children(self, idx: int) -> range:
+        count = self._child_count[idx]  # published last, see `scan`
+        first = self._first_child[idx]
+        return range(first, first + count)
+
+    def largest_children(self, idx: int, limit: int) -> list[int]:
+        return heapq.nlargest(limit, self.children(idx), key=self._sizes.__getitem__)
+
+    def path_of(self, idx: int) -> Path:
+        names = []
+        while idx != NO_PARENT:
+            names.append(self._names[idx])
+            idx = self._parents[idx]
+        return Path(*reversed(names))
+
+    def scan(
+        self,
+        include_hidden: bool = True,
+        workers: int = 8,
+        is_cancelled: Callable[[], bool] = lambda: False,
+    ) -> Iterator[int]:
+        """Scan the tree, listing the directories in parallel. Yields the number of
+        nodes after every listed directory, so that the caller can show the
+        progress. The tree can be read meanwhile, from another thread too: the
+        children of a directory are only published once they are all added."""
+
+        dir_ids = {self.root: 0}  # of the directories waiting to be listed
+        seen_inodes: set[tuple[int, int]] = set()
+        for dir_path, entries in parallel_walk(
+            self.root,
+            include_hidden=include_hidden,
+            with_stat=True,
+            workers=workers,
+            is_cancelled=is_cancelled,
+        ):
+            dir_idx = dir_ids.pop(dir_path)
+            first_child = len(self._names)
+            added_size = 0
+            for e in entries:
+                idx = len(self._names)
+                size, is_dir = self._entry_size(e, seen_inodes)
+                self._parents.append(dir_idx)
+                self._sizes.append(size)
+                self._counts.append(0)
+                self._first_child.append(idx)
+                self._child_count.append(0)
+                self._is_dir.append(1 if is_dir else 0)
+                self._names.append(e.name)  # last, it counts the nodes
+                added_size += size
+                if is_dir:
+                    dir_ids[dir_path / e.name] = idx
+            # publish the children once added, the count last (read first):
+            self._first_child[dir_idx] = first_child
+            self._child_count[dir_idx] = len(entries)
+            # account for the entries in all ancestors:
+            idx = dir_idx
+            while idx != NO_PARENT:
+                self._sizes[idx] += added_size
+                self._counts[idx] += len(entries)
+                idx = self._parents[idx]
+            yield len(self._names)
+        self.scanned = not is_cancelled()
+
+    @staticmethod
+    def _entry_size(e: Entry, seen_inodes: set[tuple[int, int]]) -> tuple[int, bool]:
+        try:
+            statinfo = e.stat(follow_symlinks=False)  # cached by the walk
+        except OSError:
+            return 0, False
+        is_dir = stat.S_ISDIR(statinfo.st_mode)
+        if statinfo.st_nlink > 1 and not is_dir:
+            inode = (statinfo.st_dev, statinfo.st_ino)
+            if inode in seen_inodes:
+                return 0, False
+            seen_inodes.add(inode)
+        return disk_usage(statinfo), is_dir
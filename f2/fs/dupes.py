@@ -0,0 +1,196 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import hashlib
+import os
+import stat
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from . import parallel_walk
+from .backend import LocalFileSystem, backend_for
+
+BLOCK_SIZE = 64 * 1024  # read at the head and at the tail of the files first
+READ_SIZE = 1024 * 1024
+READ_AHEAD = 256  # files hashed ahead of the group being compared
+
+
+@dataclass
+class DuplicateGroup:
+    size: int  # of every file
+    paths: list[Path]
+    mtimes_ns: dict[Path, int] = field(default_factory=dict)  # when found
+
+    @property
+    def wasted(self) -> int:
+        """Space that the duplicates take, besides the first file"""
+        return self.size * (len(self.paths) - 1)
+
+    def unchanged(self, path: Path) -> bool:
+        """Whether a file of the group is still a regular file of the same size and
+        mtime as when it was found (and compared with the others)"""
+        try:
+            statinfo = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return False
+        return (
+            stat.S_ISREG(statinfo.st_mode)
+            and statinfo.st_size == self.size
+            and statinfo.st_mtime_ns == self.mtimes_ns.get(path)
+        )
+
+
+def _digest(path: str, size: int, full: bool) -> bytes | None:
+    """Hash of the head and of the tail of a file, or of the whole file. The
+    hashes are computed in threads: hashlib releases the GIL on large reads."""
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            if full:
+                while data := f.read(READ_SIZE):
+                    h.update(data)
+            else:
+                h.update(f.read(BLOCK_SIZE))
+                if size > BLOCK_SIZE:
+                    f.seek(max(BLOCK_SIZE, size - BLOCK_SIZE))
+                    h.update(f.read(BLOCK_SIZE))
+    except OSError:
+        return None  # unreadable, or removed meanwhile
+    return h.digest()
+
+
+def _same_digests(paths: list[str], digests: Iterable[bytes | None]) -> list[list[str]]:
+    groups = defaultdict(list)
+    for path, digest in zip(paths, digests):
+        if digest is not None:
+            groups[digest].append(path)
+    return [same for same in groups.values() if len(same) > 1]
+
+
+def _read_ahead(
+    executor: ThreadPoolExecutor, fn: Callable, items: Iterable, ahead: int
+) -> Iterator:
+    """Like `executor.map`, but only submits `ahead` items in advance"""
+    pending: deque[Future] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) > ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _files_by_size(
+    roots: list[Path],
+    include_hidden: bool,
+    min_size: int,
+    is_cancelled: Callable[[], bool],
+    mtimes_ns: dict[str, int],
+) -> dict[int, list[str]]:
+    by_size: dict[int, list[str]] = defaultdict(list)
+    seen_inodes: set[tuple[int, int]] = set()
+    for root in roots:
+        for dir_path, entries in parallel_walk(
+            root,
+            include_hidden=include_hidden,
+            with_stat=True,
+            is_cancelled=is_cancelled,
+        ):
+            dir_name = str(dir_path)
+            for e in entries:
+                try:
+                    statinfo = e.stat(follow_symlinks=False)  # cached by the walk
+                except OSError:
+                    continue
+                if not stat.S_ISREG(statinfo.st_mode) or statinfo.st_size < min_size:
+                    continue
+                inode = (statinfo.st_dev, statinfo.st_ino)
+                if inode in seen_inodes:
+                    continue  # a hard link to a file already seen
+                seen_inodes.add(inode)
+                path = os.path.join(dir_name, e.name)
+                by_size[statinfo.st_size].append(path)
+                mtimes_ns[path] = statinfo.st_mtime_ns
+    return by_size
+
+
+def find_duplicates(
+    roots: list[Path],
+    include_hidden: bool = True,
+    min_size: int = 1,
+    workers: int = 8,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Iterator[DuplicateGroup]:
+    """Find the files with the same contents in the directory trees. The files are
+    compared in stages, each stage on the files left from the previous one: by
+    size, then by a hash of their first and last blocks, and finally by a hash of
+    their whole contents. Yields the groups of the same files as they are found,
+    the largest files first. Hard links to the same file are not duplicates.
+    The groups hold the mtimes of the files, to tell if they changed since."""
+
+    for root in roots:
+        if not isinstance(backend_for(root), LocalFileSystem):
+            raise ValueError(f"Cannot look for duplicates in {root}")
+
+    # the trees inside the others are walked with them:
+    roots = [
+        r for r in set(roots) if not any(r.is_relative_to(o) for o in roots if o != r)
+    ]
+    mtimes_ns: dict[str, int] = {}
+    by_size = _files_by_size(roots, include_hidden, min_size, is_cancelled, mtimes_ns)
+    candidates = sorted(
+        ((size, paths) for size, paths in by_size.items() if len(paths) > 1),
+        reverse=True,
+    )
+    del by_size
+
+    partial_executor = ThreadPoolExecutor(max_workers=workers)
+    full_executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        # hash the heads and tails of the candidates ahead, in the order of groups:
+        partial_digests = _read_ahead(
+            partial_executor,
+            lambda f: _digest(f[0], f[1], full=False),
+            ((path, size) for size, paths in candidates for path in paths),
+            READ_AHEAD,
+        )
+        for size, paths in candidates:
+            if is_cancelled():
+                return
+            digests = [next(partial_digests) for _ in paths]
+            for same in _same_digests(paths, digests):
+                if size > 2 * BLOCK_SIZE:  # not entirely hashed yet
+                    full_digests = full_executor.map(
+                        lambda p: _digest(p, size, full=True), same
+                    )
+                    groups = _same_digests(same, full_digests)
+                else:
+                    groups = [same]
+                for group in groups:
+                    yield DuplicateGroup(
+                        size,
+                        [Path(p) for p in sorted(group)],
+                        {Path(p): mtimes_ns[p] for p in group},
+                    )
+    finally:
+        partial_executor.shutdown(wait=False, cancel_futures=True)
+        full_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def replace_with_hardlink(original: Path, duplicate: Path):
+    """Replace a duplicate file with a hard link to the original one. The
+    duplicate is only replaced once the link is created (on the same file system
+    only)."""
+    tmp_path = duplicate.with_name(f".{duplicate.name}.f2link")
+    os.link(original, tmp_path)
+    try:
+        os.replace(tmp_path, duplicate)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
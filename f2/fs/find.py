@@ -0,0 +1,130 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import fnmatch
+import os
+import re
+import shlex
+import stat
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+from . import DirEntry, parallel_walk
+
+SIZE_UNITS = {"": 1, "k": 10**3, "m": 10**6, "g": 10**9, "t": 10**12}
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+QUERY_SYNTAX = "*.py  re:^test_  size>10M  size<1k  mtime<7d  mtime>1h  type:f  type:d"
+
+_SIZE_RE = re.compile(r"size([<>])(\d+(?:\.\d+)?)([kmgt]?)b?", re.IGNORECASE)
+_MTIME_RE = re.compile(r"mtime([<>])(\d+(?:\.\d+)?)([smhdw])", re.IGNORECASE)
+
+
+@dataclass
+class FindQuery:
+    """What to look for. A file matches if its name matches any of the `globs` (if
+    any are given, case-insensitively) and the `regex` (if given), and its metadata
+    matches all other criteria that are set."""
+
+    globs: list[str] = field(default_factory=list)
+    regex: re.Pattern[str] | None = None
+    min_size: int | None = None
+    max_size: int | None = None
+    newer_than: float | None = None  # mtime, in seconds since the epoch
+    older_than: float | None = None
+    file_type: str | None = None  # "f" or "d"
+
+    @classmethod
+    def parse(cls, text: str) -> "FindQuery":
+        """Parse a query like "*.py size>10k mtime<7d", see `QUERY_SYNTAX`. A name
+        without wildcards matches the names that contain it. Raises ValueError if
+        the query is not valid."""
+
+        query = cls()
+        now = time.time()
+        for token in shlex.split(text):
+            if token.startswith("re:"):
+                try:
+                    query.regex = re.compile(token[3:])
+                except re.error as err:
+                    raise ValueError(f"Invalid regular expression: {err}")
+            elif token.startswith("type:"):
+                if token[5:] not in ("f", "d"):
+                    raise ValueError(f"Unknown file type in '{token}', use f or d")
+                query.file_type = token[5:]
+            elif token.startswith("size"):
+                if (m := _SIZE_RE.fullmatch(token)) is None:
+                    raise ValueError(f"Invalid size criterion '{token}'")
+                op, number, unit = m.groups()
+                size = int(float(number) * SIZE_UNITS[unit.lower()])
+                if op == ">":
+                    query.min_size = size
+                else:
+                    query.max_size = size
+            elif token.startswith("mtime"):
+                if (m := _MTIME_RE.fullmatch(token)) is None:
+                    raise ValueError(f"Invalid mtime criterion '{token}'")
+                op, number, unit = m.groups()
+                age = float(number) * AGE_UNITS[unit.lower()]
+                if op == "<":
+                    query.newer_than = now - age
+                else:
+                    query.older_than = now - age
+            else:
+                glob = token if any(c in token for c in "*?[") else f"*{token}*"
+                query.globs.append(glob.lower())
+        return query
+
+    def match_name(self, name: str) -> bool:
+        if self.globs:
+            lower_name = name.lower()
+            if not any(fnmatch.fnmatchcase(lower_name, g) for g in self.globs):
+                return False
+        return self.regex is None or self.regex.search(name) is not None
+
+    def match_stat(self, statinfo: os.stat_result) -> bool:
+        if self.file_type == "f" and not stat.S_ISREG(statinfo.st_mode):
+            return False
+        if self.file_type == "d" and not stat.S_ISDIR(statinfo.st_mode):
+            return False
+        if self.min_size is not None and statinfo.st_size <= self.min_size:
+            return False
+        if self.max_size is not None and statinfo.st_size >= self.max_size:
+            return False
+        if self.newer_than is not None and statinfo.st_mtime <= self.newer_than:
+            return False
+        if self.older_than is not None and statinfo.st_mtime >= self.older_than:
+            return False
+        return True
+
+
+def find(
+    root: Path,
+    query: FindQuery,
+    include_hidden: bool = True,
+    workers: int = 8,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Iterator[DirEntry]:
+    """Find the files in the directory tree that match the query. The directories
+    are listed in parallel, and the matches are yielded as soon as they are found,
+    in no particular order, with their names relative to the `root`. Only the files
+    with a matching name are stat'ed."""
+
+    for dir_path, entries in parallel_walk(
+        root, include_hidden=include_hidden, workers=workers, is_cancelled=is_cancelled
+    ):
+        rel_dir = dir_path.relative_to(root)
+        for e in entries:
+            if not query.match_name(e.name):
+                continue
+            try:
+                statinfo = e.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if query.match_stat(statinfo):
+                yield DirEntry.from_stat(str(rel_dir / e.name), statinfo)
@@ -0,0 +1,176 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import functools
+import mmap
+import multiprocessing
+import os
+import re
+import stat
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from . import parallel_walk
+from .backend import backend_for, local
+
+BATCH_SIZE = 64  # files are sent to the worker processes in batches of this size
+MAX_PENDING = 4  # batches in flight per worker process, the walk waits for the rest
+SNIFF_SIZE = 8192  # files with a NUL byte in the first bytes are seen as binary
+MAX_MATCHES_PER_FILE = 100
+MAX_LINE_LENGTH = 256  # in bytes, longer lines are cut
+
+
+@dataclass
+class GrepMatch:
+    line_no: int
+    line: str
+
+
+@dataclass
+class GrepResult:
+    path: Path
+    matches: list[GrepMatch]
+
+
+@functools.lru_cache(maxsize=8)
+def _compile(pattern: str, ignore_case: bool) -> re.Pattern[bytes]:
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(pattern.encode(), flags)
+
+
+def compile_pattern(pattern: str, ignore_case: bool = False) -> re.Pattern[bytes]:
+    """Compile a search pattern (a regular expression), raise ValueError if it is
+    not valid"""
+    try:
+        return _compile(pattern, ignore_case)
+    except re.error as err:
+        raise ValueError(f"Invalid regular expression: {err}")
+
+
+def grep_file(
+    path: Path | str,
+    regex: re.Pattern[bytes],
+    max_matches: int = MAX_MATCHES_PER_FILE,
+) -> list[GrepMatch]:
+    """Find the lines of a file that match a regular expression, at most
+    `max_matches` of them. Binary files are skipped (same sniff as in
+    `is_binary_file`). Large files are memory-mapped rather than read."""
+
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+        if b"\0" in head or not head:
+            return []
+        if len(head) < SNIFF_SIZE:
+            return _grep_data(head, regex, max_matches)  # the whole file is read
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _grep_data(data, regex, max_matches)
+
+
+def _grep_data(
+    data: bytes | mmap.mmap, regex: re.Pattern[bytes], max_matches: int
+) -> list[GrepMatch]:
+    matches: list[GrepMatch] = []
+    line_no = 1
+    counted_to = 0  # newlines are counted up to this offset
+    for m in regex.finditer(data):  # type: ignore
+        line_start = data.rfind(b"\n", 0, m.start()) + 1
+        if line_start < counted_to:
+            continue  # another match on an already reported line
+        line_no += data[counted_to:line_start].count(b"\n")
+        line_end = data.find(b"\n", m.start())
+        if line_end == -1:
+            line_end = len(data)
+        cut_at = min(line_end, line_start + MAX_LINE_LENGTH)
+        line = data[line_start:cut_at].decode("utf-8", "replace").rstrip()
+        matches.append(GrepMatch(line_no, line))
+        counted_to = line_end + 1 if line_end < len(data) else len(data)
+        line_no += 1 if line_end < len(data) else 0
+        if len(matches) >= max_matches:
+            break
+    return matches
+
+
+def _grep_batch(
+    paths: list[str], pattern: str, ignore_case: bool
+) -> list[tuple[str, list[GrepMatch]]]:
+    """Search a batch of files, in a worker process"""
+    regex = _compile(pattern, ignore_case)
+    results = []
+    for path in paths:
+        try:
+            matches = grep_file(path, regex)
+        except (OSError, ValueError):
+            continue  # unreadable, or changed meanwhile
+        if matches:
+            results.append((path, matches))
+    return results
+
+
+def grep(
+    root: Path,
+    pattern: str,
+    ignore_case: bool = False,
+    include_hidden: bool = True,
+    workers: int | None = None,
+    is_cancelled: Callable[[], bool] = lambda: False,
+) -> Iterator[GrepResult]:
+    """Search the contents of all regular files in the directory tree for a regular
+    expression. The files are searched by a pool of `workers` processes (one per
+    CPU core by default), and the files with matches are yielded as soon as they
+    are searched, in no particular order. Raises ValueError if the pattern is not
+    valid, or if the files are not on the local file system."""
+
+    compile_pattern(pattern, ignore_case)
+    if backend_for(root) is not local:
+        raise ValueError("Only the files on the local file system can be searched")
+
+    # worker processes are spawned rather than forked, as forking a process with
+    # running threads (like the UI ones) is not safe
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    max_pending = MAX_PENDING * (workers or os.cpu_count() or 1)
+    pending: set[Future] = set()
+    batch: list[str] = []
+
+    def submit_batch() -> Iterator[GrepResult]:
+        nonlocal batch
+        if batch:
+            # the walk is faster than the search, don't let it run too far ahead:
+            while len(pending) >= max_pending and not is_cancelled():
+                yield from collect(timeout=0.1)
+            pending.add(pool.submit(_grep_batch, batch, pattern, ignore_case))
+            batch = []
+
+    def collect(timeout: float | None) -> Iterator[GrepResult]:
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            for path, matches in future.result():
+                yield GrepResult(Path(path), matches)
+
+    try:
+        for dir_path, entries in parallel_walk(
+            root,
+            include_hidden=include_hidden,
+            with_stat=True,
+            is_cancelled=is_cancelled,
+        ):
+            for e in entries:
+                try:
+                    is_file = stat.S_ISREG(e.stat(follow_symlinks=False).st_mode)
+                except OSError:
+                    continue
+                if is_file:
+                    batch.append(os.path.join(dir_path, e.name))
+                    if len(batch) >= BATCH_SIZE:
+                        yield from submit_batch()
+            yield from collect(timeout=0)
+        yield from submit_batch()
+        while pending and not is_cancelled():
+            yield from collect(timeout=0.1)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,253 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import heapq
+import os
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable
+
+from ..config import config_root
+from .backend import UnavailableError, guarded
+
+ROOT = -1  # parent of the root directories of the index
+_NO_POSTINGS = array("I")
+
+
+def _trigrams(text: str) -> set[str]:
+    return {a + b + c for a, b, c in zip(text, text[1:], text[2:])}
+
+
+class PathIndex:
+    """An index of all directories under some roots, to find them by a part of
+    their names at once, even among millions of them.
+
+    Every directory is stored as its name and the id of its parent directory (ids
+    are the positions in the index), and the names are indexed by their trigrams
+    (all substrings of 3 characters). A snapshot of the index is never modified:
+    an updated index is built by `refreshed`, in background, while the previous one
+    is still in use. Hidden directories, symlinks and other file systems (mount
+    points) under the roots are not indexed."""
+
+    def __init__(self, dirs: Iterable[tuple[int, int, str]] = ()):
+        self._parents = array("i")
+        self._mtimes = array("q")  # in ns, to update the index incrementally
+        self._depths = array("H")
+        self._names: list[str] = []
+        postings: dict[str, array] = defaultdict(lambda: array("I"))
+        prefixes: dict[str, array] = defaultdict(lambda: array("I"))
+        for idx, (parent, mtime_ns, name) in enumerate(dirs):
+            self._parents.append(parent)
+            self._mtimes.append(mtime_ns)
+            self._depths.append(0 if parent == ROOT else self._depths[parent] + 1)
+            self._names.append(name)
+            lower_name = name.lower()
+            for trigram in _trigrams(lower_name):
+                postings[trigram].append(idx)
+            prefixes[lower_name[:2]].append(idx)
+        self._postings = dict(postings)
+        self._prefixes = dict(prefixes)  # for the words too short for trigrams
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def path_of(self, idx: int) -> str:
+        names = []
+        while idx != ROOT:
+            names.append(self._names[idx])
+            idx = self._parents[idx]
+        return os.path.join(*reversed(names))
+
+    def search(self, query: str, limit: int = 20) -> list[str]:
+        """Directories that match a query: the last word of the query is a part of
+        the name of the directory (or its first letters, if it is shorter than 3
+        letters), and the other words are parts of its path (case insensitive).
+        The best matches come first: by name (same name, then the names that start
+        with the word), then the shallower paths first."""
+
+        words = query.lower().split()
+        if not words:
+            return []
+        name_part = words[-1]
+        in_path = [self._path_matcher(part) for part in words[:-1]]
+
+        def scored():
+            for idx in self._name_matches(name_part):
+                if not all(matches(idx) for matches in in_path):
+                    continue
+                name = self._names[idx].lower()
+                rank = (
+                    0 if name == name_part else 1 if name.startswith(name_part) else 2
+                )
+                yield (rank, self._depths[idx], len(name), idx)
+
+        return [self.path_of(s[-1]) for s in heapq.nsmallest(limit, scored())]
+
+    def _name_matches(self, part: str) -> Iterable[int]:
+        """Directories with a name that contains the `part`, or that starts with it
+        if it is too short to be looked up by trigrams"""
+        if len(part) < 3:
+            return self._prefixes.get(part, _NO_POSTINGS) if len(part) == 2 else ()
+        postings = sorted(
+            (self._postings.get(t, _NO_POSTINGS) for t in _trigrams(part)), key=len
+        )
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates.intersection_update(p)
+        return [idx for idx in candidates if part in self._names[idx].lower()]
+
+    def _path_matcher(self, part: str) -> Callable[[int], bool]:
+        """A function that tells whether the path of a directory contains a `part`.
+        The paths are not built for that, but the names of the ancestors are looked
+        up instead, and the known answers are reused for their other descendants."""
+
+        if len(part) < 3 or os.sep in part:
+            return lambda idx: part in self.path_of(idx).lower()
+
+        matching = set(self._name_matches(part))
+        known: dict[int, bool] = {ROOT: False}
+
+        def matches(idx: int) -> bool:
+            visited = []
+            while idx not in known:
+                if idx in matching:
+                    known[idx] = True
+                    break
+                visited.append(idx)
+                idx = self._parents[idx]
+            for i in visited:
+                known[i] = known[idx]
+            return known[idx]
+
+        return matches
+
+    def save(self, file: Path):
+        tmp_file = file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8", errors="surrogateescape") as f:
+            for parent, mtime_ns, name in zip(self._parents, self._mtimes, self._names):
+                f.write(f"{parent}\t{mtime_ns}\t{name}\n")
+        os.replace(tmp_file, file)
+
+    @classmethod
+    def load(cls, file: Path) -> "PathIndex":
+        """Load a saved index. Raises OSError if it cannot be read, and ValueError
+        if it is damaged."""
+        with open(file, encoding="utf-8", errors="surrogateescape") as f:
+            dirs = []
+            for line in f:
+                parent, mtime_ns, name = line.rstrip("\n").split("\t", 2)
+                dirs.append((int(parent), int(mtime_ns), name))
+        return cls(dirs)
+
+    def refreshed(
+        self,
+        roots: list[Path],
+        workers: int = 8,
+        is_cancelled: Callable[[], bool] = lambda: False,
+    ) -> "PathIndex | None":
+        """An up-to-date index of the directories under the `roots`. Only the
+        directories modified since this index was built are listed again (as seen
+        by their mtime), the others are only stat'ed. Returns None if cancelled.
+        The directories on the unresponsive mounts are left out."""
+
+        # the subdirectories of every indexed directory, by name:
+        known_subdirs: dict[int, dict[str, int]] = defaultdict(dict)
+        known_roots: dict[str, int] = {}
+        for idx, parent in enumerate(self._parents):
+            subdirs = known_roots if parent == ROOT else known_subdirs[parent]
+            subdirs[self._names[idx]] = idx
+
+        def visit(path: str, known_idx: int | None, root_dev: int | None):
+            """Stat a directory, and list it if it was modified since indexed"""
+            try:
+                statinfo = os.stat(path, follow_symlinks=False)
+            except OSError:
+                return None  # removed, or not accessible anymore
+            if root_dev is not None and statinfo.st_dev != root_dev:
+                return None  # another file system is mounted here
+            if (
+                known_idx is not None
+                and self._mtimes[known_idx] == statinfo.st_mtime_ns
+            ):
+                return statinfo, list(known_subdirs.get(known_idx, {}).items())
+            try:
+                with os.scandir(path) as entries:
+                    names = [
+                        e.name
+                        for e in entries
+                        if not e.name.startswith(".")
+                        and e.is_dir(follow_symlinks=False)
+                    ]
+            except OSError:
+                names = []
+            known = known_subdirs.get(known_idx, {}) if known_idx is not None else {}
+            return statinfo, [(name, known.get(name)) for name in names]
+
+        def guarded_visit(path: str, known_idx: int | None, root_dev: int | None):
+            try:
+                return guarded(Path(path), partial(visit, path, known_idx, root_dev))
+            except UnavailableError:
+                return None
+
+        dirs: list[tuple[int, int, str]] = []
+        # (parent idx, path, name, known idx, device of the root):
+        level = [
+            (ROOT, str(root), str(root), known_roots.get(str(root)), None)
+            for root in roots
+        ]
+        with ThreadPoolExecutor(workers) as executor:
+            while level:
+                if is_cancelled():
+                    return None
+                results = executor.map(lambda d: guarded_visit(d[1], d[3], d[4]), level)
+                next_level = []
+                for (parent, path, name, _, root_dev), result in zip(level, results):
+                    if result is None:
+                        continue
+                    statinfo, subdirs = result
+                    idx = len(dirs)
+                    dirs.append((parent, statinfo.st_mtime_ns, name))
+                    dev = root_dev if root_dev is not None else statinfo.st_dev
+                    for sub_name, sub_known_idx in subdirs:
+                        if "\t" in sub_name or "\n" in sub_name:
+                            continue  # cannot be saved, and is hardly ever needed
+                        sub_path = os.path.join(path, sub_name)
+                        next_level.append((idx, sub_path, sub_name, sub_known_idx, dev))
+                level = next_level
+        return PathIndex(dirs)
+
+
+class PathIndexer:
+    """Keeps an index of the directories up to date, and saved in a file"""
+
+    def __init__(self, file: Path):
+        self.file = file
+        self.index = PathIndex()
+
+    def update(
+        self, roots: list[Path], is_cancelled: Callable[[], bool] = lambda: False
+    ):
+        """Load the saved index (if not loaded yet), then refresh and save it. Meant
+        to be called from a background thread; the previous index can be searched
+        meanwhile."""
+        if len(self.index) == 0:
+            try:
+                self.index = PathIndex.load(self.file)
+            except (OSError, ValueError):
+                pass  # built from scratch then
+        index = self.index.refreshed(roots, is_cancelled=is_cancelled)
+        if index is not None:
+            self.index = index
+            index.save(self.file)
+
+    def search(self, query: str, limit: int = 20) -> list[str]:
+        return self.index.search(query, limit)
+
+
+path_index = PathIndexer(config_root() / "path_index")
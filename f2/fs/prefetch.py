@@ -0,0 +1,100 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from ..cache import LRUCache
+from . import DirList, list_dir
+from .backend import backend_for, is_available
+
+
+@dataclass
+class _Prefetched:
+    listed_at: float
+    mtime_ns: int
+    listing: DirList
+
+
+def _weigh_prefetched(prefetched: _Prefetched) -> int:
+    return 256 * len(prefetched.listing.entries)  # a rough estimate of an entry
+
+
+class DirPrefetcher:
+    """Lists directories ahead of time (e.g., the directory under the cursor), so
+    that when the user enters them, the listing is ready at once.
+
+    At most `max_concurrent` directories are listed at a time, and the further
+    requests are skipped until then, as are the directories on the mounts that did
+    not respond recently. A prefetched listing is only used once, and
+    only if the directory was not modified since (as seen by its mtime) and the
+    listing is not older than `max_age` seconds (files may change without changing
+    the mtime of their directory)."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        max_age: float = 5.0,
+        max_size: int = 16 * 1024 * 1024,
+    ):
+        self.max_age = max_age
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._listings: LRUCache[tuple[Path, bool], _Prefetched] = LRUCache(
+            max_size, max_entries=32, weigh=_weigh_prefetched
+        )
+
+    def prefetch(
+        self,
+        path: Path,
+        include_hidden: bool,
+        is_cancelled: Callable[[], bool] = lambda: False,
+    ) -> bool:
+        """List a directory, unless too many directories are being listed already,
+        or the request is cancelled meanwhile (it is checked between the requests,
+        and a listing that is cancelled is dropped). Returns True if the directory
+        was listed. Meant to be called from a background thread."""
+
+        if not is_available(path) or not self._slots.acquire(blocking=False):
+            return False
+        try:
+            if is_cancelled():
+                return False
+            # stat before listing, so that any later modification is noticed:
+            mtime_ns = backend_for(path).stat(path).st_mtime_ns
+            if is_cancelled():
+                return False
+            listing = list_dir(path, include_hidden=include_hidden)
+        except (OSError, ValueError):
+            return False
+        finally:
+            self._slots.release()
+
+        if is_cancelled():
+            return False
+        prefetched = _Prefetched(time.monotonic(), mtime_ns, listing)
+        self._listings.put((path, include_hidden), prefetched)
+        return True
+
+    def take(self, path: Path, include_hidden: bool) -> DirList | None:
+        """The prefetched listing of a directory, if it is still valid"""
+        key = (path, include_hidden)
+        prefetched = self._listings.get(key)
+        if prefetched is None:
+            return None
+        self._listings.pop(key)
+        if time.monotonic() - prefetched.listed_at > self.max_age:
+            return None
+        try:
+            mtime_ns = backend_for(path).stat(path).st_mtime_ns
+        except OSError:
+            return None
+        return prefetched.listing if mtime_ns == prefetched.mtime_ns else None
+
+
+prefetcher = DirPrefetcher()
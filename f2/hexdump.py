@@ -0,0 +1,56 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+from rich.text import Text
+
+# printable ASCII characters are shown as is, and all other bytes as dots:
+_ASCII = "".join(chr(b) if 32 <= b < 127 else "." for b in range(256))
+
+
+def offset_digits(size: int) -> int:
+    """Number of hex digits needed to show any offset in a file of a given size"""
+    return max(8, len(f"{size:x}"))
+
+
+def row_width(viewport_width: int, digits: int = 8) -> int:
+    """Number of bytes to show in a row that fits in a given number of characters"""
+    for width in (16, 8, 4):
+        if row_length(width, digits) <= viewport_width:
+            return width
+    return 4
+
+
+def row_length(width: int, digits: int = 8) -> int:
+    """Number of characters in a row showing `width` bytes"""
+    # offset, 3 chars per byte in hex + 1 in ASCII, and the separators:
+    return digits + 4 * width + 6
+
+
+def format_row(offset: int, data: bytes, width: int = 16, digits: int = 8) -> Text:
+    """Format a row like `hexdump -C` does: offset, bytes in hex, bytes in ASCII"""
+    hex_bytes = [f"{b:02x}" for b in data] + ["  "] * (width - len(data))
+    half = width // 2
+    hex_str = " ".join(hex_bytes[:half]) + "  " + " ".join(hex_bytes[half:])
+    return Text.assemble(
+        (f"{offset:0{digits}x}", "dim"),
+        "  ",
+        hex_str,
+        "  |",
+        data.decode("latin-1").translate(_ASCII),
+        "|",
+    )
+
+
+def hexdump(data: bytes, offset: int, width: int = 16, digits: int = 8) -> Text:
+    """Format a block of bytes read from a given offset, `width` bytes per row"""
+    text = Text(no_wrap=True, overflow="crop")
+    for row_start in range(0, len(data), width):
+        if row_start > 0:
+            text.append("\n")
+        row_end = row_start + width
+        row = data[row_start:row_end]
+        text.append(format_row(offset + row_start, row, width, digits))
+    return text
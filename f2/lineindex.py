@@ -0,0 +1,248 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable
+
+
+class LineIndex:
+    """Line-oriented random access to a file of any size.
+
+    The file is memory-mapped, and all navigation is done with byte offsets, so
+    that any position in the file (e.g., its end, or a given percentage) can be
+    reached instantly. Line numbers are only known for the part of the file that
+    was already indexed: call `build` (e.g., in a background thread) to index the
+    whole file, or `offset_of_line` to index it up to a given line.
+
+    The index is sparse: only the number of lines before every block of the file
+    is kept (counted with `bytes.count`), and the lines are found by scanning
+    forward from the start of their block.
+
+    Note that the file is expected to remain unchanged while it is open."""
+
+    CHUNK_SIZE = 1024 * 1024
+    BLOCK_SIZE = 64 * 1024  # a checkpoint per block, CHUNK_SIZE is a multiple
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # empty files cannot be mapped
+            self._buf: mmap.mmap | bytes = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+            )
+        self.size = len(self._buf)
+        # number of line ends before every block indexed so far:
+        self._checkpoints = array("Q", [0])
+        self._line_ends = 0  # number of line ends indexed so far
+        self._indexed_to = 0  # number of bytes indexed so far
+        # held while the file is read in background (indexed or searched):
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def close(self):
+        """Close the file, once the background reads are stopped"""
+        self._closed = True  # stops `build`, `offset_of_line` and `search`
+        with self._lock:
+            if isinstance(self._buf, mmap.mmap):
+                try:
+                    self._buf.close()
+                except BufferError:
+                    pass  # still exported, will be closed when collected
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    #
+    # INDEXING:
+    #
+
+    def _index_chunk(self, chunk_size: int) -> bool:
+        """Index next chunk of the file; return True if the file is fully indexed"""
+        with self._lock:
+            if self._closed:
+                return True
+            start = self._indexed_to
+            end = min(start + chunk_size, self.size)
+            for block_start in range(start, end, self.BLOCK_SIZE):
+                block_end = min(block_start + self.BLOCK_SIZE, end)
+                block_data = self._buf[block_start:block_end]  # mmap has no count
+                self._line_ends += block_data.count(b"\n")
+                if block_end % self.BLOCK_SIZE == 0:
+                    self._checkpoints.append(self._line_ends)
+            self._indexed_to = end
+            return end >= self.size
+
+    def build(self):
+        """Index the whole file; returns early if the index is closed meanwhile"""
+        while not self._index_chunk(self.CHUNK_SIZE):
+            pass
+
+    @property
+    def is_complete(self) -> bool:
+        return self._indexed_to >= self.size
+
+    @property
+    def indexed_fraction(self) -> float:
+        return self._indexed_to / self.size if self.size > 0 else 1.0
+
+    @property
+    def line_count(self) -> int | None:
+        """Number of lines in the file, if already known"""
+        if not self.is_complete:
+            return None
+        if self.size == 0:
+            return 0
+        # the last line may or may not end with a line end:
+        return self._line_ends + (self._buf[-1:] != b"\n")
+
+    def offset_of_line(self, line: int) -> int:
+        """Offset of the line with the given (0-based) number, indexing the file
+        up to that line if needed. Lines past the end are clamped to the last one"""
+        while self._line_ends < line and not self._index_chunk(self.CHUNK_SIZE):
+            pass
+        line = max(0, min(line, (self.line_count or self._line_ends + 1) - 1))
+        if line == 0:
+            return 0
+        # the line starts after the line end number `line`, in this block:
+        block = bisect_left(self._checkpoints, line) - 1
+        pos = block * self.BLOCK_SIZE - 1
+        with self._lock:
+            if self._closed:
+                return 0
+            for _ in range(line - self._checkpoints[block]):
+                pos = self._buf.find(b"\n", pos + 1)
+        return pos + 1
+
+    def line_of_offset(self, offset: int) -> int | None:
+        """Number of the line at the given offset, if already indexed"""
+        if offset > self._indexed_to and not self.is_complete:
+            return None
+        offset = max(0, min(offset, self.size - 1))  # in the last line at most
+        block = offset // self.BLOCK_SIZE
+        block_start = block * self.BLOCK_SIZE
+        return self._checkpoints[block] + self._buf[block_start:offset].count(b"\n")
+
+    #
+    # NAVIGATION:
+    #
+
+    def line_start(self, offset: int) -> int:
+        """Offset of the start of the line that contains the given offset"""
+        offset = max(0, min(offset, self.size))
+        return self._buf.rfind(b"\n", 0, offset) + 1
+
+    def next_line(self, offset: int) -> int | None:
+        """Offset of the line following the one at the given offset, if any"""
+        pos = self._buf.find(b"\n", offset)
+        return pos + 1 if pos != -1 and pos + 1 < self.size else None
+
+    def prev_line(self, offset: int) -> int | None:
+        """Offset of the line preceding the one at the given offset, if any"""
+        start = self.line_start(offset)
+        return self.line_start(start - 1) if start > 0 else None
+
+    def offset_at(self, fraction: float) -> int:
+        """Offset of the line at a given fraction of the file size"""
+        return self.line_start(int(self.size * max(0.0, min(fraction, 1.0))))
+
+    def tail_offset(self, count: int) -> int:
+        """Offset of the first of the last `count` lines of the file"""
+        offset = self.line_start(self.size - 1) if self.size > 0 else 0
+        for _ in range(count - 1):
+            prev = self.prev_line(offset)
+            if prev is None:
+                break
+            offset = prev
+        return offset
+
+    def read(self, offset: int, size: int) -> bytes:
+        """Read (at most) `size` bytes at a given offset"""
+        end = min(offset + size, self.size)
+        return self._buf[offset:end]
+
+    def read_line(self, offset: int, max_bytes: int) -> bytes:
+        """Read a line at a given offset, without the line ending. Lines longer
+        than `max_bytes` are cut"""
+        end = self._buf.find(b"\n", offset, offset + max_bytes)
+        if end == -1:
+            end = min(offset + max_bytes, self.size)
+        return self._buf[offset:end].rstrip(b"\r")
+
+    def read_lines(
+        self, offset: int, count: int, max_bytes: int
+    ) -> list[tuple[int, bytes]]:
+        """Read up to `count` lines starting at the given offset, as a list of
+        (offset, line) tuples. Every line is read up to `max_bytes` at most."""
+        lines: list[tuple[int, bytes]] = []
+        pos: int | None = offset if offset < self.size else None
+        while pos is not None and len(lines) < count:
+            lines.append((pos, self.read_line(pos, max_bytes)))
+            pos = self.next_line(pos)
+        return lines
+
+    #
+    # SEARCH:
+    #
+
+    def _chunk_end(self, offset: int) -> int:
+        """End of a chunk starting at the given offset, aligned to a line end when
+        possible, so that lines are not split between the chunks"""
+        end = min(offset + self.CHUNK_SIZE, self.size)
+        pos = self._buf.find(b"\n", end, end + self.CHUNK_SIZE)
+        return pos + 1 if pos != -1 else min(end + self.CHUNK_SIZE, self.size)
+
+    def search(
+        self,
+        pattern: re.Pattern[bytes],
+        start: int,
+        backwards: bool = False,
+        is_cancelled: Callable[[], bool] = lambda: False,
+    ) -> tuple[int, int] | None:
+        """Find the next (or previous) match of a pattern from the given offset.
+        Returns the (start, end) offsets of the match, or None if not found.
+
+        The file is scanned in chunks directly in the mapped memory, and the
+        search can be stopped between the chunks with `is_cancelled` (or by closing
+        the index). Compile the pattern with `re.MULTILINE` to make `^` and `$`
+        match at line bounds."""
+
+        if not backwards:
+            pos = start
+            while pos < self.size and not is_cancelled():
+                with self._lock:
+                    if self._closed:
+                        return None
+                    end = self._chunk_end(pos)
+                    match = pattern.search(self._buf, pos, end)  # type: ignore
+                if match is not None:
+                    return match.span()
+                pos = end
+        else:
+            end = start
+            while end > 0 and not is_cancelled():
+                with self._lock:
+                    if self._closed:
+                        return None
+                    pos = self.line_start(max(end - self.CHUNK_SIZE, 0))
+                    if pos == end:  # a single line longer than the chunk
+                        pos = max(end - self.CHUNK_SIZE, 0)
+                    last_match = None
+                    for match in pattern.finditer(self._buf, pos, end):  # type: ignore
+                        last_match = match
+                if last_match is not None:
+                    return last_match.span()
+                end = pos
+        return None
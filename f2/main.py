@@ -4,9 +4,18 @@
 #
 # Copyright (c) 2024 Timur Rubeko
 
-from .app import F2Commander
+import sys
 
 
 def main():
+    if len(sys.argv) > 1:
+        from .cli import run  # without the app, that takes a while to import
+
+        sys.exit(run(sys.argv[1:]))
+
+    from .app import F2Commander
+    from .processes import start_resource_tracker
+
+    start_resource_tracker()  # while the stderr is not captured by the UI yet
     app = F2Commander()
     app.run()
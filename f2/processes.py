@@ -0,0 +1,16 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+from multiprocessing import resource_tracker
+
+
+def start_resource_tracker():
+    """Start the process that multiprocessing uses to clean up after the worker
+    processes (e.g., those of the search in file contents). It inherits the stderr,
+    and fails to start if `sys.stderr` has no file descriptor (e.g., when the output
+    is captured by the UI), so it must be started once at startup, before the UI is
+    run."""
+    resource_tracker.ensure_running()
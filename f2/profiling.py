@@ -0,0 +1,179 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator, TypeVar
+
+PROFILE_ENV = "F2_PROFILE"  # set to 1 to collect the timings
+TRACE_ENV = "F2_PROFILE_TRACE"  # path to the trace file written on exit
+
+F = TypeVar("F", bound=Callable)
+
+
+@dataclass
+class SpanStats:
+    name: str
+    count: int  # since the start
+    total: float  # sec., since the start
+    p50: float  # sec., over the last measurements
+    p90: float
+    p99: float
+    max: float  # sec., since the start
+
+
+class _Timings:
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last: deque[float] = deque(maxlen=window)
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.last.append(duration)
+
+
+class Profiler:
+    """Timings of the spans of code that run often (listings, table updates,
+    previews, etc.), for the "Performance" panel and for a trace file.
+
+    Only collects the timings when enabled. The functions decorated with `timed`
+    are left as is when the profiler is disabled at import time, and `span` costs
+    a function call only, so that the spans can stay in the hot paths. The
+    percentiles are computed over the last `window` measurements of every span,
+    and the trace holds the last `trace_size` spans, in the Trace Event Format
+    (that chrome://tracing and Perfetto can open)."""
+
+    def __init__(
+        self,
+        enabled: bool,
+        trace_file: Path | None = None,
+        window: int = 1000,
+        trace_size: int = 100_000,
+    ):
+        self.enabled = enabled
+        self.trace_file = trace_file
+        self.window = window
+        self._timings: dict[str, _Timings] = {}
+        self._trace: deque[tuple[str, float, float, int]] = deque(maxlen=trace_size)
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()  # spans are also timed in worker threads
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        trace_file = os.environ.get(TRACE_ENV)
+        enabled = os.environ.get(PROFILE_ENV, "") not in ("", "0") or bool(trace_file)
+        return cls(enabled, Path(trace_file) if trace_file else None)
+
+    def span(self, name: str) -> ContextManager:
+        """Time a block of code"""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """Time every call of the decorated function"""
+
+        def decorator(fn: F) -> F:
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self._span(name):
+                    return fn(*args, **kwargs)
+
+            return wrapper  # type: ignore
+
+        return decorator
+
+    def record(self, name: str, start: float, duration: float):
+        with self._lock:
+            timings = self._timings.get(name)
+            if timings is None:
+                timings = self._timings[name] = _Timings(self.window)
+            timings.add(duration)
+            self._trace.append((name, start, duration, threading.get_ident()))
+
+    def stats(self) -> list[SpanStats]:
+        """The timings of every span, the most time consuming first"""
+        with self._lock:
+            snapshot = [
+                (name, t.count, t.total, t.max, sorted(t.last))
+                for name, t in self._timings.items()
+            ]
+        stats = [
+            SpanStats(
+                name,
+                count,
+                total,
+                _percentile(last, 0.5),
+                _percentile(last, 0.9),
+                _percentile(last, 0.99),
+                max_duration,
+            )
+            for name, count, total, max_duration, last in snapshot
+        ]
+        return sorted(stats, key=lambda s: s.total, reverse=True)
+
+    def save_trace(self):
+        """Write the trace to the trace file, if any"""
+        if self.trace_file is None:
+            return
+        with self._lock:
+            trace = list(self._trace)
+        events = [
+            {
+                "name": name,
+                "ph": "X",  # a complete event, with a duration
+                "ts": (start - self._started_at) * 1e6,  # in µs
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": thread_id,
+            }
+            for name, start, duration, thread_id in trace
+        ]
+        summary = {
+            s.name: {
+                "count": s.count,
+                "total": s.total,
+                "p50": s.p50,
+                "p90": s.p90,
+                "p99": s.p99,
+                "max": s.max,
+            }
+            for s in self.stats()
+        }
+        try:
+            with open(self.trace_file, "w") as f:
+                json.dump({"traceEvents": events, "summary": summary}, f)
+        except OSError:
+            pass  # nowhere to report it on exit
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+profiler = Profiler.from_env()
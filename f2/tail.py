@@ -0,0 +1,87 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import codecs
+import os
+from pathlib import Path
+from typing import BinaryIO
+
+
+class FileTail:
+    """Follows a (growing) text file, like `tail -F` does.
+
+    `read_tail` reads the last lines of the file, and then `read_new` only reads
+    the bytes written to the file since the last read. If the file is truncated or
+    replaced (e.g., by log rotation), it is re-opened and read from the start."""
+
+    def __init__(self, path: Path, max_lines: int, max_bytes: int = 256 * 1024):
+        self.path = path
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes  # never read more than this at once
+        self._file: BinaryIO | None = None
+        self._file_id: tuple[int, int] | None = None
+        self._pos = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self) -> os.stat_result:
+        self.close()
+        self._file = open(self.path, "rb")
+        statinfo = os.fstat(self._file.fileno())
+        self._file_id = (statinfo.st_dev, statinfo.st_ino)
+        self._pos = 0
+        self._decoder.reset()
+        return statinfo
+
+    def _read(self, size: int) -> bytes:
+        self._file.seek(self._pos)  # type: ignore
+        data = self._file.read(size)  # type: ignore
+        self._pos += len(data)
+        return data
+
+    def read_tail(self) -> str:
+        """(Re-)open the file and read its last `max_lines` lines"""
+        size = self._open().st_size
+        start = self._pos = max(0, size - self.max_bytes)
+        data = self._read(size - start)
+        if start > 0:  # started mid-file => skip the incomplete line
+            _, _, data = data.partition(b"\n")
+        lines = self._decoder.decode(data).splitlines(keepends=True)
+        skip = max(len(lines) - self.max_lines, 0)
+        return "".join(lines[skip:])
+
+    def read_new(self) -> tuple[bool, str]:
+        """Read what was written to the file since the last read. Returns a
+        (reset, text) tuple: if `reset` is True, the file was truncated or replaced
+        since, and `text` is its new tail rather than a continuation."""
+        if self._file is None:
+            return True, self.read_tail()
+
+        try:
+            statinfo = os.stat(self.path)
+        except FileNotFoundError:
+            return False, ""  # may be in the middle of a rotation, wait for the file
+
+        file_id = (statinfo.st_dev, statinfo.st_ino)
+        if file_id != self._file_id or statinfo.st_size < self._pos:
+            return True, self.read_tail()
+        elif statinfo.st_size - self._pos > self.max_bytes:
+            return True, self.read_tail()  # too far behind, skip to the end
+        elif statinfo.st_size > self._pos:
+            data = self._read(statinfo.st_size - self._pos)
+            return False, self._decoder.decode(data)
+        else:
+            return False, ""
@@ -16,6 +16,7 @@ from textual.widgets import Button, Label, OptionList
 from textual.widgets.option_list import Option
 
 from ..config import config
+from ..fs.backend import backend_for, is_available
 
 
 class GoToBookmarkDialog(ModalScreen):
@@ -34,9 +35,12 @@ class GoToBookmarkDialog(ModalScreen):
 
     def _to_option(self, idx: int, path: str) -> Option:
         prefix = (f"[{idx}]", "grey50") if idx in range(1, 10) else "   "
+        dir_path = self._dir_path(path)
+        # an unresponsive mount is only probed once, and is skipped after that:
+        status = "" if is_available(Path(path).expanduser()) else " (unavailable)"
         return Option(
-            Text.assemble(prefix, " ", path),  # type: ignore
-            disabled=self._dir_path(path) is None,
+            Text.assemble(prefix, " ", path, (status, "red")),  # type: ignore
+            disabled=dir_path is None,
         )
 
     def compose(self) -> ComposeResult:
@@ -73,4 +77,4 @@ class GoToBookmarkDialog(ModalScreen):
         path = Path(maybe_dir_path)
         if "~" in maybe_dir_path:
             path = path.expanduser()
-        return path if path.is_dir() else None
+        return path if backend_for(path).is_dir(path) else None
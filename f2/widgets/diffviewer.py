@@ -0,0 +1,290 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import threading
+from pathlib import Path
+
+from rich.markup import escape
+from rich.text import Text
+from textual import work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Vertical
+from textual.screen import Screen
+from textual.widgets import Footer, Static
+from textual.worker import get_current_worker
+
+from ..fs.diff import DiffRow, side_by_side
+from .dialogs import StaticDialog
+
+
+class DiffViewer(Screen):
+    """Side by side comparison of two text files of any size. The rows are only
+    computed up to the last one shown (or navigated to), so that the files are
+    only read as far as needed, and only the last rows computed are kept (the
+    comparison is restarted from the beginning to go back further)."""
+
+    BINDINGS = [
+        Binding("q", "close", "Close"),
+        Binding("escape", "close", show=False),
+        Binding("j,down", "scroll_lines(1)", show=False),
+        Binding("k,up", "scroll_lines(-1)", show=False),
+        Binding("space,ctrl+f,pagedown", "scroll_pages(1)", show=False),
+        Binding("b,ctrl+b,pageup", "scroll_pages(-1)", show=False),
+        Binding("ctrl+d", "scroll_pages(0.5)", show=False),
+        Binding("ctrl+u", "scroll_pages(-0.5)", show=False),
+        Binding("g,home", "top", "Top"),
+        Binding("G,end", "bottom", "Bottom"),
+        Binding("n", "next_change(False)", "Next change"),
+        Binding("N", "next_change(True)", "Previous change"),
+    ]
+
+    CONTEXT = 3  # same lines shown around the changes
+    KEEP_ROWS = 10_000  # at least this many last computed rows are kept
+    NUMBER_WIDTH = 6
+    LEFT_STYLE = "#ff5f5f"
+    RIGHT_STYLE = "#5fd700"
+
+    def __init__(self, left: Path, right: Path, offset: int, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.left = left
+        self.right = right
+        self.diff_offset = offset  # of the first difference
+        self.top = 0  # the first row in the viewport
+        self._rows_lock = threading.Lock()  # the rows are computed in one thread
+        self._rows_iter = side_by_side(left, right, self.CONTEXT)
+        self._rows: list[DiffRow] = []  # the last rows computed
+        self._first = 0  # index of the first row kept
+        self._dropped_is_change = False  # the row before the first kept one
+        self._row_count = 0  # rows computed since the comparison was (re)started
+        self._total: int | None = None  # of the rows, once all were computed
+        self._change_count = 0  # changes in the first `_counted_to` rows
+        self._counted_to = 0
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="viewer"):
+            self.content = Static(id="content")
+            yield self.content
+        yield Footer()
+
+    def on_mount(self):
+        viewer: Vertical = self.query_one("#viewer")  # type: ignore
+        viewer.border_title = f"{escape(str(self.left))} ↔ {escape(str(self.right))}"
+
+    def on_unmount(self):
+        self.workers.cancel_group(self, "navigation")
+        with self._rows_lock:
+            self._rows_iter.close()  # closes the files
+
+    def on_resize(self):
+        self._update_content()
+
+    def _compute_rows(self, count: int, blocking: bool = True) -> bool:
+        """Compute the rows up to `count` rows (if not computed yet). Returns False
+        if the rows are being computed by another thread, and `blocking` is False."""
+        if not self._rows_lock.acquire(blocking=blocking):
+            return False
+        try:
+            self._compute_rows_locked(count)
+        finally:
+            self._rows_lock.release()
+        return True
+
+    def _compute_rows_locked(self, count: int, start: int | None = None):
+        """Compute the rows up to `count` rows, with the rows from `start` on kept
+        (computed again if they were dropped)"""
+        if start is not None and start < self._first:
+            self._restart()
+        while self._row_count < count and self._next_row() is not None:
+            pass
+
+    def _restart(self):
+        self._rows_iter.close()
+        self._rows_iter = side_by_side(self.left, self.right, self.CONTEXT)
+        self._rows = []
+        self._first = self._row_count = 0
+        self._dropped_is_change = False
+
+    def _next_row(self) -> DiffRow | None:
+        """Compute the next row, counting the changes on the way, and drop the
+        oldest rows if too many are kept"""
+        row = next(self._rows_iter, None)
+        if row is None:
+            self._total = self._row_count
+            return None
+        self._rows.append(row)
+        self._row_count += 1
+        if self._row_count > self._counted_to:
+            self._counted_to = self._row_count
+            self._change_count += self._is_change_start(self._row_count - 1)
+        if len(self._rows) > 2 * self.KEEP_ROWS:
+            self._dropped_is_change = self._rows[-self.KEEP_ROWS - 1].is_change
+            del self._rows[: -self.KEEP_ROWS]
+            self._first = self._row_count - self.KEEP_ROWS
+        return row
+
+    def _row(self, idx: int) -> DiffRow:
+        return self._rows[idx - self._first]
+
+    def _is_change_start(self, idx: int) -> bool:
+        if idx > self._first:
+            previous_is_change = self._row(idx - 1).is_change
+        else:
+            previous_is_change = idx > 0 and self._dropped_is_change
+        return self._row(idx).is_change and not previous_is_change
+
+    #
+    # RENDERING:
+    #
+
+    @property
+    def _page_height(self) -> int:
+        return max(self.content.size.height, 1)
+
+    def _fmt_half(self, no: int | None, line: str | None, width: int, style: str):
+        text = Text(no_wrap=True, overflow="crop")
+        if no is None:
+            return text.append(" " * width)
+        text.append(f"{no:>{self.NUMBER_WIDTH}} ", style="grey50")
+        line_width = max(width - self.NUMBER_WIDTH - 1, 0)
+        text.append(f"{(line or '').expandtabs():<{line_width}.{line_width}}", style)
+        return text
+
+    def _fmt_row(self, row: DiffRow, width: int) -> Text:
+        if row.skipped > 0:
+            return Text(f"··· {row.skipped} same lines ···", style="dim")
+        half = max((width - 3) // 2, 0)
+        change = row.is_change
+        return Text.assemble(
+            self._fmt_half(
+                row.left_no, row.left, half, self.LEFT_STYLE if change else ""
+            ),
+            (" │ ", "grey50"),
+            self._fmt_half(
+                row.right_no, row.right, half, self.RIGHT_STYLE if change else ""
+            ),
+        )
+
+    def _update_content(self):
+        # don't wait for the rows computed in background (they are shown once
+        # computed), show the ones known:
+        top, bottom = self.top, self.top + self._page_height
+        if not self._rows_lock.acquire(blocking=False):
+            return
+        try:
+            self._compute_rows_locked(bottom, start=top)
+            start, end = max(top - self._first, 0), bottom - self._first
+            rows = self._rows[start:end]
+        finally:
+            self._rows_lock.release()
+        width = max(self.content.size.width, 1)
+        text = Text(no_wrap=True, overflow="crop")
+        for i, row in enumerate(rows):
+            if i > 0:
+                text.append("\n")
+            text.append(self._fmt_row(row, width))
+        self.content.update(text)
+        self._update_status()
+
+    def _update_status(self):
+        changes = self._change_count
+        changes_str = f"{changes}" if self._total is not None else f"{changes}+"
+        status = (
+            f"{changes_str} changes | first difference at byte {self.diff_offset} "
+            f"(0x{self.diff_offset:x})"
+        )
+        self.query_one("#viewer").border_subtitle = status
+
+    def _move_to(self, row: int):
+        if self._total is not None:
+            # don't scroll past the last screenful of rows:
+            row = min(row, self._total - self._page_height)
+        self.top = max(row, 0)
+        self._update_content()
+
+    #
+    # ACTIONS:
+    #
+
+    def action_close(self):
+        self.dismiss()
+
+    def action_scroll_lines(self, count: int):
+        self._compute_rows(self.top + count + self._page_height, blocking=False)
+        self._move_to(min(self.top + count, max(self._row_count - 1, 0)))
+
+    def action_scroll_pages(self, count: float):
+        self.action_scroll_lines(int(count * self._page_height))
+
+    def action_top(self):
+        self._move_to(0)
+
+    def action_bottom(self):
+        self._navigate(None, backwards=False)
+
+    def action_next_change(self, backwards: bool):
+        self._navigate(self.top + self.CONTEXT, backwards)
+
+    @work(thread=True, exclusive=True, group="navigation")
+    def _navigate(self, start: int | None, backwards: bool):
+        """Move to the next (or previous) change after the `start` row, or to the
+        bottom if the `start` is None. The rows are computed as far as needed."""
+        worker = get_current_worker()
+        if start is None:
+            while self._total is None and not worker.is_cancelled:
+                self._compute_rows(self._row_count + 1000)
+            if self._total is not None:
+                self.app.call_from_thread(self._move_to, self._total)
+            return
+
+        with self._rows_lock:
+            if backwards:
+                target = self._previous_change(start, lambda: worker.is_cancelled)
+            else:
+                target = self._next_change(start, lambda: worker.is_cancelled)
+        if worker.is_cancelled:
+            return
+        if target is None:
+            msg = "No more changes"
+            self.app.call_from_thread(
+                self.app.push_screen, StaticDialog.info("Nope...", msg)
+            )
+        else:
+            self.app.call_from_thread(self._move_to, target - self.CONTEXT)
+
+    def _next_change(self, start: int, is_cancelled) -> int | None:
+        """The first change after the `start` row. Called with the rows locked."""
+        if start + 1 < self._first:
+            self._restart()
+        idx = start + 1
+        while not is_cancelled():
+            while self._row_count <= idx and self._next_row() is not None:
+                pass
+            if idx >= self._row_count:
+                return None
+            if self._is_change_start(idx):
+                return idx
+            idx += 1
+        return None
+
+    def _previous_change(self, start: int, is_cancelled) -> int | None:
+        """The last change before the `start` row, looked up in the rows kept, or
+        in the rows computed again from the beginning if they were dropped. Called
+        with the rows locked."""
+        for idx in range(min(start, self._row_count) - 1, self._first - 1, -1):
+            if self._is_change_start(idx):
+                return idx
+        if self._first == 0:
+            return None
+        end = min(start, self._first)  # the rows after it were looked up already
+        self._restart()
+        target = None
+        while self._row_count < end and not is_cancelled():
+            if self._next_row() is None:
+                break
+            if self._is_change_start(self._row_count - 1):
+                target = self._row_count - 1
+        return target
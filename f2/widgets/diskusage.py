@@ -0,0 +1,172 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import time
+from pathlib import Path
+
+from humanize import naturalsize
+from rich.markup import escape
+from rich.text import Text
+from textual import events, on, work
+from textual.app import ComposeResult
+from textual.widget import Widget
+from textual.widgets import OptionList, Static
+from textual.widgets.option_list import Option
+from textual.worker import get_current_worker
+
+from ..fs.du import NO_PARENT, SizeTree
+from .filelist import FileList
+
+
+class DiskUsage(Static):
+    """Disk usage of a directory tree: the entries of a directory, the largest
+    first. The tree is scanned once, and shown as it is scanned; entering the
+    directories does not scan them again. The directory shown in the other panel
+    is scanned when the panel is opened."""
+
+    UPDATE_INTERVAL = 0.5  # show the scan progress at most this often
+    MAX_SHOWN = 1000  # entries of a directory, the largest ones
+    BAR_WIDTH = 10
+
+    _scan_id: int = 0  # to ignore the progress of a replaced scan
+    _tree: SizeTree | None = None
+    _current: int = 0  # the directory shown, in the tree
+
+    def compose(self) -> ComposeResult:
+        self.option_list = OptionList()
+        yield self.option_list
+
+    def on_mount(self):
+        self._shown: list[int] = []  # node of every option, by option index
+        self._status: str | None = None
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = "Disk usage"
+        parent.border_subtitle = "press [bold]u[/bold] to analyze disk usage"
+        file_list = self._other_file_list()
+        if file_list is not None:
+            self.scan(file_list.path, file_list.show_hidden)
+
+    def _other_file_list(self) -> FileList | None:
+        parent: Widget = self.parent  # type: ignore
+        other_panel = "#left > *" if parent.id == "right" else "#right > *"
+        file_list = self.app.query_one(other_panel)
+        return file_list if isinstance(file_list, FileList) else None
+
+    def scan(self, root: Path, include_hidden: bool):
+        """Scan the directory tree, replacing the previous scan"""
+        self.workers.cancel_group(self, "du")
+        self._scan_id += 1
+        self._tree = SizeTree(root)
+        self._current = 0
+        self._status = "scanning..."
+        self._show()
+        self._scan(self._scan_id, self._tree, include_hidden)
+
+    @work(thread=True, exclusive=True, group="du")
+    def _scan(self, scan_id: int, tree: SizeTree, include_hidden: bool):
+        worker = get_current_worker()
+        started_at = shown_at = time.monotonic()
+        for _ in tree.scan(include_hidden, is_cancelled=lambda: worker.is_cancelled):
+            now = time.monotonic()
+            if now - shown_at > self.UPDATE_INTERVAL:
+                self.app.call_from_thread(self._on_progress, scan_id)
+                shown_at = now
+        elapsed = time.monotonic() - started_at
+        status = "cancelled" if worker.is_cancelled else f"done in {elapsed:.1f} s"
+        self.app.call_from_thread(self._on_progress, scan_id, status)
+
+    def _on_progress(self, scan_id: int, status: str | None = None):
+        if scan_id != self._scan_id or not self.is_attached:
+            return  # the scan was replaced, or the panel was closed
+        self._status = status or "scanning..."
+        self._show()
+
+    def _show(self, cursor_node: int | None = None):
+        """Show the entries of the current directory, keeping the cursor on the
+        same entry (or moving it to `cursor_node`)"""
+        tree = self._tree
+        if tree is None:
+            return
+        highlighted = self.option_list.highlighted
+        if cursor_node is None and highlighted is not None and self._shown:
+            cursor_node = self._shown[highlighted]
+
+        current = self._current
+        total = tree.size(current)
+        self._shown = []
+        options = []
+        first_entry = 0
+        if tree.parent(current) != NO_PARENT:
+            first_entry = 1
+            self._shown.append(tree.parent(current))
+            options.append(Option(" " * (self.BAR_WIDTH + 20) + ".."))
+        largest = tree.largest_children(current, self.MAX_SHOWN)
+        for idx in largest:
+            self._shown.append(idx)
+            options.append(Option(self._format(tree, idx, total)))
+        hidden_count = len(tree.children(current)) - len(largest)
+        if hidden_count > 0:
+            options.append(Option(f"... {hidden_count} smaller entries", disabled=True))
+
+        self.option_list.clear_options()
+        self.option_list.add_options(options)
+        if cursor_node in self._shown:
+            self.option_list.highlighted = self._shown.index(cursor_node)
+        elif self._shown:
+            self.option_list.highlighted = min(first_entry, len(self._shown) - 1)
+
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = escape(str(tree.path_of(current)))
+        summary = f"{naturalsize(total)} in {tree.count(current)} entries"
+        parent.border_subtitle = f"{self._status} | {summary}"
+
+    def _format(self, tree: SizeTree, idx: int, total: int) -> Text:
+        size = tree.size(idx)
+        share = size / total if total > 0 else 0.0
+        filled = round(share * self.BAR_WIDTH)
+        bar = "█" * filled + "░" * (self.BAR_WIDTH - filled)
+        name = tree.name(idx) + ("/" if tree.is_dir(idx) else "")
+        return Text.assemble(
+            (f"{naturalsize(size):>10} ", "bold"),
+            (f"{share:6.1%} ", "grey50"),
+            (bar, "green"),
+            "  ",
+            (name, "bold" if tree.is_dir(idx) else ""),
+        )
+
+    @on(OptionList.OptionSelected)
+    def on_entry_selected(self, event: OptionList.OptionSelected):
+        tree = self._tree
+        if tree is None:
+            return
+        idx = self._shown[event.option_index]
+        if idx == tree.parent(self._current):
+            self.action_go_up()
+        elif tree.is_dir(idx):
+            self._current = idx
+            self._show(cursor_node=NO_PARENT)
+        else:
+            # show the file in the other panel:
+            file_list = self._other_file_list()
+            if file_list is not None:
+                file_list.go_to(tree.path_of(idx))
+                file_list.table.focus()
+
+    def action_go_up(self):
+        if self._tree is not None and self._tree.parent(self._current) != NO_PARENT:
+            previous = self._current
+            self._current = self._tree.parent(previous)
+            self._show(cursor_node=previous)
+
+    def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            self.workers.cancel_group(self, "du")
+        elif event.key == "backspace":
+            self.action_go_up()
+        elif event.key == "j":
+            self.option_list.action_cursor_down()
+        elif event.key == "k":
+            self.option_list.action_cursor_up()
@@ -0,0 +1,240 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import time
+from pathlib import Path
+
+from humanize import naturalsize
+from rich.markup import escape
+from rich.text import Text
+from textual import events, on, work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.widget import Widget
+from textual.widgets import OptionList, Static
+from textual.widgets.option_list import Option
+from textual.worker import get_current_worker
+
+from ..fs.backend import backend_for
+from ..fs.dupes import DuplicateGroup, find_duplicates, replace_with_hardlink
+from .dialogs import StaticDialog, Style
+from .filelist import FileList
+
+
+class Duplicates(Static):
+    """Groups of the files with the same contents, shown as they are found. The
+    file under cursor is kept, and the other files of its group can be deleted
+    or replaced with hard links to it."""
+
+    BINDINGS = [
+        Binding("d", "delete_duplicates", "Delete duplicates", show=False),
+        Binding("l", "link_duplicates", "Hard link duplicates", show=False),
+    ]
+    UPDATE_INTERVAL = 0.2  # show new groups at most this often
+
+    _search_id: int = 0  # to ignore the groups of a replaced search
+
+    def compose(self) -> ComposeResult:
+        self.option_list = OptionList()
+        yield self.option_list
+
+    def on_mount(self):
+        self._groups: list[DuplicateGroup] = []
+        self._targets: list[tuple[int, Path | None]] = []  # group and file, by option
+        self._status = ""
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = "Duplicates"
+        parent.border_subtitle = "find duplicates from the Command Palette"
+
+    def search(self, roots: list[Path], include_hidden: bool):
+        """Look for duplicates in the directory trees, replacing the previous
+        search"""
+        self.workers.cancel_group(self, "dupes")
+        self._search_id += 1
+        self._groups = []
+        self._targets = []
+        self.option_list.clear_options()
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = "Duplicates in " + ", ".join(
+            escape(str(r)) for r in roots
+        )
+        self._status = "searching..."
+        self._update_subtitle()
+        self._find(self._search_id, roots, include_hidden)
+
+    @work(thread=True, exclusive=True, group="dupes")
+    def _find(self, search_id: int, roots: list[Path], include_hidden: bool):
+        worker = get_current_worker()
+        started_at = shown_at = time.monotonic()
+        found: list[DuplicateGroup] = []
+        for group in find_duplicates(
+            roots,
+            include_hidden=include_hidden,
+            is_cancelled=lambda: worker.is_cancelled,
+        ):
+            found.append(group)
+            now = time.monotonic()
+            if now - shown_at > self.UPDATE_INTERVAL or shown_at == started_at:
+                self.app.call_from_thread(self._show_groups, search_id, found)
+                found = []
+                shown_at = now
+        elapsed = time.monotonic() - started_at
+        status = "cancelled" if worker.is_cancelled else f"done in {elapsed:.1f} s"
+        self.app.call_from_thread(self._show_groups, search_id, found, status)
+
+    def _show_groups(
+        self,
+        search_id: int,
+        found: list[DuplicateGroup],
+        status: str | None = None,
+    ):
+        if search_id != self._search_id or not self.is_attached:
+            return  # the search was replaced, or the panel was closed
+        for group in found:
+            self._groups.append(group)
+            self.option_list.add_options(self._group_options(len(self._groups) - 1))
+        self._status = status or "searching..."
+        self._update_subtitle()
+
+    def _group_options(self, group_idx: int) -> list[Option]:
+        group = self._groups[group_idx]
+        header = f"{len(group.paths)} × {naturalsize(group.size)}"
+        options = [Option(Text(header, "bold"))]
+        self._targets.append((group_idx, None))
+        for path in group.paths:
+            options.append(Option(Text(f"  {path}")))
+            self._targets.append((group_idx, path))
+        return options
+
+    def _update_subtitle(self):
+        wasted = sum(g.wasted for g in self._groups)
+        summary = f"{len(self._groups)} groups, {naturalsize(wasted)} in duplicates"
+        hint = "[bold]d[/bold]elete or [bold]l[/bold]ink the others"
+        parent: Widget = self.parent  # type: ignore
+        parent.border_subtitle = f"{self._status} | {summary} | {hint}"
+
+    def _other_file_list(self) -> FileList | None:
+        parent: Widget = self.parent  # type: ignore
+        other_panel = "#left > *" if parent.id == "right" else "#right > *"
+        file_list = self.app.query_one(other_panel)
+        return file_list if isinstance(file_list, FileList) else None
+
+    @on(OptionList.OptionSelected)
+    def on_option_selected(self, event: OptionList.OptionSelected):
+        _, path = self._targets[event.option_index]
+        file_list = self._other_file_list()
+        if path is not None and file_list is not None:
+            file_list.go_to(path)
+            file_list.table.focus()
+
+    def _cursor_group(self) -> tuple[int, Path, list[Path]] | None:
+        """The group under cursor, the file to keep, and its duplicates"""
+        highlighted = self.option_list.highlighted
+        if highlighted is None or not self._targets:
+            return None
+        group_idx, path = self._targets[highlighted]
+        paths = self._groups[group_idx].paths
+        keep = path if path is not None else paths[0]
+        return group_idx, keep, [p for p in paths if p != keep]
+
+    def action_delete_duplicates(self):
+        cursor_group = self._cursor_group()
+        if cursor_group is None:
+            return
+        group_idx, keep, others = cursor_group
+
+        def on_delete(result: bool):
+            if result:
+                self._apply(group_idx, keep, others, lambda p: backend_for(p).trash(p))
+
+        msg = f"This will keep {keep.name} and move {len(others)} duplicates to Trash"
+        self.app.push_screen(
+            StaticDialog(
+                title="Delete duplicates?",
+                message=msg,
+                btn_ok="Delete",
+                style=Style.DANGER,
+            ),
+            on_delete,
+        )
+
+    def action_link_duplicates(self):
+        cursor_group = self._cursor_group()
+        if cursor_group is None:
+            return
+        group_idx, keep, others = cursor_group
+
+        def on_link(result: bool):
+            if result:
+                self._apply(
+                    group_idx, keep, others, lambda p: replace_with_hardlink(keep, p)
+                )
+
+        msg = (
+            f"This will keep {keep.name} and replace {len(others)} duplicates with "
+            "hard links to it"
+        )
+        self.app.push_screen(
+            StaticDialog(
+                title="Hard link duplicates?",
+                message=msg,
+                btn_ok="Link",
+                style=Style.WARNING,
+            ),
+            on_link,
+        )
+
+    def _apply(self, group_idx: int, keep: Path, paths: list[Path], operation):
+        """Apply an operation to the duplicates, and remove them from the group.
+        The files that changed since they were compared are left as is, and are
+        removed from the group too."""
+        group = self._groups[group_idx]
+        done = []
+        changed = []
+        try:
+            for path in paths:
+                # checked right before, as the files were compared a while ago:
+                if not group.unchanged(keep):
+                    changed.append(keep)
+                    break
+                if not group.unchanged(path):
+                    changed.append(path)
+                    continue
+                operation(path)
+                done.append(path)
+        except OSError as err:
+            self.app.push_screen(StaticDialog.error("Error", str(err)))
+        if changed:
+            self.app.notify(
+                f"{len(changed)} files changed since they were compared, left as is",
+                severity="warning",
+            )
+        group.paths = [p for p in group.paths if p not in done and p not in changed]
+        self._rebuild()
+        file_list = self._other_file_list()
+        if file_list is not None:
+            file_list.update_listing()
+
+    def _rebuild(self):
+        highlighted = self.option_list.highlighted
+        self._groups = [g for g in self._groups if len(g.paths) > 1]
+        self._targets = []
+        options = []
+        for group_idx in range(len(self._groups)):
+            options.extend(self._group_options(group_idx))
+        self.option_list.clear_options()
+        self.option_list.add_options(options)
+        if highlighted is not None and options:
+            self.option_list.highlighted = min(highlighted, len(options) - 1)
+        self._update_subtitle()
+
+    def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            self.workers.cancel_group(self, "dupes")
+        elif event.key == "j":
+            self.option_list.action_cursor_down()
+        elif event.key == "k":
+            self.option_list.action_cursor_up()
@@ -4,35 +4,60 @@
 #
 # Copyright (c) 2024 Timur Rubeko
 
+import fnmatch
 import functools
+import itertools
 import os
 import subprocess
 import time
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Tuple
 
 from humanize import naturalsize
+from rich.markup import escape
 from rich.text import Text
 from textual import events, work
 from textual.app import ComposeResult
 from textual.binding import Binding
 from textual.message import Message
 from textual.reactive import reactive
+from textual.timer import Timer
+from textual.widget import Widget
 from textual.widgets import DataTable, Static
-from textual.widgets.data_table import RowDoesNotExist
-
-from f2.fs import DirEntry, DirList, list_dir
-
+from textual.widgets.data_table import CellDoesNotExist, RowDoesNotExist
+from textual.worker import get_current_worker
+
+from f2.fs import (
+    DirEntry,
+    DirList,
+    dir_size,
+    in_archive,
+    is_browsable,
+    list_dir,
+    nearest_dir,
+)
+from f2.fs.archive import extract_to_temp, unindexed_archive
+from f2.fs.backend import UnavailableError, backend_for, is_available
+from f2.fs.compare import Diff, TreeComparison
+from f2.fs.find import QUERY_SYNTAX, FindQuery, find
+from f2.fs.prefetch import prefetcher
+
+from ..cache import LRUCache
 from ..commands import Command
 from ..config import config_root
+from ..frecency import frecency
+from ..profiling import profiler
 from ..shell import native_open
-from .dialogs import InputDialog
+from .dialogs import InputDialog, StaticDialog
 
 
 class TextAndValue(Text):
     """Like `rich.text.Text`, but also holds a given `value`"""
 
+    __slots__ = ("value", "text")  # one for every row
+
     def __init__(self, value, text):
         self.value = value
         self.text = text
@@ -47,6 +72,39 @@ class SortOptions:
     reverse: bool = False  # ascending by default, descending if True
 
 
+# how the entries that differ from the compared directory are shown, as seen from
+# the directory of the list (that is, "left" is this list):
+DIFF_STYLES = {
+    Diff.LEFT_ONLY: "#5fd700",
+    Diff.LEFT_NEWER: "#00afff",
+    Diff.RIGHT_NEWER: "#ff8700",
+    Diff.DIFFERENT: "#ff5f5f",
+    Diff.KIND: "#ff5f5f",
+    Diff.CONTAINS: "#d7af00",
+}
+
+
+@dataclass
+class _Visit:
+    """What a file list showed in a directory, to show it again when going back"""
+
+    path: Path
+    sort_options: SortOptions
+    glob: str | None
+    show_hidden: bool
+    cursor_name: str
+    listing_key: int | None = None  # of the listing kept in the history
+    listed_mtime_ns: int | None = None  # of the directory, when it was listed
+    listed_at: float = 0.0  # time.monotonic()
+
+
+def _weigh_listing(listing: DirList) -> int:
+    return 256 * len(listing.entries)  # a rough estimate of an entry
+
+
+_listing_keys = itertools.count()
+
+
 class FileList(Static):
     BINDINGS_AND_COMMANDS = [
         Command(
@@ -91,6 +149,24 @@ class FileList(Static):
             "Filter files to show only those matching a glob",
             "f",
         ),
+        Command(
+            "find_recursive",
+            "Find files recursively",
+            "Find files in the whole directory tree by name, size, mtime or type",
+            "/",
+        ),
+        Command(
+            "back",
+            "Go back",
+            "Go back to the previous directory, as it was shown",
+            "alt+left",
+        ),
+        Command(
+            "forward",
+            "Go forward",
+            "Go forward to the next directory (after going back)",
+            "alt+right",
+        ),
         Command(
             "open_in_os_file_manager",
             "Open in OS file manager",
@@ -122,6 +198,13 @@ class FileList(Static):
     COLUMN_PADDING = 2  # a column uses this many chars more to render
     SCROLLBAR_SIZE = 2
     TIME_FORMAT = "%b %d %H:%M"
+    PREFETCH_DELAY = 0.2  # cursor rests on a directory this long before prefetch
+    FIND_UPDATE_INTERVAL = 0.2  # show new find results at most this often
+    HISTORY_SIZE = 100  # directories to go back to, at most
+    HISTORY_MAX_SIZE = 16 * 1024 * 1024  # memory for their listings, roughly
+    # files may change without changing the mtime of their directory, so that the
+    # listings kept in the history are only shown again for this long (sec.):
+    HISTORY_LISTING_MAX_AGE = 10.0
 
     class Selected(Message):
         def __init__(self, path: Path, file_list: "FileList"):
@@ -140,8 +223,28 @@ class FileList(Static):
     order_case_sensitive = reactive(False)
     cursor_path = reactive(Path.cwd())
     active = reactive(False)
-    glob = reactive(None)
+    glob: reactive[str | None] = reactive(None)
+    prefetch_dirs = reactive(False)
     selection: set[str] = set()
+    _listing: DirList | None = None  # last listing of the directory
+    _listed_mtime_ns: int | None = None  # of the directory, before it was listed
+    _listed_at: float = 0.0  # time.monotonic()
+    _prefetch_timer: Timer | None = None
+    _found: list[DirEntry] | None = None  # recursive find results, if shown
+    _find_query: str = ""
+    _find_status: str = ""
+    _find_id: int = 0  # to ignore the results of a replaced search
+    comparison: TreeComparison | None = None  # with the other panel, if compared
+    _compared_root: Path | None = None  # the tree of this list in the comparison
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._back: deque[_Visit] = deque(maxlen=self.HISTORY_SIZE)
+        self._forward: deque[_Visit] = deque(maxlen=self.HISTORY_SIZE)
+        self._history_listings: LRUCache[int, DirList] = LRUCache(
+            self.HISTORY_MAX_SIZE, weigh=_weigh_listing
+        )
+        self._restoring: _Visit | None = None  # while going back or forward
 
     def compose(self) -> ComposeResult:
         self.table: DataTable = DataTable(cursor_type="row")
@@ -154,7 +257,7 @@ class FileList(Static):
         self.table.add_column("Modified", key="mtime")
 
     def on_resize(self):
-        self.update_listing()
+        self.update_listing(relist=False)  # only the formatting depends on the size
 
     @property
     def current_path(self):
@@ -179,6 +282,20 @@ class FileList(Static):
     def remove_selection(self, name):
         self.selection.remove(name)
 
+    def _cursor_name(self) -> str:
+        """Name of the entry under the cursor (a relative path in find results)"""
+        try:
+            return str(self.cursor_path.relative_to(self.path))
+        except ValueError:
+            return self.cursor_path.name
+
+    def _cursor_entry(self) -> DirEntry | None:
+        """Entry under the cursor, as it was listed"""
+        try:
+            return self.table.get_cell(self._cursor_name(), "name").value
+        except CellDoesNotExist:
+            return None
+
     def toggle_selection(self, name):
         if name in self.selection:
             self.remove_selection(name)
@@ -202,6 +319,11 @@ class FileList(Static):
         elif e.is_link:
             style = "underline"
 
+        if self.comparison is not None and self._compared_root is not None:
+            diff = self.comparison.diff_of(self._compared_root, self.path / e.name)
+            if diff is not None:
+                style += f" {DIFF_STYLES.get(diff, '')}"
+
         if e.name in self.selection:
             style += " #fff04d italic"
 
@@ -333,46 +455,113 @@ class FileList(Static):
     # END OF ORDERING
     #
 
+    def _add_row(self, e: DirEntry):
+        style = self._row_style(e)
+        self.table.add_row(
+            # name column also holds original values:
+            TextAndValue(e, self._fmt_name(e, style)),
+            self._fmt_size(e, style),
+            self._fmt_mtime(e, style),
+            key=e.name,
+        )
+
     def _update_table(self, ls: DirList):
-        self.table.clear()
-        for child in ls.entries:
-            style = self._row_style(child)
-            self.table.add_row(
-                # name column also holds original values:
-                TextAndValue(child, self._fmt_name(child, style)),
-                self._fmt_size(child, style),
-                self._fmt_mtime(child, style),
-                key=child.name,
+        with profiler.span("update_table"):
+            self.table.clear()
+            for child in ls.entries:
+                self._add_row(child)
+        with profiler.span("table_sort"):
+            self.table.sort(
+                "name", key=self.sort_key, reverse=self.sort_options.reverse
             )
-        self.table.sort("name", key=self.sort_key, reverse=self.sort_options.reverse)
 
-    def update_listing(self):
+    def update_listing(self, use_prefetched: bool = False, relist: bool = True):
+        """List the directory again (or, only if `relist` is False, show the last
+        listing again), or use its prefetched listing if allowed and available"""
         old_cursor_path = self.cursor_path
-        ls = list_dir(
-            self.path, include_hidden=self.show_hidden, glob_expression=self.glob
-        )
+        if relist or self._listing is None:
+            self._listing = self._list_dir(use_prefetched)
+        ls = self._listing
         self._update_table(ls)
         # if still in the same dir, try to locate the previous cursor position
-        if old_cursor_path.parent == self.path:
+        if old_cursor_path.is_relative_to(self.path):
             try:
-                idx = self.table.get_row_index(old_cursor_path.name)
+                idx = self.table.get_row_index(
+                    str(old_cursor_path.relative_to(self.path))
+                )
                 self.table.cursor_coordinate = (idx, 0)  # type: ignore
             except RowDoesNotExist:
                 pass
-        # update list border with some information about the directory:
+        self._update_titles(ls)
+
+    def _update_titles(self, ls: DirList):
+        """Update list border with some information about the directory"""
         total_size_str = naturalsize(ls.total_size)
-        self.parent.border_title = str(self.path)
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = str(self.path)
         subtitle = f"{total_size_str} in {ls.file_count} files | {ls.dir_count} dirs"
-        if self.glob is not None:
+        if self._found is not None:
+            parent.border_title = f"{self.path} | find: {escape(self._find_query)}"
+            subtitle = f"{self._find_status} | {subtitle}"
+        if not is_available(self.path):
+            subtitle = "[red]unavailable[/red]"
+        elif self.glob is not None:
             subtitle = f"[red]{self.glob}[/red] | {subtitle}"
-        self.parent.border_subtitle = subtitle
+        parent.border_subtitle = subtitle
+
+    def _list_dir(self, use_prefetched: bool) -> DirList:
+        if self._found is not None:
+            # files may have been moved or deleted since they were found:
+            self._found = [
+                e for e in self._found if os.path.lexists(self.path / e.name)
+            ]
+            return self._found_listing()
+        try:
+            # stat before listing, so that any later modification is noticed:
+            statinfo = backend_for(self.path).stat(self.path)
+            self._listed_mtime_ns = statinfo.st_mtime_ns
+        except OSError:
+            self._listed_mtime_ns = None
+        self._listed_at = time.monotonic()
+        ls = None
+        if use_prefetched and self.glob is None:
+            ls = prefetcher.take(self.path, self.show_hidden)
+        try:
+            return ls or list_dir(
+                self.path, include_hidden=self.show_hidden, glob_expression=self.glob
+            )
+        except UnavailableError:
+            # only allow to navigate away:
+            up = DirEntry("..", 0, 0, False, True, False, False, False)
+            return DirList(file_count=0, dir_count=0, total_size=0, entries=[up])
 
     def watch_path(self, old_path: Path, new_path: Path):
+        visit, self._restoring = self._restoring, None
+        if visit is None and old_path != new_path:
+            self._back.append(self._remember(old_path))
+            self._forward.clear()
+        frecency.visit(new_path)
+        self._stop_find()
+        self._found = None
         self.reset_selection()
-        self.glob = None
-        self.update_listing()
+        listing = self._history_listing(visit) if visit is not None else None
+        if visit is None:
+            self.glob = None
+        if visit is not None and listing is not None:
+            self._listing = listing
+            self._listed_mtime_ns = visit.listed_mtime_ns
+            self._listed_at = visit.listed_at
+            self.update_listing(relist=False)
+        else:
+            self.update_listing(use_prefetched=True)
+        if visit is not None:
+            try:
+                idx = self.table.get_row_index(visit.cursor_name)
+                self.table.cursor_coordinate = (idx, 0)  # type: ignore
+            except RowDoesNotExist:
+                pass
         # if navigated "up", select source dir in the new list:
-        if new_path == old_path.parent:
+        elif new_path == old_path.parent:
             try:
                 idx = self.table.get_row_index(old_path.name)
                 self.table.cursor_coordinate = (idx, 0)  # type: ignore
@@ -392,6 +581,9 @@ class FileList(Static):
 
     def watch_sort_options(self, old: SortOptions, new: SortOptions):
         self.update_listing()
+        self._update_sort_labels(old, new)
+
+    def _update_sort_labels(self, old: SortOptions, new: SortOptions):
         # remove sort label from the previously sorted column:
         prev_sort_col = self.table.columns[old.key]  # type: ignore
         prev_sort_col.label = prev_sort_col.label[:-2]
@@ -400,6 +592,9 @@ class FileList(Static):
         direction = "⬆" if new.reverse else "⬇"
         new_sort_col.label = f"{new_sort_col.label} {direction}"  # type: ignore
 
+    def watch_prefetch_dirs(self, old: bool, new: bool):
+        self._schedule_prefetch()  # cancels the prefetch in progress, if turned off
+
     def watch_glob(self, old: str | None, new: str | None):
         self.reset_selection()
         self.update_listing()
@@ -431,30 +626,81 @@ class FileList(Static):
 
     def on_data_table_row_selected(self, event: DataTable.RowSelected):
         entry_name: str = event.row_key.value  # type: ignore
-        selected_path = (self.path / entry_name).resolve()
-        if selected_path.is_dir():
+        if entry_name == ".." and self._found is not None:
+            self.action_close_find_results()
+            return
+        if entry_name == ".." and not is_available(self.path):
+            self.path = self.path.parent  # allow to leave an unavailable location
+            return
+        path = self.path / entry_name
+        try:
+            selected_path = backend_for(path).resolve(path)
+        except UnavailableError:
+            selected_path = path
+        if unindexed_archive(selected_path) is not None:
+            self.open_archive(selected_path)
+        elif is_browsable(selected_path):  # including the indexed archives
             self.path = selected_path
+        elif not is_available(selected_path):
+            msg = f"{selected_path} is unavailable (not responding)"
+            self.app.push_screen(StaticDialog.error("Error", msg))
 
     def action_open(self):
         # "open" is handled separately from "table.row_selected" to distinguish
         # between "enter" and mouse click (avoid navigation and running
         # apps on mouse clickd)
-        if self.cursor_path.is_dir():
+        entry = self._cursor_entry()
+        if (
+            (entry is not None and entry.is_dir)
+            or unindexed_archive(self.cursor_path) is not None
+            or is_browsable(self.cursor_path)
+        ):
             pass  # already handled by on_data_table_row_selected
+        elif not is_available(self.cursor_path):
+            pass  # same, and the path cannot be opened anyway
         elif self.cursor_path.is_file() and os.access(self.cursor_path, os.X_OK):
             # TODO: ask to confirm to run, let chose mode (on a side or in a shell)
             pass
         else:
+            path = self.cursor_path
+            archive_and_name = in_archive(path)
+            if archive_and_name is not None:
+                path = extract_to_temp(*archive_and_name)
             open_cmd = native_open()
             if open_cmd is not None:
                 with self.app.suspend():
-                    subprocess.run(open_cmd + [str(self.cursor_path)])
+                    subprocess.run(open_cmd + [str(path)])
+
+    def open_archive(self, path: Path):
+        """Browse a path in an archive (or the archive itself), once the index of
+        the archive is built in background"""
+        self.loading = True
+        self._open_archive(path)
+
+    @work(thread=True, exclusive=True, group="archive")
+    def _open_archive(self, path: Path):
+        browsable = is_browsable(path)  # builds the index
+        self.app.call_from_thread(self._on_archive_opened, path, browsable)
+
+    def _on_archive_opened(self, path: Path, browsable: bool):
+        self.loading = False
+        if browsable:
+            self.path = path
 
     def action_open_in_os_file_manager(self):
         open_cmd = native_open()
         if open_cmd is not None:
             with self.app.suspend():
-                subprocess.run(open_cmd + [str(self.path)])
+                subprocess.run(open_cmd + [str(nearest_dir(self.path))])
+
+    def go_to(self, path: Path):
+        """Show the directory of a path, with the cursor on it"""
+        self.path = path.parent
+        try:
+            idx = self.table.get_row_index(path.name)
+            self.table.cursor_coordinate = (idx, 0)  # type: ignore
+        except RowDoesNotExist:
+            pass
 
     def action_navigate_to_config(self):
         self.path = config_root()
@@ -468,17 +714,17 @@ class FileList(Static):
 
         # FIXME: reuse self._row_style
         style = "bold"
-        if self.cursor_path.name in self.selection:
+        if self._cursor_name() in self.selection:
             style += " #fff04d italic"
 
         # show a placeholder and move the cursor at once:
         placeholder = Text("...", style=style, justify="right")
-        self.table.update_cell(self.cursor_path.name, "size", placeholder)
+        self.table.update_cell(self._cursor_name(), "size", placeholder)
 
         # then, calculate and show the size (can be slow):
-        size = sum(f.stat().st_size for f in self.cursor_path.rglob("*") if f.is_file())
+        size = dir_size(self.cursor_path)
         size_text = Text(naturalsize(size), style=style, justify="right")
-        self.table.update_cell(self.cursor_path.name, "size", size_text)
+        self.table.update_cell(self._cursor_name(), "size", size_text)
 
     def action_cursor_down(self):
         new_coord = (self.table.cursor_coordinate[0] + 1, 0)
@@ -491,6 +737,195 @@ class FileList(Static):
     def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted):
         self.cursor_path = self.path / event.row_key.value  # type: ignore
         self.post_message(self.Selected(path=self.cursor_path, file_list=self))
+        self._schedule_prefetch()
+
+    #
+    # HISTORY:
+    #
+
+    def action_back(self):
+        if self._back:
+            self._forward.append(self._remember(self.path))
+            self._go_to_visit(self._back.pop())
+
+    def action_forward(self):
+        if self._forward:
+            self._back.append(self._remember(self.path))
+            self._go_to_visit(self._forward.pop())
+
+    def _remember(self, path: Path) -> _Visit:
+        """What the list shows in a directory (that it shows now, or just did)"""
+        cursor_name = self.cursor_path.name if self.cursor_path.parent == path else ""
+        visit = _Visit(
+            path, self.sort_options, self.glob, self.show_hidden, cursor_name
+        )
+        if self._found is None and self._listing is not None:
+            visit.listing_key = next(_listing_keys)
+            self._history_listings.put(visit.listing_key, self._listing)
+            visit.listed_mtime_ns = self._listed_mtime_ns
+            visit.listed_at = self._listed_at
+        return visit
+
+    def _go_to_visit(self, visit: _Visit):
+        if visit.sort_options != self.sort_options:
+            self._update_sort_labels(self.sort_options, visit.sort_options)
+            self.set_reactive(FileList.sort_options, visit.sort_options)
+        self.set_reactive(FileList.glob, visit.glob)
+        self._restoring = visit
+        self.path = visit.path
+        self._restoring = None  # if the path was the same
+
+    def _history_listing(self, visit: _Visit) -> DirList | None:
+        """The listing kept in the history, if it is recent, was listed with the same
+        options, and the directory is not modified since"""
+        if visit.listing_key is None:
+            return None
+        listing = self._history_listings.get(visit.listing_key)
+        self._history_listings.pop(visit.listing_key)
+        if (
+            listing is None
+            or visit.listed_mtime_ns is None
+            or visit.show_hidden != self.show_hidden
+            or time.monotonic() - visit.listed_at > self.HISTORY_LISTING_MAX_AGE
+        ):
+            return None
+        try:
+            mtime_ns = backend_for(visit.path).stat(visit.path).st_mtime_ns
+        except OSError:
+            return None
+        return listing if mtime_ns == visit.listed_mtime_ns else None
+
+    #
+    # COMPARISON:
+    #
+
+    def show_comparison(self, comparison: TreeComparison | None, root: Path | None):
+        """Mark the entries that differ in the compared trees (or stop marking them,
+        if the comparison is None)"""
+        self.comparison = comparison
+        self._compared_root = root
+        self.update_listing()
+
+    #
+    # RECURSIVE FIND:
+    #
+
+    def action_find_recursive(self):
+        def on_find(value: str):
+            try:
+                query = FindQuery.parse(value)
+            except ValueError as err:
+                self.app.push_screen(StaticDialog.error("Invalid query", str(err)))
+                return
+            self._stop_find()
+            self.reset_selection()
+            self.glob = None
+            self._find_id += 1
+            self._found = []
+            self._find_query = value
+            self._find_status = "searching..."
+            self.update_listing()
+            self._find(self._find_id, self.path, query)
+
+        self.app.push_screen(
+            InputDialog(
+                title=f"Find files recursively, e.g.: {QUERY_SYNTAX}",
+                value=self._find_query,
+                btn_ok="Find",
+            ),
+            on_find,
+        )
+
+    def action_close_find_results(self):
+        self._stop_find()
+        self._found = None
+        self.reset_selection()
+        self.update_listing()
+
+    def _stop_find(self):
+        self.workers.cancel_group(self, "find")
+
+    def _found_listing(self) -> DirList:
+        up = DirEntry("..", 0, 0, False, True, False, False, False)
+        entries = [up]
+        total_size = file_count = dir_count = 0
+        for e in self._found or []:
+            if self.glob is not None and not fnmatch.fnmatch(
+                Path(e.name).name, self.glob
+            ):
+                continue
+            entries.append(e)
+            total_size += e.size
+            file_count += e.is_file
+            dir_count += e.is_dir
+        return DirList(file_count, dir_count, total_size, entries)
+
+    @work(thread=True, exclusive=True, group="find")
+    def _find(self, find_id: int, root: Path, query: FindQuery):
+        worker = get_current_worker()
+        started_at = shown_at = time.monotonic()
+        found: list[DirEntry] = []
+        for entry in find(
+            root,
+            query,
+            include_hidden=self.show_hidden,
+            is_cancelled=lambda: worker.is_cancelled,
+        ):
+            found.append(entry)
+            # show the first match at once, and then the others in batches:
+            now = time.monotonic()
+            if now - shown_at > self.FIND_UPDATE_INTERVAL or shown_at == started_at:
+                self.app.call_from_thread(self._show_found, find_id, found)
+                found = []
+                shown_at = now
+        elapsed = time.monotonic() - started_at
+        status = "cancelled" if worker.is_cancelled else f"done in {elapsed:.1f} s"
+        self.app.call_from_thread(self._show_found, find_id, found, status)
+
+    def _show_found(
+        self, find_id: int, found: list[DirEntry], status: str | None = None
+    ):
+        if find_id != self._find_id or self._found is None:
+            return  # the search was replaced or its results were closed
+        self._found.extend(found)
+        if status is not None:
+            self._find_status = status
+        cursor_name = self._cursor_name()
+        self._listing = self._found_listing()
+        for e in found:
+            if self.glob is None or fnmatch.fnmatch(Path(e.name).name, self.glob):
+                self._add_row(e)
+        self.table.sort("name", key=self.sort_key, reverse=self.sort_options.reverse)
+        try:  # keep the cursor on the same entry
+            idx = self.table.get_row_index(cursor_name)
+            self.table.cursor_coordinate = (idx, 0)  # type: ignore
+        except RowDoesNotExist:
+            pass
+        self._update_titles(self._listing)
+
+    #
+    # PREFETCHING:
+    #
+
+    def _schedule_prefetch(self):
+        """List the directory under the cursor in background, once the cursor rests
+        on it, so that it can be entered at once"""
+        if self._prefetch_timer is not None:
+            self._prefetch_timer.stop()
+            self._prefetch_timer = None
+        self.workers.cancel_group(self, "prefetch")
+        if not self.prefetch_dirs:
+            return
+        entry = self._cursor_entry()
+        if entry is not None and entry.is_dir and entry.name != "..":
+            self._prefetch_timer = self.set_timer(
+                self.PREFETCH_DELAY, functools.partial(self._prefetch, self.cursor_path)
+            )
+
+    @work(thread=True, group="prefetch")
+    def _prefetch(self, path: Path):
+        worker = get_current_worker()
+        prefetcher.prefetch(path, self.show_hidden, lambda: worker.is_cancelled)
 
     def on_descendant_focus(self):
         self.active = True
@@ -516,12 +951,14 @@ class FileList(Static):
             self.update_listing()
         elif event.key == "enter":
             self.action_open()
+        elif event.key == "escape" and self._found is not None:
+            self._stop_find()
         elif event.key in ("space", "J", "shift+down"):
-            self.toggle_selection(self.cursor_path.name)
+            self.toggle_selection(self._cursor_name())
             self.update_listing()
             self.action_cursor_down()
         elif event.key in ("K", "shift+up"):
-            self.toggle_selection(self.cursor_path.name)
+            self.toggle_selection(self._cursor_name())
             self.update_listing()
             self.action_cursor_up()
         elif event.key == "minus":
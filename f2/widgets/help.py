@@ -43,8 +43,15 @@ HELP = f"""
  - `Enter`: enter the directory or run the default program associated with a
     file type under cursor
  - `Backspace` or `Enter` on the `..` entry: navigate up in a directory tree
+ - `Enter` on an archive (zip, jar, tar, tar.gz, etc.): browse the archive like a
+   directory; archives are read-only, but the files can be viewed and copied out
+ - `Alt+Left`/`Alt+Right`: go back/forward to the previously visited directories,
+   with the same order, filter and cursor position as they were left with
  - `b`: go to a bookmarked location
- - `Ctrl+g`: enter a path to jump to
+ - `Ctrl+g`: enter a path to jump to, or a part of a directory name to find the
+   directory in the path index (e.g., `proj f2` for `~/projects/f2-commander`); the
+   most often and most recently visited directories are suggested first, and the
+   matching directories are also found in the Command Palette
  - `R`: refresh the file listing
  - `o`: open the current location in the deafult OS file manager
 
@@ -55,6 +62,12 @@ HELP = f"""
  - `s`/`S`: order the entries by size
  - `t`/`T`: order the entries by last modification time
  - `f`: filter the displayed entries with a glob expression
+ - `/`: find files in the whole directory tree; the query combines names or globs
+   (e.g., `*.py`), a regular expression (`re:^test_`), the size (`size>10M`,
+   `size<1k`), the last modification time (`mtime<7d`, `mtime>1h`), and the type
+   (`type:f` for files, `type:d` for directories); the results are shown in the
+   file list as they are found, and can be copied, moved, deleted, etc.; `Esc`
+   stops the search, and the `..` entry closes the results
  - `Ctrl+Space`: calculate the size of the directory under cursor
 
 ### Selection
@@ -64,18 +77,79 @@ HELP = f"""
  - `+`: select all displayed entries
  - `*`: invert selection
 
+### File operations
+
+ - `i`: search the contents of the files in the directory tree for a regular
+   expression (case insensitive, unless the expression has upper case letters);
+   the results are shown in the other panel as they are found, binary files are
+   skipped; select a result to show its file in the file list
+ - `u`: analyze the disk usage of the directory tree: the entries are shown in the
+   other panel, the largest first, as the tree is scanned; enter the directories
+   (and go back up with `Backspace`) without scanning them again, select a file to
+   show it in the file list
+ - "Find duplicates" (from the Command Palette): find the files with the same
+   contents under the locations of both panels (compared by size, then by their
+   first and last blocks, and only then by their whole contents); the groups of
+   duplicates are shown in the other panel as they are found; with the cursor on
+   a file, `d` moves the other files of its group to Trash, and `l` replaces them
+   with hard links to it
+ - "Compare directories" (from the Command Palette): compare the directory trees
+   of both panels by file size and modification time ("by content" to compare
+   the contents of the files of the same size instead), and mark the entries that
+   differ in both panels: present on this side only (green), newer (blue) or older
+   (orange) on this side, different otherwise (red), and the directories with
+   differences inside (yellow); run it again to remove the marks
+ - "Synchronize directories" (from the Command Palette): copy what differs
+   between the compared directories, one way (all missing and different entries
+   are copied) or both ways (missing entries are copied both ways, and newer files
+   replace the older ones); nothing is ever deleted, and the conflicts (like the
+   files that differ but were modified at the same time, in a two-way
+   synchronization) are skipped
+ - "Compare files" (from the Command Palette): compare the files under the cursor
+   in both panels; the files are compared in large chunks up to the first
+   difference, and the text files are then shown side by side (`n` and `N` to go
+   to the next and previous change), as far as they are scrolled
+ - `z`: compress the selected entries (or the entry under cursor) into a
+   `.tar.gz` or a `.zip` archive, depending on the name given to the archive; the
+   archive is compressed in the background, using all CPU cores
+
 ### Shell
 
  - `x` starts (forks) a subprocess with a new shell in the current location.
    Quit the shell to return back to the F2 Commander (e.g., `Ctrl+d` or type and
    execute `exit`).
 
+### Viewer
+
+`v` opens the file under cursor in the built-in viewer, which can show files of any
+size (`V` opens it with an external viewer program instead):
+
+ - `j`/`k` and `up`/`down`: scroll one line at a time
+ - `Space`/`b`, `Ctrl+f`/`Ctrl+b`, `Page Up`/`Page Down`: scroll one page
+ - `Ctrl+d`/`Ctrl+u`: scroll half a page
+ - `g`/`G`: go to the top/bottom of the file
+ - `:`: go to a line number, or to a percentage of the file (e.g., `50%`)
+ - `/`/`?`: search forward/backward with a regular expression
+ - `n`/`N`: go to the next/previous match
+ - `x`: switch between the text and the hex views (binary files are shown in the
+   hex view by default, where `:` goes to an offset, e.g. `1f00`, instead of a line)
+ - `q`: close the viewer
+
 ### Panels
 
 F2 Commander comes with these panel types:
 
  - Files: default panel type, for file system discovery and manipulation
  - Preview: shows exceprts of the text files selected in the (Files) other panel
+   (and a hex dump of the binary files);
+   press `F` to toggle the follow mode, in which the preview shows the end of the
+   file and keeps adding new lines as the file grows (e.g., a log file)
+ - Performance: the time spent listing the directories, updating and sorting the
+   file lists, formatting the previews, reading the configuration and operating
+   on the files (with the percentiles of the last calls); only collected if F2
+   Commander is started with `F2_PROFILE=1`, and also saved as a trace file
+   (that chrome://tracing or Perfetto can open) on exit if started with
+   `F2_PROFILE_TRACE=<path>`
  - Help: also invoked with `?` binding, a user manual
 
 Use `Ctrl+e` and `Ctrl+r` to change the type of the panel on the left and right
@@ -87,6 +161,7 @@ These toggles can be found in Command Palette:
 
  - Show directories first, on/off
  - Case-sensitive name ordering, on/off
+ - Prefetching (listing the directory under cursor in background), off by default
 
 ## Configuration
 
@@ -121,6 +196,15 @@ the value itself must be quoted. For example:
 
 By default, bookmarks are set to the typical desktop locations, similar to the example.
 
+### Path index
+
+The directories to index for the jump to a directory by its name can be defined under
+the `path_index_roots` key as a list of paths (none by default, only the visited
+directories are found then). Hidden directories and other file systems mounted under
+these paths are not indexed. For example:
+
+    path_index_roots = "['~', '/data']"
+
 ## License
 
 This application is provided "as is", without warranty of any kind.
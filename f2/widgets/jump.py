@@ -0,0 +1,92 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+from pathlib import Path
+
+from textual import events, on
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Horizontal, Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Button, Input, Label, OptionList
+
+from ..frecency import frecency
+from ..fs import is_browsable
+from ..fs.archive import unindexed_archive
+from ..fs.pathindex import path_index
+
+
+def jump_candidates(query: str, limit: int) -> list[str]:
+    """Directories that match a query: the visited ones first (by frecency), then
+    the others from the path index"""
+    visited = frecency.search(query, limit)
+    others = (p for p in path_index.search(query, limit) if p not in visited)
+    return (visited + list(others))[:limit]
+
+
+class JumpDialog(ModalScreen[str | None]):
+    """Asks for a path to jump to, or for a part of the name of a directory to look
+    up, and suggests the matching directories as the user types"""
+
+    BINDINGS = [
+        Binding("escape", "dismiss", show=False),
+    ]
+    MAX_SUGGESTIONS = 10
+
+    def __init__(self, value: str):
+        super().__init__()
+        self.value = value
+
+    def compose(self) -> ComposeResult:
+        self.input = Input(self.value, id="value")
+        self.option_list = OptionList(id="options")
+        with Vertical(id="dialog", classes="large"):
+            yield Label("Jump to a path, or to a directory by its name", id="title")
+            yield self.input
+            yield self.option_list
+            with Horizontal(id="buttons"):
+                yield Button("Go", variant="primary", id="ok")
+                yield Button("Cancel", variant="default", id="cancel")
+
+    def on_mount(self) -> None:
+        self.input.focus()
+
+    @on(Input.Changed, "#value")
+    def on_input_changed(self, event: Input.Changed) -> None:
+        self.option_list.clear_options()
+        self.option_list.add_options(
+            jump_candidates(event.value, limit=self.MAX_SUGGESTIONS)
+        )
+        if self.option_list.option_count > 0:
+            self.option_list.highlighted = 0
+
+    def on_key(self, event: events.Key) -> None:
+        if event.key == "down":
+            self.option_list.action_cursor_down()
+        elif event.key == "up":
+            self.option_list.action_cursor_up()
+
+    @on(Input.Submitted, "#value")
+    @on(Button.Pressed, "#ok")
+    def on_submit(self) -> None:
+        path = Path(self.input.value).expanduser()
+        highlighted = self.option_list.highlighted
+        if (
+            unindexed_archive(path) is not None  # browsable, once indexed
+            or is_browsable(path)
+            or highlighted is None
+        ):
+            self.dismiss(str(path))
+        else:
+            self.dismiss(str(self.option_list.get_option_at_index(highlighted).prompt))
+
+    @on(OptionList.OptionSelected)
+    def on_option_selected(self, event: OptionList.OptionSelected) -> None:
+        self.dismiss(str(event.option.prompt))
+
+    @on(Button.Pressed, "#cancel")
+    def on_cancel_pressed(self, event: Button.Pressed) -> None:
+        self.dismiss(None)
@@ -11,15 +11,23 @@ from textual.reactive import reactive
 from textual.widgets import Static
 
 from .dialogs import SelectDialog
+from .diskusage import DiskUsage
+from .duplicates import Duplicates
 from .filelist import FileList
 from .help import Help
+from .performance import Performance
 from .preview import Preview
+from .search import SearchResults
 
 PanelType = namedtuple("PanelType", ["type_name", "type_id", "impl_class"])
 
 PANEL_TYPES = [
     PanelType("Files", "file_list", FileList),
     PanelType("Preview", "preview", Preview),
+    PanelType("Search results", "search_results", SearchResults),
+    PanelType("Disk usage", "disk_usage", DiskUsage),
+    PanelType("Duplicates", "duplicates", Duplicates),
+    PanelType("Performance", "performance", Performance),
     PanelType("Help", "help", Help),
 ]
 
@@ -0,0 +1,60 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+from rich.markup import escape
+from rich.table import Table
+from textual.widget import Widget
+from textual.widgets import Static
+
+from ..profiling import PROFILE_ENV, TRACE_ENV, profiler
+
+
+class Performance(Static):
+    """Live breakdown of the time spent in the instrumented parts of the app"""
+
+    UPDATE_INTERVAL = 1.0
+
+    def on_mount(self):
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = "Performance"
+        if not profiler.enabled:
+            parent.border_subtitle = "disabled"
+            self.update(
+                f"Profiling is disabled. Start F2 Commander with {PROFILE_ENV}=1 to "
+                f"collect the timings (and with {TRACE_ENV}=<path> to also save them "
+                "as a trace on exit)."
+            )
+            return
+        self._show()
+        self.set_interval(self.UPDATE_INTERVAL, self._show)
+
+    def _show(self):
+        table = Table(expand=True, box=None, header_style="bold")
+        table.add_column("Span", ratio=1, no_wrap=True)
+        for column in ("Count", "Total", "p50", "p90", "p99", "Max"):
+            table.add_column(column, justify="right", no_wrap=True)
+        for s in profiler.stats():
+            table.add_row(
+                s.name,
+                str(s.count),
+                _fmt_duration(s.total),
+                _fmt_duration(s.p50),
+                _fmt_duration(s.p90),
+                _fmt_duration(s.p99),
+                _fmt_duration(s.max),
+            )
+        self.update(table)
+        parent: Widget = self.parent  # type: ignore
+        subtitle = f"last {profiler.window} calls of every span"
+        if profiler.trace_file is not None:
+            subtitle += f" | trace: {escape(str(profiler.trace_file))}"
+        parent.border_subtitle = subtitle
+
+
+def _fmt_duration(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    return f"{seconds * 1000:.2f} ms"
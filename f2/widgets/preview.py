@@ -4,26 +4,136 @@
 #
 # Copyright (c) 2024 Timur Rubeko
 
+import codecs
 import mimetypes
+import os
 import shutil
+import stat
 import subprocess
+import sys
 from pathlib import Path
 
+from humanize import naturalsize
+from pygments.lexers import guess_lexer as pygments_guess_lexer
+from pygments.util import ClassNotFound
+from rich.console import RenderableType
 from rich.syntax import Syntax
+from rich.text import Text
 from textual.app import ComposeResult
 from textual.reactive import reactive
 from textual.widget import Widget
-from textual.widgets import Static
+from textual.widgets import Log, Static
 
+from ..cache import LRUCache
 from ..config import config
-from ..fs import breadth_first_walk
+from ..fs import breadth_first_tree
+from ..fs.archive import ARCHIVE_ERRORS, archive_type, list_archive
+from ..hexdump import hexdump, offset_digits, row_width
+from ..profiling import profiler
+from ..tail import FileTail
+
+
+class _UnreadableArchive(Exception):
+    """Raised instead of a preview of an archive that cannot be read, so that the
+    error is shown but not cached"""
+
+
+def _weigh_preview(preview: RenderableType) -> int:
+    """Estimated size of a preview, with the content and the styles it holds"""
+    if isinstance(preview, Syntax):
+        return sys.getsizeof(preview) + sys.getsizeof(preview.code)
+    if isinstance(preview, Text):
+        return (
+            sys.getsizeof(preview)
+            + sys.getsizeof(preview.plain)
+            + sys.getsizeof(preview.spans)
+            + sum(sys.getsizeof(s) + sys.getsizeof(s.style) for s in preview.spans)
+        )
+    return sys.getsizeof(preview)
+
+
+# Prepared previews of the recently shown paths, so that moving the cursor back and
+# forth between the same few entries shows them at once. Use `preview_cache.stats`
+# to see how well the cache performs.
+PREVIEW_CACHE_MAX_SIZE = 32 * 1024 * 1024
+preview_cache: LRUCache[tuple, RenderableType] = LRUCache(
+    PREVIEW_CACHE_MAX_SIZE, weigh=_weigh_preview
+)
+
+
+def read_head(path: Path, max_lines: int, max_line_bytes: int) -> str:
+    """Read at most `max_lines` first lines of a text file, each line cut to
+    `max_line_bytes` at most. At most `max_lines * max_line_bytes` bytes are read,
+    so that a file with very long lines (e.g., minified JSON) is never read
+    entirely. Raises `UnicodeDecodeError` if the file is not a UTF-8 text."""
+
+    max_bytes = max_lines * max_line_bytes
+    with open(path, "rb") as f:
+        data = f.read(max_bytes)
+
+    lines = data.split(b"\n", max_lines)[:max_lines]
+    text_lines = []
+    for i, line in enumerate(lines):
+        is_cut = len(line) > max_line_bytes or (
+            i == len(lines) - 1 and len(data) == max_bytes
+        )
+        if is_cut:
+            # a multibyte character may be cut too, decode it incrementally:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            text_lines.append(decoder.decode(line[:max_line_bytes], final=False))
+        else:
+            text_lines.append(line.decode("utf-8"))
+    return "\n".join(text_lines)
+
+
+# Resolved lexers, by file extension and shebang
+_lexers: LRUCache[tuple[str, str | None], str] = LRUCache(1024 * 1024, max_entries=1024)
+
+
+def guess_lexer(path: Path, head: str) -> str:
+    """Resolve the lexer by the file extension or, if not possible, by the shebang
+    line. Only the first file with a given extension and shebang is analysed, the
+    result is cached for the others."""
+
+    first_line = head.split("\n", 1)[0]
+    shebang = first_line if first_line.startswith("#!") else None
+    key = (path.suffix.lower(), shebang)
+
+    def resolve():
+        lexer = Syntax.guess_lexer(path)
+        if lexer == "default" and shebang is not None:
+            try:
+                aliases = pygments_guess_lexer(shebang).aliases
+                lexer = aliases[0] if aliases else lexer
+            except ClassNotFound:
+                pass
+        return lexer
+
+    return _lexers.get_or_put(key, resolve)
 
 
 class Preview(Static):
+    TAIL_INTERVAL = 0.5  # how often to check for new content in follow mode, in sec.
+    TAIL_MAX_LINES = 1000  # how many lines to keep in follow mode
+
     preview_path = reactive(Path.cwd(), recompose=True)
+    follow = reactive(False, recompose=True)
+    _tail: FileTail | None = None
 
     def compose(self) -> ComposeResult:
-        yield Static(self._format(self.preview_path))
+        self._stop_following()
+        if self.follow and self._can_follow(self.preview_path):
+            self._tail = FileTail(self.preview_path, max_lines=self._height)
+            yield Log(max_lines=self.TAIL_MAX_LINES, auto_scroll=True)
+            self.call_after_refresh(self._poll_tail)
+        else:
+            yield Static(self._cached_format(self.preview_path))
+
+    def on_mount(self):
+        self.set_interval(self.TAIL_INTERVAL, self._poll_tail)
+
+    def on_unmount(self):
+        self._stop_following()
 
     # FIXME: push_message (in)directy to the "other" panel?
     def on_other_panel_selected(self, path: Path):
@@ -32,21 +142,116 @@ class Preview(Static):
     def watch_preview_path(self, old: Path, new: Path):
         parent: Widget = self.parent  # type: ignore
         parent.border_title = str(new)
-        parent.border_subtitle = None
+        parent.border_subtitle = "following" if self.follow else None
+
+    def watch_follow(self, old: bool, new: bool):
+        parent: Widget = self.parent  # type: ignore
+        parent.border_subtitle = "following" if new else None
+
+    #
+    # FOLLOW MODE:
+    #
+
+    def _can_follow(self, path: Path) -> bool:
+        return path.is_file() and bool(self._is_text(path))
+
+    def _stop_following(self):
+        if self._tail is not None:
+            self._tail.close()
+            self._tail = None
+
+    def _poll_tail(self):
+        """Append the new content of the followed file to the log, if any"""
+        logs = self.query(Log)
+        if self._tail is None or not logs:
+            return
+        try:
+            reset, text = self._tail.read_new()
+        except OSError:
+            return  # will try again on the next round
+        log = logs.first()
+        if reset:
+            log.clear()
+        if text:
+            log.write(text)
+
+    def _cache_key(self, path: Path) -> tuple | None:
+        """Preview of a file is the same as long as the file is not modified, and
+        the panel it is rendered in did not change. Directories are not cached: the
+        tree shows the nested directories too, which are modified independently."""
+        try:
+            statinfo = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(statinfo.st_mode):
+            return None
+        return (
+            path,
+            statinfo.st_size,
+            statinfo.st_mtime_ns,
+            self.size.width,
+            self._height,
+        )
+
+    def _cached_format(self, path):
+        try:
+            key = self._cache_key(path) if path is not None else None
+            if key is None:
+                return self._format(path)
+            return preview_cache.get_or_put(key, lambda: self._format(path))
+        except _UnreadableArchive as err:
+            return str(err)  # not cached, the archive may still be being written
 
+    @profiler.timed("preview_format")
     def _format(self, path):
         if path is None:
             return ""
         elif path.is_dir():
             return self._dir_tree(path)
+        elif path.is_file() and archive_type(path) is not None:
+            try:
+                return self._archive_listing(path)
+            except ARCHIVE_ERRORS as err:
+                raise _UnreadableArchive(f"Cannot read the archive: {err}") from err
         elif path.is_file() and self._is_text(path):
             try:
-                return Syntax(code=self._head(path), lexer=Syntax.guess_lexer(path))
+                # a character takes up to 4 bytes in UTF-8, and the rest is not shown:
+                head = read_head(path, self._height, self._width * 4)
+                return Syntax(code=head, lexer=guess_lexer(path, head))
             except UnicodeDecodeError:
                 # file appears to be a binary file after all
-                return "Cannot preview, not a text file"
+                return self._hexdump(path)
+        elif path.is_file():
+            return self._hexdump(path)
+        else:
+            return "Cannot preview, not a regular file"
+
+    def _archive_listing(self, path):
+        """List the archive members, reading only as much of the archive as needed
+        to fill the viewport"""
+        listing = list_archive(path, limit=self._height)
+        if listing.member_count is not None:
+            summary = f"{listing.member_count} entries"
+            if listing.total_size is not None:
+                summary += f", {naturalsize(listing.total_size)} uncompressed"
         else:
-            return "Cannot preview, not a text file"
+            summary = f"first {len(listing.members)} entries"
+        lines = [str(path), summary]
+        for m in listing.members:
+            size = "-- DIR --" if m.is_dir else naturalsize(m.size)
+            name = m.name + "/" if m.is_dir else m.name
+            lines.append(f"┣ {size:>10} {name}")
+        if not listing.complete:
+            lines.append("┣ …")
+        return "\n".join(lines)
+
+    def _hexdump(self, path):
+        """Show the first bytes of a binary file, as many as fit in the viewport"""
+        digits = offset_digits(path.stat().st_size)
+        width = row_width(self._width, digits)
+        with open(path, "rb") as f:
+            data = f.read(self._height * width)
+        return hexdump(data, 0, width, digits)
 
     def _is_text(self, path) -> bool | None:
         """Attempt to detect if a file is a text file. Assume that the result may be
@@ -66,15 +271,10 @@ class Preview(Static):
         """Viewport is not higher than this number of lines"""
         return shutil.get_terminal_size(fallback=(80, 200))[1]
 
-    def _head(self, path):
-        lines = []
-        with open(path, "r") as f:
-            try:
-                for _ in range(self._height):
-                    lines.append(next(f))
-            except StopIteration:
-                pass
-        return "".join(lines)
+    @property
+    def _width(self):
+        """Viewport is not wider than this number of characters"""
+        return self.size.width or shutil.get_terminal_size(fallback=(80, 200))[0]
 
     def _dir_tree(self, path):
         """To give a best possible overview of a directory, show it traversed
@@ -82,23 +282,21 @@ class Preview(Static):
         top-level will be shown first, then the second level exapnded, and so on
         recursively as long as the output fits the screen."""
 
-        # collect paths to show, breadth-first, but at most a screenful:
-        collected_paths = []
-        for i, p in enumerate(breadth_first_walk(path, config.show_hidden)):
-            if i > self._height:
-                break
-            if p.parent in collected_paths:
-                siblings = [e for e in collected_paths if e.parent == p.parent]  # :'(
-                insert_at = collected_paths.index(p.parent) + len(siblings) + 1
-                collected_paths.insert(insert_at, p)
-            else:
-                collected_paths.append(p)
+        tree = breadth_first_tree(path, self._height, config.show_hidden)
 
-        # format paths:
+        # format paths, each directory followed by its children:
         lines = [str(path)]
-        for p in collected_paths:
-            name = str(p.relative_to(path))
-            if p.is_dir():
-                name += "/"
-            lines.append(f"┣ {name}")
+        if tree.truncated:
+            lines.append("┣ …")
+        parents: list[str] = []
+        for depth, node in tree.walk():
+            del parents[depth:]
+            name = os.path.join(*parents, node.name)
+            if node.is_dir:
+                lines.append(f"┣ {name}/")
+                parents.append(node.name)
+                if node.truncated:
+                    lines.append(f"┣ {name}/…")
+            else:
+                lines.append(f"┣ {name}")
         return "\n".join(lines)
@@ -0,0 +1,146 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import re
+import time
+from concurrent.futures import BrokenExecutor
+from pathlib import Path
+
+from rich.markup import escape
+from rich.text import Text
+from textual import events, on, work
+from textual.app import ComposeResult
+from textual.widget import Widget
+from textual.widgets import OptionList, Static
+from textual.widgets.option_list import Option
+from textual.worker import get_current_worker
+
+from ..fs.grep import GrepResult, grep
+from .filelist import FileList
+
+
+class SearchResults(Static):
+    """Results of a search in file contents, shown as they are found. Selecting a
+    result shows the file in the other panel."""
+
+    UPDATE_INTERVAL = 0.2  # show new results at most this often
+
+    _search_id: int = 0  # to ignore the results of a replaced search
+    _highlight: re.Pattern[str] | None = None
+
+    def compose(self) -> ComposeResult:
+        self.option_list = OptionList()
+        yield self.option_list
+
+    def on_mount(self):
+        self._targets: list[Path] = []  # file of every option, by option index
+        self._file_count = 0
+        self._match_count = 0
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = "Search results"
+        parent.border_subtitle = "press [bold]i[/bold] to search in files"
+
+    def search(self, root: Path, pattern: str, include_hidden: bool):
+        """Search the files in the directory tree. The search is case insensitive,
+        unless the pattern has upper case letters."""
+        ignore_case = pattern == pattern.lower()
+        self.workers.cancel_group(self, "grep")
+        self._search_id += 1
+        self._targets = []
+        self._file_count = self._match_count = 0
+        try:
+            self._highlight = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        except re.error:
+            self._highlight = None  # valid for bytes only, leave the lines as is
+        self.option_list.clear_options()
+        parent: Widget = self.parent  # type: ignore
+        parent.border_title = f"{escape(pattern)} in {root}"
+        parent.border_subtitle = "searching..."
+        self._grep(self._search_id, root, pattern, ignore_case, include_hidden)
+
+    @work(thread=True, exclusive=True, group="grep")
+    def _grep(
+        self,
+        search_id: int,
+        root: Path,
+        pattern: str,
+        ignore_case: bool,
+        include_hidden: bool,
+    ):
+        worker = get_current_worker()
+        started_at = shown_at = time.monotonic()
+        found: list[GrepResult] = []
+        try:
+            for result in grep(
+                root,
+                pattern,
+                ignore_case=ignore_case,
+                include_hidden=include_hidden,
+                is_cancelled=lambda: worker.is_cancelled,
+            ):
+                found.append(result)
+                now = time.monotonic()
+                if now - shown_at > self.UPDATE_INTERVAL or shown_at == started_at:
+                    self.app.call_from_thread(
+                        self._show_results, search_id, root, found
+                    )
+                    found = []
+                    shown_at = now
+        except (OSError, ValueError, BrokenExecutor) as err:
+            # e.g., the worker processes could not be started:
+            status = f"failed: {escape(str(err))}"
+            self.app.call_from_thread(
+                self._show_results, search_id, root, found, status
+            )
+            return
+        elapsed = time.monotonic() - started_at
+        status = "cancelled" if worker.is_cancelled else f"done in {elapsed:.1f} s"
+        self.app.call_from_thread(self._show_results, search_id, root, found, status)
+
+    def _show_results(
+        self,
+        search_id: int,
+        root: Path,
+        found: list[GrepResult],
+        status: str | None = None,
+    ):
+        if search_id != self._search_id or not self.is_attached:
+            return  # the search was replaced, or the panel was closed
+
+        options = []
+        for result in found:
+            options.append(Option(Text(str(result.path.relative_to(root)), "bold")))
+            self._targets.append(result.path)
+            for match in result.matches:
+                line = Text.assemble((f"{match.line_no:>6}: ", "grey50"), match.line)
+                if self._highlight is not None:
+                    line.highlight_regex(self._highlight, "reverse")
+                options.append(Option(line))
+                self._targets.append(result.path)
+            self._file_count += 1
+            self._match_count += len(result.matches)
+        self.option_list.add_options(options)
+
+        parent: Widget = self.parent  # type: ignore
+        summary = f"{self._match_count} lines in {self._file_count} files"
+        parent.border_subtitle = f"{status or 'searching...'} | {summary}"
+
+    @on(OptionList.OptionSelected)
+    def on_result_selected(self, event: OptionList.OptionSelected):
+        parent: Widget = self.parent  # type: ignore
+        other_panel = "#left > *" if parent.id == "right" else "#right > *"
+        file_list = self.app.query_one(other_panel)
+        if isinstance(file_list, FileList):
+            file_list.go_to(self._targets[event.option_index])
+            file_list.table.focus()
+
+    def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            self.workers.cancel_group(self, "grep")
+        elif event.key == "j":
+            self.option_list.action_cursor_down()
+        elif event.key == "k":
+            self.option_list.action_cursor_up()
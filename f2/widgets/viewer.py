@@ -0,0 +1,299 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import re
+from pathlib import Path
+
+from humanize import naturalsize
+from rich.text import Text
+from textual import work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Vertical
+from textual.screen import Screen
+from textual.timer import Timer
+from textual.widgets import Footer, Static
+from textual.worker import get_current_worker
+
+from ..hexdump import hexdump, offset_digits, row_width
+from ..lineindex import LineIndex
+from .dialogs import InputDialog, StaticDialog
+
+
+class Viewer(Screen):
+    """A built-in pager for the files of any size. Binary files can be shown as a
+    hex dump (`hex` mode), in which the offsets are navigated instead of the lines."""
+
+    BINDINGS = [
+        Binding("q", "close", "Close"),
+        Binding("escape", "close", show=False),
+        Binding("j,down", "scroll_lines(1)", show=False),
+        Binding("k,up", "scroll_lines(-1)", show=False),
+        Binding("space,ctrl+f,pagedown", "scroll_pages(1)", show=False),
+        Binding("b,ctrl+b,pageup", "scroll_pages(-1)", show=False),
+        Binding("ctrl+d", "scroll_pages(0.5)", show=False),
+        Binding("ctrl+u", "scroll_pages(-0.5)", show=False),
+        Binding("g,home", "top", "Top"),
+        Binding("G,end", "bottom", "Bottom"),
+        Binding("colon", "go_to", "Go to"),
+        Binding("slash", "search(False)", "Search"),
+        Binding("question_mark", "search(True)", "Search back"),
+        Binding("n", "next_match(False)", "Next"),
+        Binding("N", "next_match(True)", "Previous"),
+        Binding("x", "toggle_hex", "Hex"),
+    ]
+
+    MATCH_STYLE = "reverse"
+
+    def __init__(self, path: Path, hex: bool = False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self.hex = hex
+        self.index = LineIndex(path)
+        self.top = 0  # offset of the first line (or row) in the viewport
+        self.pattern: re.Pattern[bytes] | None = None
+        self.match: tuple[int, int] | None = None
+        self._status_timer: Timer | None = None
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="viewer"):
+            self.content = Static(id="content")
+            yield self.content
+        yield Footer()
+
+    def on_mount(self):
+        viewer: Vertical = self.query_one("#viewer")  # type: ignore
+        viewer.border_title = str(self.path)
+        if not self.hex:
+            self._build_index()
+
+    def _build_index(self):
+        """Index the lines in the background, showing the progress meanwhile"""
+        if not self.index.is_complete:
+            self._build_index_worker()
+            self._status_timer = self.set_interval(0.25, self._update_status)
+
+    def on_unmount(self):
+        # the file is only closed once the background reads are stopped:
+        self.workers.cancel_node(self)
+        self.index.close()
+
+    def on_resize(self):
+        self._update_content()
+
+    @work(thread=True, exclusive=True, group="index")
+    def _build_index_worker(self):
+        self.index.build()
+
+    #
+    # RENDERING:
+    #
+
+    @property
+    def _page_height(self) -> int:
+        return max(self.content.size.height, 1)
+
+    def _fmt_line(self, offset: int, line: bytes) -> Text:
+        if self.match is None:
+            return Text(line.decode(errors="replace").expandtabs())
+        # highlight the part of the line that matches the search:
+        match_start = max(self.match[0] - offset, 0)
+        match_end = max(min(self.match[1] - offset, len(line)), match_start)
+        text = Text()
+        text.append(line[:match_start].decode(errors="replace").expandtabs())
+        text.append(
+            line[match_start:match_end].decode(errors="replace").expandtabs(),
+            style=self.MATCH_STYLE,
+        )
+        text.append(line[match_end:].decode(errors="replace").expandtabs())
+        return text
+
+    @property
+    def _digits(self) -> int:
+        return offset_digits(self.index.size)
+
+    @property
+    def _row_width(self) -> int:
+        return row_width(self.content.size.width, self._digits)
+
+    def _update_content(self):
+        if self.hex:
+            # only read as many bytes as can be shown:
+            data = self.index.read(self.top, self._page_height * self._row_width)
+            self.content.update(hexdump(data, self.top, self._row_width, self._digits))
+            self._update_status()
+            return
+
+        # a character takes up to 4 bytes in UTF-8, and the rest is not shown:
+        max_line_bytes = max(self.content.size.width, 1) * 4
+        lines = self.index.read_lines(self.top, self._page_height, max_line_bytes)
+        text = Text(no_wrap=True, overflow="crop")
+        for i, (offset, line) in enumerate(lines):
+            if i > 0:
+                text.append("\n")
+            text.append(self._fmt_line(offset, line))
+        self.content.update(text)
+        self._update_status()
+
+    def _update_status(self):
+        size = self.index.size
+        percent = round(100 * self.top / size) if size > 0 else 100
+        if self.hex:
+            status = f"offset {self.top:x} | {percent}% of {naturalsize(size)}"
+            self.query_one("#viewer").border_subtitle = status
+            return
+
+        line = self.index.line_of_offset(self.top)
+        line_str = str(line + 1) if line is not None else "?"
+        count = self.index.line_count
+        count_str = str(count) if count is not None else "?"
+        status = f"line {line_str}/{count_str} | {percent}% of {naturalsize(size)}"
+        if not self.index.is_complete:
+            status += f" | indexing {round(100 * self.index.indexed_fraction)}%"
+        elif self._status_timer is not None:
+            self._status_timer.stop()
+        self.query_one("#viewer").border_subtitle = status
+
+    def _move_to(self, offset: int):
+        if self.hex:
+            # align to the rows, and don't scroll past the last screenful of rows:
+            width = self._row_width
+            row_count = -(-self.index.size // width)
+            last_page_top = max(row_count - self._page_height, 0) * width
+            self.top = max(min(offset - offset % width, last_page_top), 0)
+            self._update_content()
+            return
+
+        # don't scroll past the last screenful of lines:
+        self.top = min(
+            self.index.line_start(offset), self.index.tail_offset(self._page_height)
+        )
+        self._update_content()
+
+    #
+    # ACTIONS:
+    #
+
+    def action_close(self):
+        self.dismiss()
+
+    def action_toggle_hex(self):
+        self.hex = not self.hex
+        if not self.hex:
+            self._build_index()
+        self._move_to(self.top)
+
+    def action_scroll_lines(self, count: int):
+        if self.hex:
+            self._move_to(self.top + count * self._row_width)
+            return
+
+        offset: int | None = self.top
+        for _ in range(abs(count)):
+            step = self.index.next_line if count > 0 else self.index.prev_line
+            next_offset = step(offset)  # type: ignore
+            if next_offset is None:
+                break
+            offset = next_offset
+        self._move_to(offset)  # type: ignore
+
+    def action_scroll_pages(self, count: float):
+        self.action_scroll_lines(int(count * self._page_height))
+
+    def action_top(self):
+        self._move_to(0)
+
+    def action_bottom(self):
+        self._move_to(self.index.size)
+
+    def action_go_to(self):
+        def on_go_to(value: str | None):
+            if value is None or value.strip() == "":
+                return
+            value = value.strip()
+            try:
+                if value.endswith("%"):
+                    fraction = float(value[:-1]) / 100
+                    self._move_to(
+                        int(self.index.size * fraction)
+                        if self.hex
+                        else self.index.offset_at(fraction)
+                    )
+                elif self.hex:
+                    self._move_to(int(value, 16))
+                else:
+                    self._go_to_line(int(value) - 1)
+            except ValueError:
+                self.app.push_screen(
+                    StaticDialog.info("Nope...", f"{value} is not a {target}")
+                )
+
+        target = "hex offset" if self.hex else "line number"
+        self.app.push_screen(
+            InputDialog(
+                title=f"Go to {target}, or to a percentage (e.g., 50%)",
+                btn_ok="Go",
+            ),
+            on_go_to,
+        )
+
+    @work(thread=True, exclusive=True, group="navigation")
+    def _go_to_line(self, line: int):
+        # may have to index the file up to this line first:
+        offset = self.index.offset_of_line(line)
+        self.app.call_from_thread(self._move_to, offset)
+
+    def action_search(self, backwards: bool):
+        def on_search(value: str | None):
+            if value is None or value == "":
+                return
+            try:
+                self.pattern = re.compile(value.encode(), re.MULTILINE)
+            except re.error as err:
+                self.app.push_screen(StaticDialog.error("Invalid expression", str(err)))
+                return
+            self.match = None
+            self._search(backwards)
+
+        self.app.push_screen(
+            InputDialog(
+                title="Search backwards" if backwards else "Search",
+                value=self.pattern.pattern.decode() if self.pattern else "",
+                btn_ok="Search",
+            ),
+            on_search,
+        )
+
+    def action_next_match(self, backwards: bool):
+        if self.pattern is not None:
+            self._search(backwards)
+
+    @work(thread=True, exclusive=True, group="navigation")
+    def _search(self, backwards: bool):
+        worker = get_current_worker()
+        if self.match is None:
+            start = self.top
+        elif backwards:
+            start = self.match[0]
+        else:
+            # step over the empty matches, or the search will find them again:
+            start = max(self.match[1], self.match[0] + 1)
+        match = self.index.search(
+            self.pattern,  # type: ignore
+            start,
+            backwards,
+            is_cancelled=lambda: worker.is_cancelled,
+        )
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self._on_search_result, match)
+
+    def _on_search_result(self, match: tuple[int, int] | None):
+        if match is None:
+            msg = "Pattern not found"
+            self.app.push_screen(StaticDialog.info("Nope...", msg))
+        else:
+            self.match = match
+            self._move_to(match[0])
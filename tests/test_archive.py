@@ -0,0 +1,94 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from f2.fs.archive import extract, extract_to_temp, split_archive_path
+
+MEMBERS = {
+    "top.txt": b"top",
+    "dir/sub/nested.txt": b"nested",  # the directories are implied
+    "dir/other.txt": b"other",
+    "../escaped.txt": b"outside",
+    "dir/../../escaped_too.txt": b"outside",
+}
+
+
+def make_zip(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in MEMBERS.items():
+            zf.writestr(name, data)
+    return path
+
+
+def make_tar(path):
+    with tarfile.open(path, "w:gz") as tf:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.fixture(params=["zip", "tar"])
+def archive(request, tmp_path):
+    if request.param == "zip":
+        return make_zip(tmp_path / "archive.zip")
+    return make_tar(tmp_path / "archive.tar.gz")
+
+
+def test_split_archive_path(archive):
+    assert split_archive_path(archive) == (archive, "")
+    assert split_archive_path(archive / "dir/sub/nested.txt") == (
+        archive,
+        "dir/sub/nested.txt",
+    )
+    assert split_archive_path(archive / "dir/./sub") == (archive, "dir/sub")
+    assert split_archive_path(archive / "missing/member") == (archive, "missing/member")
+    assert split_archive_path(archive.parent / "dir/file.txt") is None
+    assert split_archive_path(archive / ".." / "file.txt") is None
+
+
+def test_extract_file_and_dir(archive, tmp_path):
+    dst_dir = tmp_path / "dst"
+    dst_dir.mkdir()
+
+    extracted = extract(archive, "dir/sub/nested.txt", dst_dir)
+    assert extracted == dst_dir / "nested.txt"
+    assert extracted.read_bytes() == b"nested"
+
+    extracted = extract(archive, "dir", dst_dir)
+    assert extracted == dst_dir / "dir"
+    assert (extracted / "sub/nested.txt").read_bytes() == b"nested"
+    assert (extracted / "other.txt").read_bytes() == b"other"
+
+    temp = extract_to_temp(archive, "top.txt")
+    assert temp.read_bytes() == b"top"
+    assert not temp.parent.is_relative_to(tmp_path)
+
+
+def test_members_cannot_escape_the_target(archive, tmp_path):
+    dst_dir = tmp_path / "dst"
+    dst_dir.mkdir()
+
+    for name in ("../escaped.txt", "escaped.txt", "escaped_too.txt"):
+        with pytest.raises(FileNotFoundError):
+            extract(archive, name, dst_dir)
+
+    extract(archive, "", dst_dir)  # the entire archive
+    extracted = {
+        p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file()
+    }
+    assert extracted == {
+        archive.name,
+        f"dst/{archive.name}/top.txt",
+        f"dst/{archive.name}/dir/sub/nested.txt",
+        f"dst/{archive.name}/dir/other.txt",
+    }
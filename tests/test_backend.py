@@ -0,0 +1,52 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import threading
+
+import pytest
+
+from f2.fs import backend
+from f2.fs.backend import UnavailableError, guarded, is_available, local
+
+
+@pytest.fixture(autouse=True)
+def probers(monkeypatch):
+    monkeypatch.setattr(backend, "_unavailable", {})
+    monkeypatch.setattr(backend, "_probers", {})
+
+
+def test_hung_probes_hold_a_bounded_number_of_threads(tmp_path):
+    hung = threading.Event()
+    try:
+        with pytest.raises(UnavailableError):
+            guarded(tmp_path, hung.wait, timeout=0.05)
+        assert not is_available(tmp_path)
+        with pytest.raises(UnavailableError):
+            guarded(tmp_path, lambda: True)  # fails at once
+
+        for _ in range(2 * backend.PROBE_WORKERS):
+            backend._unavailable.clear()  # as if it was probed again later
+            with pytest.raises(UnavailableError):
+                guarded(tmp_path, hung.wait, timeout=0.01)
+        (prober,) = backend._probers.values()
+        assert prober._workers == backend.PROBE_WORKERS
+    finally:
+        hung.set()
+
+
+def test_scandir_in_batches(tmp_path):
+    count = backend.SCANDIR_BATCH * 2 + 1
+    for i in range(count):
+        (tmp_path / f"file{i}").touch()
+    assert len(local.scandir(tmp_path)) == count
+    assert (
+        len(local.scandir(tmp_path, limit=backend.SCANDIR_BATCH + 1))
+        == backend.SCANDIR_BATCH + 1
+    )
+    # the first batch is always listed, the others only until the deadline:
+    assert len(local.scandir(tmp_path, deadline=0.0)) == backend.SCANDIR_BATCH
+    with pytest.raises(NotADirectoryError):
+        local.scandir(tmp_path / "file0")
@@ -0,0 +1,122 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import os
+
+import pytest
+
+from f2.fs.compare import Diff, SyncDirection, _copy, compare_trees, sync, sync_plan
+
+OLD = 1_000_000_000  # mtimes, far enough from each other
+NEW = OLD + 3600
+
+
+def write(path, data: str, mtime: float = OLD):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(data)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def trees(tmp_path):
+    left, right = tmp_path / "left", tmp_path / "right"
+    write(left / "same.txt", "same")
+    write(right / "same.txt", "same")
+    write(left / "left_only.txt", "left")
+    write(right / "dir/right_only.txt", "right")
+    write(left / "newer_left.txt", "new!", NEW)
+    write(right / "newer_left.txt", "old")
+    write(left / "newer_right.txt", "old")
+    write(right / "newer_right.txt", "new!", NEW)
+    write(left / "same_time.txt", "left")
+    write(right / "same_time.txt", "rght")  # same size, same mtime
+    write(left / "kind", "a file")
+    (right / "kind").mkdir()
+    (left / "dir").mkdir()
+    return left, right
+
+
+def test_compare_trees(trees):
+    left, right = trees
+    comparison = compare_trees(left, right, workers=2)
+    assert comparison is not None
+    assert comparison.diffs == {
+        ".": Diff.CONTAINS,
+        "dir": Diff.CONTAINS,
+        "dir/right_only.txt": Diff.RIGHT_ONLY,
+        "left_only.txt": Diff.LEFT_ONLY,
+        "newer_left.txt": Diff.LEFT_NEWER,
+        "newer_right.txt": Diff.RIGHT_NEWER,
+        "kind": Diff.KIND,
+    }
+    assert comparison.diff_of(right, right / "newer_left.txt") == Diff.RIGHT_NEWER
+
+    by_content = compare_trees(left, right, by_content=True, workers=2)
+    assert by_content is not None
+    assert by_content.diffs["same_time.txt"] == Diff.DIFFERENT
+    assert "same.txt" not in by_content.diffs
+
+
+def test_one_way_sync_plan(trees):
+    left, right = trees
+    comparison = compare_trees(left, right, workers=2)
+    assert comparison is not None
+
+    copies, conflicts = sync_plan(comparison, SyncDirection.LEFT_TO_RIGHT)
+    assert sorted(copies) == [
+        (left / name, right / name)
+        for name in ("left_only.txt", "newer_left.txt", "newer_right.txt")
+    ]
+    assert conflicts == ["kind"]
+
+    copies, conflicts = sync_plan(comparison, SyncDirection.RIGHT_TO_LEFT)
+    assert sorted(copies) == [
+        (right / name, left / name)
+        for name in ("dir/right_only.txt", "newer_left.txt", "newer_right.txt")
+    ]
+    assert conflicts == ["kind"]
+
+
+def test_two_way_sync(trees):
+    left, right = trees
+    comparison = compare_trees(left, right, by_content=True, workers=2)
+    assert comparison is not None
+
+    copies, conflicts = sync_plan(comparison, SyncDirection.BOTH)
+    assert set(copies) == {
+        (right / "dir/right_only.txt", left / "dir/right_only.txt"),
+        (left / "left_only.txt", right / "left_only.txt"),
+        (left / "newer_left.txt", right / "newer_left.txt"),
+        (right / "newer_right.txt", left / "newer_right.txt"),
+    }
+    assert conflicts == ["kind", "same_time.txt"]
+
+    stats = sync(comparison, SyncDirection.BOTH)
+    assert (stats.copied, stats.skipped, stats.errors) == (4, conflicts, [])
+    assert (right / "newer_left.txt").read_text() == "new!"
+    assert (left / "same_time.txt").read_text() == "left"  # conflicts are kept
+
+    synced = compare_trees(left, right, by_content=True, workers=2)
+    assert synced is not None
+    assert set(synced.diffs) == {".", "kind", "same_time.txt"}
+
+
+def test_copy_replaces_files_atomically(tmp_path):
+    src, dst = tmp_path / "src.txt", tmp_path / "sub/dst.txt"
+    write(src, "new contents", NEW)
+    write(dst, "old")
+    old_inode = dst.stat().st_ino
+
+    _copy(src, dst)
+    assert dst.read_text() == "new contents"
+    assert dst.stat().st_mtime == NEW
+    assert dst.stat().st_ino != old_inode  # a new file, renamed over the old one
+    assert sorted(p.name for p in dst.parent.iterdir()) == ["dst.txt"]
+
+    with pytest.raises(OSError):
+        _copy(tmp_path / "missing.txt", dst)
+    assert dst.read_text() == "new contents"  # left as is
+    assert sorted(p.name for p in dst.parent.iterdir()) == ["dst.txt"]
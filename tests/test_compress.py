@@ -0,0 +1,65 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from f2.fs.compress import compress
+
+
+@pytest.fixture
+def src(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "file.txt").write_text("text")
+    (src / "dangling").symlink_to("nowhere")
+    (src / "sub_link").symlink_to("sub")
+    os.mkfifo(src / "pipe")
+    return src
+
+
+def test_zip_stores_links_and_skips_special_files(src, tmp_path):
+    stats = compress([src], tmp_path / "out.zip")
+    assert stats.file_count == 1
+    assert stats.skipped == ["src/pipe"]
+    with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+        assert zf.testzip() is None
+        assert zf.read("src/dangling") == b"nowhere"
+        assert zf.read("src/sub_link") == b"sub"
+        assert "src/sub/" in zf.namelist()
+
+
+def test_tar_stores_links_and_skips_special_files(src, tmp_path):
+    stats = compress([src], tmp_path / "out.tar.gz")
+    assert stats.file_count == 1
+    assert stats.skipped == ["src/pipe"]
+    with tarfile.open(tmp_path / "out.tar.gz") as tf:
+        links = {m.name: m.linkname for m in tf if m.issym()}
+        assert links == {"src/dangling": "nowhere", "src/sub_link": "sub"}
+        assert "src/pipe" not in tf.getnames()
+
+
+def test_unsupported_archive_type_is_rejected(src, tmp_path):
+    for name in ("out.tar.bz2", "out.tar.xz", "out.tar", "out"):
+        with pytest.raises(ValueError):
+            compress([src], tmp_path / name)
+        assert not (tmp_path / name).exists()
+
+
+@pytest.mark.parametrize("name", ["out.zip", "out.tgz"])
+def test_archive_is_not_added_to_itself(src, name):
+    dst = src / name
+    stats = compress([src], dst)
+    assert stats.file_count == 1
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(dst) as zf:
+            assert f"src/{name}" not in zf.namelist()
+    else:
+        with tarfile.open(dst) as tf:
+            assert f"src/{name}" not in tf.getnames()
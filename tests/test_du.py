@@ -0,0 +1,57 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import sys
+import threading
+
+from f2.fs.du import NO_PARENT, SizeTree
+
+
+def test_tree_can_be_read_while_scanned(tmp_path):
+    for d in range(50):
+        sub_dir = tmp_path / f"dir{d}"
+        sub_dir.mkdir()
+        for f in range(20):
+            (sub_dir / f"file{f}").write_bytes(b"x" * f)
+
+    tree = SizeTree(tmp_path)
+    errors: list[Exception] = []
+    done = threading.Event()
+
+    def read():
+        # like the disk usage panel does, while the tree is scanned:
+        while not done.is_set():
+            scanned = tree  # replaced by the next scan
+            try:
+                for idx in range(len(scanned)):
+                    for child in scanned.largest_children(idx, 1000):
+                        scanned.name(child)
+                        scanned.size(child)
+                        assert scanned.parent(child) == idx
+                    scanned.path_of(idx)
+            except Exception as err:
+                errors.append(err)
+                return
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(5):
+            tree = SizeTree(tmp_path)
+            for _ in tree.scan(workers=4):
+                pass
+    finally:
+        done.set()
+        reader.join()
+        sys.setswitchinterval(switch_interval)
+
+    assert errors == []
+    assert tree.scanned
+    assert tree.count(0) == 50 * 21
+    assert all(tree.parent(c) == 0 for c in tree.children(0))
+    assert tree.parent(0) == NO_PARENT
@@ -0,0 +1,70 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import os
+
+from f2.fs.dupes import BLOCK_SIZE, find_duplicates, replace_with_hardlink
+
+
+def test_files_are_compared_by_size_head_tail_and_contents(tmp_path):
+    large = os.urandom(4 * BLOCK_SIZE)
+    changed = bytearray(large)
+    changed[2 * BLOCK_SIZE] ^= 1  # not in the head nor in the tail
+    files = {
+        "small/a": b"same",
+        "small/b": b"same",
+        "small/c": b"diff",  # same size, other contents
+        "small/d": b"longer",  # other size
+        "large/a": large,
+        "large/b": large,
+        # same head and tail, only the full hash tells it apart:
+        "large/c": bytes(changed),
+        "empty/a": b"",  # below the minimal size
+        "empty/b": b"",
+    }
+    for name, data in files.items():
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(data)
+    os.link(tmp_path / "small/a", tmp_path / "small/a_link")  # not a duplicate
+
+    groups = list(find_duplicates([tmp_path, tmp_path / "small"], workers=2))
+
+    large_group, small_group = groups  # the largest files first
+    assert large_group.size == len(large)
+    assert large_group.paths == [tmp_path / "large/a", tmp_path / "large/b"]
+    # only one of the hard links to the same file is seen:
+    assert small_group.size == 4
+    assert len(small_group.paths) == 2
+    assert small_group.paths[1] == tmp_path / "small/b"
+    assert large_group.wasted == len(large)
+    assert all(g.unchanged(p) for g in groups for p in g.paths)
+
+
+def test_changed_files_are_noticed(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name).write_bytes(b"same")
+    (group,) = find_duplicates([tmp_path])
+
+    (tmp_path / "b").write_bytes(b"diff")
+    os.utime(tmp_path / "b", ns=(0, 0))
+
+    assert group.unchanged(tmp_path / "a")
+    assert not group.unchanged(tmp_path / "b")
+    (tmp_path / "a").unlink()
+    assert not group.unchanged(tmp_path / "a")
+
+
+def test_replace_with_hardlink(tmp_path):
+    original = tmp_path / "original"
+    duplicate = tmp_path / "duplicate"
+    original.write_bytes(b"same")
+    duplicate.write_bytes(b"same")
+
+    replace_with_hardlink(original, duplicate)
+
+    assert duplicate.read_bytes() == b"same"
+    assert os.path.samefile(original, duplicate)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["duplicate", "original"]
@@ -0,0 +1,23 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import pytest
+
+from f2.fs.find import FindQuery
+
+
+@pytest.mark.parametrize(
+    "token, min_size",
+    [("size>10", 10), ("size>10b", 10), ("size>1.5k", 1500), ("size>2MB", 2 * 10**6)],
+)
+def test_size_units(token, min_size):
+    assert FindQuery.parse(token).min_size == min_size
+
+
+@pytest.mark.parametrize("token", ["size>10x", "size>10kk", "size<b"])
+def test_unknown_size_unit_is_invalid(token):
+    with pytest.raises(ValueError):
+        FindQuery.parse(token)
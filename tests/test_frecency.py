@@ -0,0 +1,26 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+from pathlib import Path
+
+from f2.frecency import Frecency
+
+
+def test_visit_counts_are_decayed_over_the_total(tmp_path):
+    frecency = Frecency(tmp_path / "frecency", max_total=100)
+    frecency.visit(Path("/once"))
+    for i in range(150):
+        frecency.visit(Path(f"/often/{i % 3}"))
+    assert "/once" not in frecency.visits  # forgotten
+    assert set(frecency.visits) == {"/often/0", "/often/1", "/often/2"}
+    assert sum(v.count for v in frecency.visits.values()) <= 100
+
+    frecency.save()
+    reloaded = Frecency(tmp_path / "frecency", max_total=100)
+    assert reloaded.visits.keys() == frecency.visits.keys()
+    for _ in range(50):
+        reloaded.visit(Path("/often/0"))
+    assert sum(v.count for v in reloaded.visits.values()) <= 100
@@ -0,0 +1,65 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2024 Timur Rubeko
+
+import re
+import threading
+
+import pytest
+
+from f2.lineindex import LineIndex
+
+
+@pytest.mark.parametrize("trailing_newline", [False, True])
+def test_lines_across_the_blocks(tmp_path, trailing_newline):
+    lines = [b"x" * (i % 300) for i in range(2000)]
+    data = b"\n".join(lines) + (b"\n" if trailing_newline else b"")
+    path = tmp_path / "file.txt"
+    path.write_bytes(data)
+    starts = [0]
+    for line in lines[:-1]:
+        starts.append(starts[-1] + len(line) + 1)
+
+    with LineIndex(path) as index:
+        index.BLOCK_SIZE = 4096
+        index.CHUNK_SIZE = 4 * 4096
+        assert index.offset_of_line(1500) == starts[1500]  # indexed up to there
+        assert index.line_count is None
+        index.build()
+        assert index.line_count == len(lines)
+        for line in (0, 1, 17, 999, 1999):
+            assert index.offset_of_line(line) == starts[line]
+            assert index.line_of_offset(starts[line]) == line
+            assert index.line_of_offset(starts[line] + len(lines[line])) == line
+        assert index.offset_of_line(5000) == starts[-1]  # clamped
+
+
+def test_empty_file(tmp_path):
+    (tmp_path / "empty").touch()
+    with LineIndex(tmp_path / "empty") as index:
+        index.build()
+        assert index.line_count == 0
+        assert index.offset_of_line(3) == 0
+        assert index.line_of_offset(0) == 0
+
+
+def test_close_stops_the_background_reads(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"no match here\n" * 500_000)
+    index = LineIndex(path)
+    index.CHUNK_SIZE = 64 * 1024
+    results = []
+
+    def search():
+        results.append(index.search(re.compile(b"nope"), 0))
+
+    searcher = threading.Thread(target=search)
+    builder = threading.Thread(target=index.build)
+    searcher.start()
+    builder.start()
+    index.close()
+    searcher.join()
+    builder.join()
+    assert results == [None]